@@ -0,0 +1,6 @@
+from . import realtime
+
+
+def notifications(request):
+    """Indica a la barra lateral si puede abrir el stream SSE de notificaciones"""
+    return {'notifications_stream': realtime.stream_supported(request)}
@@ -0,0 +1,61 @@
+import time
+from django.core.management.base import BaseCommand
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from apps.core.models import Notification, NotificationPreference
+from apps.core.notifications import NotificationService
+
+class Command(BaseCommand):
+    help = 'Compara el costo por destinatario del envío uno a uno contra el envío masivo (no deja datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=3000, help='Destinatarios de prueba a crear')
+
+    def handle(self, *args, **options):
+        total = options['users']
+
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'bench_notif_{i}', is_active=True) for i in range(total)
+            ])
+            recipients = User.objects.filter(username__startswith='bench_notif_')
+
+            # Envío uno a uno (comportamiento anterior)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for user in recipients:
+                    NotificationService.create_notification(
+                        recipient=user,
+                        notification_type='system_update',
+                        title='Benchmark',
+                        message='Notificación de prueba'
+                    )
+                single_time = time.perf_counter() - start
+            self._report('Uno a uno', single_time, len(queries), total)
+
+            # Envío masivo sin preferencias previas
+            Notification.objects.filter(recipient__in=recipients).delete()
+            NotificationPreference.objects.filter(user__in=recipients).delete()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                NotificationService.bulk_notify(
+                    recipients,
+                    notification_type='system_update',
+                    title='Benchmark',
+                    message='Notificación de prueba'
+                )
+                bulk_time = time.perf_counter() - start
+            self._report('Masivo', bulk_time, len(queries), total)
+
+            if bulk_time > 0:
+                self.stdout.write(self.style.SUCCESS(f'Aceleración: {single_time / bulk_time:.1f}x'))
+
+            # Descartar todos los datos de prueba
+            transaction.set_rollback(True)
+
+    def _report(self, label, seconds, queries, total):
+        per_recipient = seconds / total * 1000 if total else 0
+        self.stdout.write(
+            f'{label}: {seconds:.2f}s total, {per_recipient:.3f} ms y {queries / total if total else 0:.2f} consultas por destinatario'
+        )
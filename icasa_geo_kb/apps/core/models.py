@@ -116,10 +116,12 @@ class Notification(TimeStampedModel):
     
     def mark_as_read(self):
         from django.utils import timezone
+        from apps.core.realtime import unread_count_changed
         if not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
             self.save()
+            unread_count_changed(self.recipient_id, -1)
     
     def get_priority_class(self):
         """Retorna clase CSS según prioridad"""
@@ -1,7 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.db.models import QuerySet
 from django.urls import reverse
 from .models import Notification, NotificationPreference
+from . import realtime
+
+# Destinatarios por lote (consultas IN y bulk_create)
+BULK_BATCH_SIZE = 1000
+
+# Hilos para el envío masivo fuera de la request
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='notifications')
+
+
+def _run_in_background(func, *args, **kwargs):
+    """Ejecutar en un hilo aparte cuando la transacción actual se confirme"""
+    def task():
+        try:
+            func(*args, **kwargs)
+        finally:
+            connections.close_all()
+    
+    transaction.on_commit(lambda: _executor.submit(task))
 
 class NotificationService:
     """Servicio centralizado para gestionar notificaciones"""
@@ -30,27 +51,98 @@ class NotificationService:
             content_object=content_object,
             action_url=action_url
         )
+        realtime.notifications_created([notification])
         
         return notification
     
+    @staticmethod
+    def bulk_notify(recipients, notification_type, title, message,
+                    sender=None, content_object=None, priority='medium', action_url=None, exclude=None):
+        """
+        Crear la misma notificación para muchos destinatarios
+        Preferencias en una consulta por lote, preferencias faltantes y notificaciones con bulk_create
+        Devuelve la cantidad de notificaciones creadas
+        """
+        if isinstance(recipients, QuerySet):
+            recipient_ids = list(recipients.order_by().values_list('id', flat=True).distinct())
+        else:
+            recipient_ids = list(dict.fromkeys(getattr(r, 'pk', r) for r in recipients))
+        
+        if exclude is not None:
+            excluded = getattr(exclude, 'pk', exclude)
+            recipient_ids = [pk for pk in recipient_ids if pk != excluded]
+        
+        web_pref_field = f"web_{notification_type}"
+        has_preference = any(f.name == web_pref_field for f in NotificationPreference._meta.fields)
+        
+        content_type = ContentType.objects.get_for_model(content_object) if content_object is not None else None
+        object_id = content_object.pk if content_object is not None else None
+        sender_id = sender.pk if sender is not None else None
+        
+        created = 0
+        for start in range(0, len(recipient_ids), BULK_BATCH_SIZE):
+            batch = recipient_ids[start:start + BULK_BATCH_SIZE]
+            
+            # Preferencias existentes del lote (una consulta)
+            fields = ('user_id', web_pref_field) if has_preference else ('user_id',)
+            preferences = {
+                row[0]: (row[1] if has_preference else True)
+                for row in NotificationPreference.objects.filter(user_id__in=batch).values_list(*fields)
+            }
+            
+            # Crear las preferencias faltantes con los valores por defecto
+            missing = [pk for pk in batch if pk not in preferences]
+            if missing:
+                NotificationPreference.objects.bulk_create(
+                    [NotificationPreference(user_id=pk) for pk in missing], ignore_conflicts=True
+                )
+            
+            notifications = [
+                Notification(
+                    recipient_id=pk,
+                    sender_id=sender_id,
+                    notification_type=notification_type,
+                    priority=priority,
+                    title=title,
+                    message=message,
+                    content_type=content_type,
+                    object_id=object_id,
+                    action_url=action_url
+                )
+                for pk in batch if preferences.get(pk, True)
+            ]
+            Notification.objects.bulk_create(notifications)
+            realtime.notifications_created(notifications)
+            created += len(notifications)
+        
+        return created
+    
+    @staticmethod
+    def bulk_notify_async(recipients, notification_type, title, message, **kwargs):
+        """Igual que bulk_notify, pero fuera del hilo de la request (al confirmar la transacción)"""
+        if isinstance(recipients, QuerySet):
+            recipients = list(recipients.order_by().values_list('id', flat=True).distinct())
+        else:
+            recipients = [getattr(r, 'pk', r) for r in recipients]
+        _run_in_background(NotificationService.bulk_notify, recipients, notification_type, title, message, **kwargs)
+    
     @staticmethod
     def notify_document_created(document, sender):
         """Notificar cuando se crea un documento"""
-        # Notificar a gerentes y administradores
+        # Notificar a gerentes y administradores (sin notificar al creador)
         managers = User.objects.filter(groups__name__in=['Gerentes', 'Administradores ICASA'])
         
-        for manager in managers:
-            if manager != sender:  # No notificar al creador
-                NotificationService.create_notification(
-                    recipient=manager,
-                    sender=sender,
-                    notification_type='document_created',
-                    title=f'Nuevo documento: {document.title}',
-                    message=f'{sender.get_full_name() or sender.username} ha creado un nuevo documento en {document.category.name}',
-                    content_object=document,
-                    priority='medium',
-                    action_url=reverse('knowledge_base:document_detail', kwargs={'slug': document.slug})
-                )
+        NotificationService.bulk_notify(
+            managers,
+            sender=sender,
+            exclude=sender,
+            notification_type='document_created',
+            title=f'Nuevo documento: {document.title}',
+            message=f'{sender.get_full_name() or sender.username} ha creado un nuevo documento en {document.category.name}',
+            content_object=document,
+            priority='medium',
+            action_url=reverse('knowledge_base:document_detail', kwargs={'slug': document.slug})
+        )
     
     @staticmethod
     def notify_document_review(document, sender):
@@ -58,18 +150,17 @@ class NotificationService:
         # Notificar a revisores, gerentes y administradores
         reviewers = User.objects.filter(groups__name__in=['Revisores', 'Gerentes', 'Administradores ICASA'])
         
-        for reviewer in reviewers:
-            if reviewer != sender:
-                NotificationService.create_notification(
-                    recipient=reviewer,
-                    sender=sender,
-                    notification_type='document_review',
-                    title=f'Documento pendiente de revisión: {document.title}',
-                    message=f'El documento "{document.title}" está esperando tu revisión',
-                    content_object=document,
-                    priority='high',
-                    action_url=reverse('knowledge_base:document_detail', kwargs={'slug': document.slug})
-                )
+        NotificationService.bulk_notify(
+            reviewers,
+            sender=sender,
+            exclude=sender,
+            notification_type='document_review',
+            title=f'Documento pendiente de revisión: {document.title}',
+            message=f'El documento "{document.title}" está esperando tu revisión',
+            content_object=document,
+            priority='high',
+            action_url=reverse('knowledge_base:document_detail', kwargs={'slug': document.slug})
+        )
     
     @staticmethod
     def notify_document_approved(document, approver):
@@ -105,18 +196,18 @@ class NotificationService:
         )
     
     @staticmethod
-    def notify_system_update(title, message, priority='medium'):
+    def notify_system_update(title, message, priority='medium', run_async=True):
         """Notificar actualizaciones del sistema a todos los usuarios"""
         users = User.objects.filter(is_active=True)
         
-        for user in users:
-            NotificationService.create_notification(
-                recipient=user,
-                notification_type='system_update',
-                title=title,
-                message=message,
-                priority=priority
-            )
+        send = NotificationService.bulk_notify_async if run_async else NotificationService.bulk_notify
+        return send(
+            users,
+            notification_type='system_update',
+            title=title,
+            message=message,
+            priority=priority
+        )
     
     @staticmethod
     def get_user_notifications(user, unread_only=False, limit=None):
@@ -133,10 +224,11 @@ class NotificationService:
     
     @staticmethod
     def get_unread_count(user):
-        """Obtener cantidad de notificaciones no leídas"""
-        return Notification.objects.filter(recipient=user, is_read=False).count()
+        """Obtener cantidad de notificaciones no leídas (contador en cache)"""
+        return realtime.get_unread_count(user.id)
     
     @staticmethod
     def mark_all_as_read(user):
         """Marcar todas las notificaciones como leídas"""
-        Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
\ No newline at end of file
+        Notification.objects.filter(recipient=user, is_read=False).update(is_read=True)
+        realtime.unread_count_changed(user.id)
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Notificaciones en tiempo real
+Canal pub/sub en proceso (por usuario) que alimenta el endpoint SSE y contador
+de no leídas en cache que se ajusta de forma incremental.
+El stream solo se usa bajo ASGI (uvicorn/daphne con icasa_geo.asgi); bajo WSGI la barra lateral
+consulta el contador periódicamente. Los eventos llegan solo a los clientes del mismo proceso:
+con varios procesos los demás ven el cambio en el siguiente latido si la cache es compartida
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+
+# Contador de no leídas por usuario (el TTL corrige cualquier desviación)
+UNREAD_CACHE_KEY = 'core:notifications:unread:{}'
+UNREAD_CACHE_TTL = 300
+
+# Eventos pendientes por suscriptor antes de descartar (cliente lento)
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class Subscription:
+    """Cola asyncio de un cliente SSE conectado"""
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def _put(self, event: Dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+    def deliver(self, event: Dict):
+        """Entregar desde cualquier hilo"""
+        if not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self._put, event)
+
+
+class NotificationBroker:
+    """Suscriptores por usuario dentro del proceso"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: int, event: Dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+
+broker = NotificationBroker()
+
+
+def stream_supported(request) -> bool:
+    """El stream SSE necesita un servidor ASGI; bajo WSGI ocuparía un worker por conexión"""
+    return isinstance(request, ASGIRequest)
+
+
+def notification_payload(notification) -> Dict:
+    """Representación JSON de una notificación (misma forma que notifications_api)"""
+    return {
+        'id': notification.id,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'priority': notification.priority,
+        'created_at': notification.created_at.isoformat() if notification.created_at else None,
+        'action_url': notification.action_url,
+        'priority_class': notification.get_priority_class(),
+    }
+
+
+# Contador de no leídas
+
+def get_unread_count(user_id: int) -> int:
+    """Contador en cache; se calcula con una consulta si no existe"""
+    key = UNREAD_CACHE_KEY.format(user_id)
+    count = cache.get(key)
+    if count is None:
+        from .models import Notification
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.set(key, count, UNREAD_CACHE_TTL)
+    return count
+
+
+def peek_unread_count(user_id: int) -> Optional[int]:
+    """Contador en cache sin consultar la base de datos (None si no está calculado)"""
+    return cache.get(UNREAD_CACHE_KEY.format(user_id))
+
+
+def adjust_unread_count(user_id: int, delta: int):
+    """Ajustar el contador si está en cache (si no, se calculará en la próxima lectura)"""
+    key = UNREAD_CACHE_KEY.format(user_id)
+    try:
+        if cache.incr(key, delta) < 0:
+            cache.delete(key)
+    except ValueError:
+        pass
+
+
+def reset_unread_count(user_id: int, count: int = 0):
+    cache.set(UNREAD_CACHE_KEY.format(user_id), count, UNREAD_CACHE_TTL)
+
+
+# Publicación (después de confirmar la transacción)
+
+def _publish_created(notifications):
+    for notification in notifications:
+        adjust_unread_count(notification.recipient_id, 1)
+        count = peek_unread_count(notification.recipient_id)
+        broker.publish(notification.recipient_id, {
+            'event': 'notification',
+            'data': {**notification_payload(notification), 'unread_count': count},
+        })
+
+
+def notifications_created(notifications):
+    """Avisar a los clientes conectados y ajustar sus contadores"""
+    notifications = list(notifications)
+    if notifications:
+        transaction.on_commit(lambda: _publish_created(notifications))
+
+
+def unread_count_changed(user_id: int, delta: Optional[int] = None):
+    """Ajustar (delta) o reiniciar a cero (delta=None) el contador y publicar el nuevo valor"""
+    def publish():
+        if delta is None:
+            reset_unread_count(user_id)
+        else:
+            adjust_unread_count(user_id, delta)
+        broker.publish(user_id, {'event': 'unread_count', 'data': {'count': get_unread_count(user_id)}})
+
+    transaction.on_commit(publish)
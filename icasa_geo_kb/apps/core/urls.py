@@ -1,7 +1,8 @@
 from django.urls import path
 from .views import (
     notifications_list, notifications_unread, mark_notification_read,
-    mark_all_notifications_read, notifications_api, notification_preferences
+    mark_all_notifications_read, notifications_api, notifications_unread_count, notifications_stream,
+    notification_preferences
 )
 
 app_name = 'core'
@@ -11,6 +12,8 @@ urlpatterns = [
     path('notifications/unread/', notifications_unread, name='notifications_unread'),
     path('notifications/preferences/', notification_preferences, name='notification_preferences'),
     path('notifications/api/', notifications_api, name='notifications_api'),
+    path('notifications/unread-count/', notifications_unread_count, name='notifications_unread_count'),
+    path('notifications/stream/', notifications_stream, name='notifications_stream'),
     path('notifications/<int:notification_id>/read/', mark_notification_read, name='mark_notification_read'),
     path('notifications/mark-all-read/', mark_all_notifications_read, name='mark_all_notifications_read'),
 ]
\ No newline at end of file
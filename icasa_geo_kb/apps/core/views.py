@@ -1,10 +1,19 @@
+import asyncio
+import json
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404
+from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
 from .models import Notification
 from .notifications import NotificationService
+from . import realtime
+
+# Segundos entre latidos del stream SSE y duración máxima de una conexión (el navegador reconecta)
+STREAM_HEARTBEAT = 15
+STREAM_MAX_SECONDS = 300
 
 @login_required
 def notifications_list(request):
@@ -55,24 +64,64 @@ def notifications_api(request):
         limit=10
     )
     
-    notifications_data = []
-    for notification in unread_notifications:
-        notifications_data.append({
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.notification_type,
-            'priority': notification.priority,
-            'created_at': notification.created_at.isoformat(),
-            'action_url': notification.action_url,
-            'priority_class': notification.get_priority_class(),
-        })
-    
     return JsonResponse({
-        'notifications': notifications_data,
-        'unread_count': len(notifications_data),
+        'notifications': [realtime.notification_payload(n) for n in unread_notifications],
+        'unread_count': NotificationService.get_unread_count(request.user),
     })
 
+@login_required
+def notifications_unread_count(request):
+    """API con el contador de no leídas (desde cache)"""
+    return JsonResponse({'count': NotificationService.get_unread_count(request.user)})
+
+def _sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def notifications_stream(request):
+    """Stream SSE de notificaciones: nuevas notificaciones y cambios del contador de no leídas"""
+    user = await sync_to_async(get_user)(request)
+    if not user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Autenticación requerida'}, status=401)
+    
+    if not realtime.stream_supported(request):
+        # 204: EventSource no reintenta y el cliente vuelve a consultar periódicamente
+        return HttpResponse(status=204)
+    
+    user_id = user.id
+    initial_count = await sync_to_async(realtime.get_unread_count)(user_id)
+    
+    async def events():
+        loop = asyncio.get_running_loop()
+        subscription = realtime.broker.subscribe(user_id)
+        last_count = initial_count
+        try:
+            yield f"retry: 5000\n{_sse_event('unread_count', {'count': initial_count})}"
+            deadline = loop.time() + STREAM_MAX_SECONDS
+            while loop.time() < deadline:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    # Cambios hechos por otros procesos llegan solo al contador en cache
+                    current = await sync_to_async(realtime.peek_unread_count)(user_id)
+                    if current is not None and current != last_count:
+                        last_count = current
+                        yield _sse_event('unread_count', {'count': current})
+                    else:
+                        yield ': keepalive\n\n'
+                    continue
+                
+                count = event['data'].get('unread_count', event['data'].get('count'))
+                if count is not None:
+                    last_count = count
+                yield _sse_event(event['event'], event['data'])
+        finally:
+            realtime.broker.unsubscribe(subscription)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def notification_preferences(request):
     """Vista para gestionar preferencias de notificaciones"""
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class KnowledgeBaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.knowledge_base'
-    verbose_name = 'Base de Conocimiento'
\ No newline at end of file
+    verbose_name = 'Base de Conocimiento'
+    
+    def ready(self):
+        import apps.knowledge_base.signals
@@ -0,0 +1,80 @@
+"""
+Mantenimiento incremental del índice full-text de documentos en PostgreSQL
+El vector ponderado se guarda en Document.search_vector para que PostgreSQL
+no vuelva a tokenizar el contenido en cada búsqueda
+"""
+from typing import Dict, Iterable
+
+from django.db import connection
+from django.db.models import Value
+from django.utils.html import strip_tags
+
+from .models import Document
+
+# Configuración de texto usada tanto al indexar como al consultar
+SEARCH_CONFIG = 'spanish'
+
+
+def is_supported() -> bool:
+    """El vector almacenado solo se mantiene en PostgreSQL"""
+    return connection.vendor == 'postgresql'
+
+
+def document_fields(document: Document, category_name: str = None) -> Dict[str, str]:
+    """Campos indexables de un documento (HTML del contenido eliminado)"""
+    if category_name is None:
+        category_name = document.category.name if document.category_id else ''
+
+    return {
+        'title': document.title or '',
+        'code': document.document_code or '',
+        'content': strip_tags(document.content or ''),
+        'category': category_name,
+    }
+
+
+def document_search_vector(document: Document, category_name: str = None):
+    """Expresión del vector ponderado de un documento"""
+    from django.contrib.postgres.search import SearchVector
+
+    fields = document_fields(document, category_name)
+    return (
+        SearchVector(Value(fields['title']), weight='A', config=SEARCH_CONFIG) +
+        SearchVector(Value(fields['code']), weight='A', config=SEARCH_CONFIG) +
+        SearchVector(Value(fields['content']), weight='B', config=SEARCH_CONFIG) +
+        SearchVector(Value(fields['category']), weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def index_document(document: Document):
+    """Actualizar el vector de un documento sin disparar signals ni tocar updated_at"""
+    if not is_supported():
+        return
+    Document.objects.filter(pk=document.pk).update(search_vector=document_search_vector(document))
+
+
+def index_documents(documents: Iterable[Document], batch_size: int = 500) -> int:
+    """Actualizar el vector de muchos documentos con bulk_update por lotes"""
+    if not is_supported():
+        return 0
+
+    total = 0
+    batch = []
+    for document in documents:
+        document.search_vector = document_search_vector(document)
+        batch.append(document)
+        if len(batch) >= batch_size:
+            Document.objects.bulk_update(batch, ['search_vector'])
+            total += len(batch)
+            batch = []
+    if batch:
+        Document.objects.bulk_update(batch, ['search_vector'])
+        total += len(batch)
+    return total
+
+
+def rebuild_queryset():
+    """Documentos con los campos necesarios para indexar"""
+    return Document.objects.select_related('category').only(
+        'id', 'title', 'document_code', 'content', 'category__name'
+    ).order_by('id')
@@ -0,0 +1,447 @@
+"""
+Índice invertido local para búsqueda full-text sin PostgreSQL
+Tokeniza con plegado de acentos y un stemmer ligero de español, ordena con BM25
+y guarda los postings en segmentos inmutables en disco que se leen con mmap.
+Los cambios de documentos individuales se acumulan y se escriben en lote desde un hilo
+en segundo plano (o antes de la siguiente búsqueda del mismo proceso)
+"""
+import atexit
+import json
+import math
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from heapq import nlargest
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+# Peso de cada campo en la frecuencia de término (equivalente a los pesos A/B/C de PostgreSQL)
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'code': 3.0,
+    'content': 1.0,
+    'category': 0.5,
+}
+
+# Parámetros BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Número de segmentos a partir del cual se fusionan en uno solo
+MAX_SEGMENTS = 8
+
+# Segundos que se acumulan cambios antes de escribirlos en un segmento
+WRITE_DELAY = 2.0
+
+# Reintentos al leer meta.json si otro proceso fusionó y borró un segmento entre tanto
+REFRESH_RETRIES = 5
+
+STOPWORDS = frozenset("""
+a al algo ante antes como con contra cual cuando de del desde donde durante e el ella ellas ellos en entre
+era es esa esas ese eso esos esta estas este esto estos fue ha hay la las le les lo los mas me mi mis muy
+ni no nos o os otra otro para pero por que quien se sea segun ser si sin sobre son su sus tambien te tu
+un una uno unos unas y ya
+""".split())
+
+# Sufijos derivativos del español (del más largo al más corto)
+SUFFIXES = (
+    'amientos', 'imientos', 'aciones', 'uciones', 'amiento', 'imiento', 'idades', 'amente',
+    'adoras', 'adores', 'ancias', 'encias', 'mente', 'acion', 'ucion', 'adora', 'ador',
+    'ancia', 'encia', 'idad', 'ismos', 'istas', 'ables', 'ibles', 'ismo', 'ista', 'able',
+    'ible', 'osos', 'osas', 'ivos', 'ivas', 'oso', 'osa', 'ivo', 'iva',
+)
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def fold_accents(text: str) -> str:
+    """Minúsculas y sin acentos ('Gestión' -> 'gestion'; la ñ se conserva como n)"""
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    return ''.join(c for c in normalized if not unicodedata.combining(c))
+
+
+def stem(word: str) -> str:
+    """Stemmer ligero de español: plurales, sufijos derivativos y vocal final"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+
+    # Plurales
+    if word.endswith('ces') and len(word) > 4:
+        word = word[:-3] + 'z'
+    elif word.endswith('es') and len(word) > 4 and word[-3] not in 'aeiou':
+        word = word[:-2]
+    elif word.endswith('s') and len(word) > 3:
+        word = word[:-1]
+
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            word = word[:-len(suffix)]
+            break
+
+    if len(word) > 4 and word[-1] in 'aeo':
+        word = word[:-1]
+    return word
+
+
+def analyze(text: str) -> List[str]:
+    """Texto -> lista de términos normalizados"""
+    return [
+        stem(token) for token in TOKEN_RE.findall(fold_accents(text or ''))
+        if token not in STOPWORDS and len(token) > 1
+    ]
+
+
+def weighted_terms(fields: Dict[str, str]) -> Tuple[Dict[str, float], float]:
+    """Frecuencias ponderadas por campo y longitud ponderada del documento"""
+    frequencies = defaultdict(float)
+    length = 0.0
+    for field, text in fields.items():
+        weight = FIELD_WEIGHTS.get(field, 1.0)
+        for term in analyze(text):
+            frequencies[term] += weight
+            length += weight
+    return frequencies, length
+
+
+class Segment:
+    """Segmento inmutable: diccionario de términos en memoria y postings mapeados con mmap"""
+
+    def __init__(self, path: str, name: str):
+        self.name = name
+        base = os.path.join(path, name)
+        with open(base + '.terms.json', encoding='utf-8') as f:
+            self.terms = json.load(f)  # término -> [offset, count]
+
+        self._resources = []
+        self.doc_ids = self._map(base + '.docs', 'I')
+        self.frequencies = self._map(base + '.tfs', 'f')
+
+    def _map(self, filename: str, typecode: str):
+        f = open(filename, 'rb')
+        self._resources.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            return array(typecode)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        typed = view.cast(typecode)
+        self._resources.extend([mapped, view, typed])
+        return typed
+
+    def postings(self, term: str):
+        """Pares (doc_id, tf) de un término"""
+        entry = self.terms.get(term)
+        if entry is None:
+            return ()
+        offset, count = entry
+        return zip(self.doc_ids[offset:offset + count], self.frequencies[offset:offset + count])
+
+    def close(self):
+        # Liberar vistas antes de cerrar el mmap y el archivo
+        for resource in reversed(self._resources):
+            if isinstance(resource, memoryview):
+                resource.release()
+            else:
+                resource.close()
+        self._resources = []
+
+    @staticmethod
+    def write(path: str, postings: Dict[str, List[Tuple[int, float]]]) -> str:
+        """Escribir un segmento nuevo y devolver su nombre"""
+        name = f'seg_{uuid.uuid4().hex}'
+        base = os.path.join(path, name)
+
+        terms = {}
+        doc_ids = array('I')
+        frequencies = array('f')
+        for term in sorted(postings):
+            entries = sorted(postings[term])
+            terms[term] = [len(doc_ids), len(entries)]
+            doc_ids.extend(doc_id for doc_id, _ in entries)
+            frequencies.extend(tf for _, tf in entries)
+
+        with open(base + '.docs', 'wb') as f:
+            doc_ids.tofile(f)
+        with open(base + '.tfs', 'wb') as f:
+            frequencies.tofile(f)
+        with open(base + '.terms.json', 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False)
+        return name
+
+
+class LocalSearchIndex:
+    """
+    Índice invertido segmentado en un directorio
+    meta.json guarda la lista de segmentos y el mapa de documentos vivos
+    (doc_id -> segmento con su versión vigente); las versiones anteriores se ignoran
+    """
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._lock = threading.RLock()
+        self._meta_mtime = None
+        self.segments: Dict[str, Segment] = {}
+        self.live: Dict[int, str] = {}
+        self.lengths: Dict[int, float] = {}
+
+        # Cambios pendientes: doc_id -> campos (None = eliminar); el último cambio de cada documento gana
+        self._pending: Dict[int, Optional[Dict[str, str]]] = {}
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._timer = None
+
+    @property
+    def meta_path(self) -> str:
+        return os.path.join(self.path, 'meta.json')
+
+    def exists(self) -> bool:
+        return os.path.exists(self.meta_path)
+
+    # Lectura
+
+    def _refresh(self):
+        """Recargar meta.json y segmentos si otro proceso los modificó"""
+        for attempt in range(REFRESH_RETRIES):
+            try:
+                return self._load_meta()
+            except FileNotFoundError:
+                # Otro proceso reemplazó meta.json y borró un segmento fusionado: leer la versión nueva
+                self._meta_mtime = None
+                if attempt == REFRESH_RETRIES - 1:
+                    raise
+                time.sleep(0.01 * (attempt + 1))
+
+    def _load_meta(self):
+        try:
+            stat = os.stat(self.meta_path)
+            mtime = (stat.st_mtime_ns, stat.st_ino, stat.st_size)
+        except FileNotFoundError:
+            mtime = None
+        if mtime is not None and mtime == self._meta_mtime:
+            return
+
+        if mtime is None:
+            names, live, lengths = [], {}, {}
+        else:
+            with open(self.meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            names = meta['segments']
+            live = {int(doc_id): segment for doc_id, segment in meta['live'].items()}
+            lengths = {int(doc_id): length for doc_id, length in meta['lengths'].items()}
+
+        for name in list(self.segments):
+            if name not in names:
+                self.segments.pop(name).close()
+        for name in names:
+            if name not in self.segments:
+                self.segments[name] = Segment(self.path, name)
+
+        self.live, self.lengths = live, lengths
+        self._meta_mtime = mtime
+
+    def search(self, query: str, limit: int = 50) -> List[Tuple[int, float]]:
+        """Documentos ordenados por puntuación BM25 [(doc_id, score)]"""
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms:
+            return []
+
+        # Los cambios pendientes de este proceso se ven en su siguiente búsqueda
+        self.flush()
+        with self._lock:
+            self._refresh()
+            total_docs = len(self.live)
+            if not total_docs:
+                return []
+            avg_length = (sum(self.lengths.values()) / total_docs) or 1.0
+
+            scores = defaultdict(float)
+            for term in terms:
+                # Solo cuentan los postings del segmento vigente de cada documento
+                matches = [
+                    (doc_id, tf)
+                    for name, segment in self.segments.items()
+                    for doc_id, tf in segment.postings(term)
+                    if self.live.get(doc_id) == name
+                ]
+                if not matches:
+                    continue
+
+                df = len(matches)
+                idf = math.log(1 + (total_docs - df + 0.5) / (df + 0.5))
+                for doc_id, tf in matches:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        return nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    # Escritura
+
+    @contextmanager
+    def _writing(self):
+        """Bloqueo de escritura (hilos y, donde hay fcntl, procesos)"""
+        os.makedirs(self.path, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(self.path, '.lock'), 'w') as lock_file:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    self._refresh()
+                    yield
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _save_meta(self, names: List[str]):
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'segments': names,
+                'live': {str(doc_id): segment for doc_id, segment in self.live.items()},
+                'lengths': {str(doc_id): length for doc_id, length in self.lengths.items()},
+            }, f, separators=(',', ':'))
+        os.replace(tmp_path, self.meta_path)
+
+        obsolete = [name for name in self.segments if name not in names]
+        self._meta_mtime = None
+        self._refresh()
+        for name in obsolete:
+            self._delete_segment_files(name)
+
+    def _delete_segment_files(self, name: str):
+        for extension in ('.docs', '.tfs', '.terms.json'):
+            try:
+                os.remove(os.path.join(self.path, name + extension))
+            except OSError:
+                pass  # en Windows puede seguir mapeado por otro proceso
+
+    @staticmethod
+    def _invert(documents: Iterable[Tuple[int, Dict[str, str]]]):
+        postings = defaultdict(list)
+        lengths = {}
+        for doc_id, fields in documents:
+            frequencies, length = weighted_terms(fields)
+            lengths[doc_id] = length
+            for term, tf in frequencies.items():
+                postings[term].append((doc_id, tf))
+        return postings, lengths
+
+    def add_documents(self, documents: Iterable[Tuple[int, Dict[str, str]]]):
+        """Indexar (o reindexar) documentos en un segmento nuevo"""
+        self._apply(list(documents), [])
+
+    def remove_documents(self, doc_ids: Iterable[int]):
+        """Marcar documentos como eliminados (sus postings se descartan en la próxima fusión)"""
+        self._apply([], list(doc_ids))
+
+    def _apply(self, documents: List[Tuple[int, Dict[str, str]]], removed: List[int]):
+        """Altas y bajas en una sola escritura de meta.json"""
+        postings, lengths = self._invert(documents)
+        if not lengths and not removed:
+            return
+
+        with self._writing():
+            names = list(self.segments)
+            for doc_id in removed:
+                self.live.pop(doc_id, None)
+                self.lengths.pop(doc_id, None)
+            if lengths:
+                name = Segment.write(self.path, postings)
+                for doc_id, length in lengths.items():
+                    self.live[doc_id] = name
+                    self.lengths[doc_id] = length
+                names.append(name)
+            if len(names) > MAX_SEGMENTS:
+                names = [self._merge(names)]
+            self._save_meta(names)
+
+    # Escritura diferida
+
+    def queue_document(self, doc_id: int, fields: Dict[str, str]):
+        """Indexar un documento en el próximo lote"""
+        self._queue(doc_id, fields)
+
+    def queue_removal(self, doc_id: int):
+        """Eliminar un documento en el próximo lote"""
+        self._queue(doc_id, None)
+
+    def _queue(self, doc_id: int, fields: Optional[Dict[str, str]]):
+        with self._pending_lock:
+            self._pending[doc_id] = fields
+            if self._timer is None:
+                self._timer = threading.Timer(WRITE_DELAY, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Escribir los cambios pendientes (un segmento y una escritura de meta.json por lote)"""
+        with self._flush_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if pending:
+                self._apply(
+                    [(doc_id, fields) for doc_id, fields in pending.items() if fields is not None],
+                    [doc_id for doc_id, fields in pending.items() if fields is None]
+                )
+
+    def rebuild(self, documents: Iterable[Tuple[int, Dict[str, str]]]):
+        """Reemplazar todo el índice por un único segmento"""
+        with self._pending_lock:
+            # Los cambios pendientes quedan incluidos en la reconstrucción
+            self._pending = {}
+        postings, lengths = self._invert(documents)
+        with self._writing():
+            name = Segment.write(self.path, postings)
+            self.live = {doc_id: name for doc_id in lengths}
+            self.lengths = lengths
+            self._save_meta([name])
+
+    def _merge(self, names: List[str]) -> str:
+        """Fusionar segmentos conservando solo los postings vigentes"""
+        segments = dict(self.segments)
+        postings = defaultdict(list)
+        for name in names:
+            segment = segments.get(name) or Segment(self.path, name)
+            for term, (offset, count) in segment.terms.items():
+                for doc_id, tf in zip(segment.doc_ids[offset:offset + count], segment.frequencies[offset:offset + count]):
+                    if self.live.get(doc_id) == name:
+                        postings[term].append((doc_id, tf))
+            if name not in segments:
+                segment.close()
+
+        merged = Segment.write(self.path, postings)
+        for doc_id in self.live:
+            self.live[doc_id] = merged
+        return merged
+
+
+_indexes: Dict[str, LocalSearchIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_local_index(path: str) -> LocalSearchIndex:
+    """Instancia compartida por proceso para un directorio de índice"""
+    path = str(path)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = LocalSearchIndex(path)
+        return _indexes[path]
+
+
+@atexit.register
+def _flush_indexes():
+    """No perder los cambios pendientes al terminar el proceso"""
+    for index in list(_indexes.values()):
+        index.flush()
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from apps.knowledge_base.indexing import rebuild_queryset
+from apps.knowledge_base.search_backends import get_search_backend
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda full-text de los documentos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Documentos leídos por lote')
+        parser.add_argument('--missing-only', action='store_true', help='Solo documentos sin vector (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        documents = rebuild_queryset()
+
+        if options['missing_only']:
+            if backend.name != 'postgres':
+                self.stdout.write(self.style.WARNING('--missing-only solo aplica al backend PostgreSQL'))
+                return
+            documents = documents.filter(search_vector__isnull=True)
+            total = backend.index_documents(documents.iterator(chunk_size=options['batch_size']))
+        else:
+            total = backend.rebuild(documents.iterator(chunk_size=options['batch_size']))
+
+        self.stdout.write(self.style.SUCCESS(f'Documentos indexados ({backend.name}): {total}'))
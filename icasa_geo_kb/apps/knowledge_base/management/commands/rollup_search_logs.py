@@ -0,0 +1,27 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.knowledge_base import search_log
+
+class Command(BaseCommand):
+    help = 'Agrega los registros de búsqueda en las tablas diarias (ejecutar periódicamente, p. ej. cada 15 minutos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Días a recalcular, incluyendo hoy')
+        parser.add_argument('--prune-days', type=int, default=None, help='Eliminar registros crudos más antiguos que N días')
+
+    def handle(self, *args, **options):
+        # Escribir lo pendiente de este proceso antes de agregar
+        search_log.buffer.flush()
+
+        today = timezone.localdate()
+        for offset in range(options['days']):
+            day = today - timedelta(days=offset)
+            terms = search_log.rollup_day(day)
+            self.stdout.write(f'{day}: {terms} términos')
+
+        if options['prune_days'] is not None:
+            deleted = search_log.prune_logs(options['prune_days'])
+            self.stdout.write(f'Registros eliminados: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS('Rollup de búsquedas completado'))
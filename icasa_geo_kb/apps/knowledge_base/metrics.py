@@ -0,0 +1,127 @@
+"""
+Servicio de métricas (KPIs) precalculadas para los dashboards
+Calcula todos los indicadores con pocas consultas agregadas, guarda el
+resultado en cache con TTL y se invalida cuando cambia el estado de un documento
+"""
+from datetime import timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Q
+from django.utils import timezone
+
+from .models import Category, Document
+
+SNAPSHOT_CACHE_KEY = 'knowledge_base:kpi_snapshot'
+
+# Segundos de vida del snapshot (los indicadores por antigüedad se recalculan al expirar)
+SNAPSHOT_TTL = getattr(settings, 'KPI_SNAPSHOT_TTL', 300)
+
+# Horas máximas en revisión antes de considerarse fuera de SLA
+SLA_HOURS = 48
+
+
+def _percentage(part, total):
+    return round(part / total * 100, 1) if total > 0 else 0
+
+
+def compute_snapshot(now=None) -> Dict:
+    """Calcular todos los KPIs (una consulta agregada de documentos + categorías + usuarios)"""
+    if now is None:
+        now = timezone.now()
+
+    seven_days_ago = now - timedelta(days=7)
+    thirty_days_ago = now - timedelta(days=30)
+    ninety_days_ago = now - timedelta(days=90)
+    one_year_ago = now - timedelta(days=365)
+    sla_limit = now - timedelta(hours=SLA_HOURS)
+
+    totals = Document.objects.aggregate(
+        total=Count('id'),
+        draft=Count('id', filter=Q(status='draft')),
+        review=Count('id', filter=Q(status='review')),
+        approved=Count('id', filter=Q(status='approved')),
+        rejected=Count('id', filter=Q(status='rejected')),
+
+        # Tendencia semanal
+        created_last_week=Count('id', filter=Q(created_at__gte=seven_days_ago)),
+        created_prev_week=Count('id', filter=Q(
+            created_at__gte=seven_days_ago - timedelta(days=7), created_at__lt=seven_days_ago
+        )),
+
+        # Salud documental (aprobados actualizados en el último año)
+        vigentes=Count('id', filter=Q(status='approved', updated_at__gte=one_year_ago)),
+        por_vencer=Count('id', filter=Q(
+            status='approved', updated_at__gte=one_year_ago - timedelta(days=30), updated_at__lt=one_year_ago
+        )),
+        obsoletos=Count('id', filter=Q(
+            status='approved', updated_at__lt=one_year_ago - timedelta(days=30)
+        ) | Q(status='rejected')),
+
+        # Frescura del manual (cualquier documento actualizado en 90 días)
+        recientes=Count('id', filter=Q(updated_at__gte=ninety_days_ago)),
+        recientes_por_vencer=Count('id', filter=Q(
+            updated_at__lt=ninety_days_ago, updated_at__gte=ninety_days_ago - timedelta(days=30)
+        )),
+        desactualizados=Count('id', filter=Q(updated_at__lt=ninety_days_ago - timedelta(days=30))),
+
+        # SLA y actividad del mes
+        fuera_sla=Count('id', filter=Q(status='review', updated_at__lt=sla_limit)),
+        creados_mes=Count('id', filter=Q(created_at__gte=thirty_days_ago)),
+        aprobados_mes=Count('id', filter=Q(status='approved', updated_at__gte=thirty_days_ago)),
+        tiempo_promedio=Avg(
+            ExpressionWrapper(F('updated_at') - F('created_at'), output_field=DurationField()),
+            filter=Q(status='approved', created_at__gte=thirty_days_ago)
+        ),
+    )
+
+    # Top 5 categorías con documentos aprobados desactualizados
+    categorias_criticas = list(
+        Category.objects.annotate(
+            docs_obsoletos=Count('document', filter=Q(
+                document__updated_at__lt=ninety_days_ago,
+                document__status='approved'
+            ))
+        ).filter(docs_obsoletos__gt=0).order_by('-docs_obsoletos').values(
+            'id', 'name', 'slug', 'docs_obsoletos'
+        )[:5]
+    )
+
+    active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
+
+    total = totals['total']
+    last_week, prev_week = totals['created_last_week'], totals['created_prev_week']
+    if prev_week > 0:
+        docs_trend = round((last_week - prev_week) / prev_week * 100, 1)
+    else:
+        docs_trend = 100 if last_week > 0 else 0
+
+    tiempo_promedio = totals.pop('tiempo_promedio')
+
+    return {
+        'generated_at': now.isoformat(),
+        'documents': totals,
+        'docs_trend': docs_trend,
+        'approval_rate': _percentage(totals['approved'], totals['approved'] + totals['rejected']),
+        'salud_porcentaje': _percentage(totals['vigentes'], total),
+        'frescura_porcentaje': _percentage(totals['recientes'], total),
+        'tiempo_promedio_dias': tiempo_promedio.days if tiempo_promedio else 0,
+        'categorias_criticas': categorias_criticas,
+        'active_users': active_users,
+    }
+
+
+def get_snapshot(refresh: bool = False) -> Dict:
+    """Obtener el snapshot de KPIs desde cache (se recalcula si expiró o fue invalidado)"""
+    snapshot: Optional[Dict] = None if refresh else cache.get(SNAPSHOT_CACHE_KEY)
+    if snapshot is None:
+        snapshot = compute_snapshot()
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot, SNAPSHOT_TTL)
+    return snapshot
+
+
+def invalidate_snapshot():
+    """Descartar el snapshot (llamar cuando cambia el estado de un documento)"""
+    cache.delete(SNAPSHOT_CACHE_KEY)
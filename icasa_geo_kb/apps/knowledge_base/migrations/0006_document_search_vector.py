@@ -0,0 +1,32 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_gin_index(apps, schema_editor):
+    # El índice GIN sobre tsvector solo existe en PostgreSQL
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS knowledge_base_document_search_vector_gin '
+            'ON knowledge_base_document USING gin (search_vector)'
+        )
+
+
+def drop_gin_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS knowledge_base_document_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('knowledge_base', '0005_remove_category_created_by_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='document',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_gin_index, drop_gin_index),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-17 18:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('knowledge_base', '0006_document_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchZeroResultDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('term', models.CharField(max_length=255, verbose_name='Término')),
+                ('searches', models.PositiveIntegerField(default=0, verbose_name='Búsquedas')),
+            ],
+            options={
+                'verbose_name': 'Búsqueda sin Resultados por Día',
+                'verbose_name_plural': 'Búsquedas sin Resultados por Día',
+                'ordering': ['-date', '-searches'],
+                'unique_together': {('date', 'term')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTermDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Fecha')),
+                ('term', models.CharField(max_length=255, verbose_name='Término')),
+                ('searches', models.PositiveIntegerField(default=0, verbose_name='Búsquedas')),
+                ('users', models.PositiveIntegerField(default=0, verbose_name='Usuarios distintos')),
+            ],
+            options={
+                'verbose_name': 'Término Buscado por Día',
+                'verbose_name_plural': 'Términos Buscados por Día',
+                'ordering': ['-date', '-searches'],
+                'unique_together': {('date', 'term')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=255, verbose_name='Búsqueda')),
+                ('normalized_query', models.CharField(max_length=255, verbose_name='Búsqueda normalizada')),
+                ('results_count', models.PositiveIntegerField(default=0, verbose_name='Resultados')),
+                ('created_at', models.DateTimeField(verbose_name='Fecha')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='search_logs', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Registro de Búsqueda',
+                'verbose_name_plural': 'Registros de Búsqueda',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['created_at'], name='knowledge_b_created_036f52_idx'), models.Index(fields=['user', '-created_at'], name='knowledge_b_user_id_584038_idx')],
+            },
+        ),
+    ]
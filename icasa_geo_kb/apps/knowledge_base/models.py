@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
+from django.contrib.postgres.search import SearchVectorField
 from mptt.models import MPTTModel, TreeForeignKey
 from taggit.managers import TaggableManager
 from ckeditor_uploader.fields import RichTextUploadingField
@@ -74,6 +75,8 @@ class Document(ApprovalWorkflowModel):
     )
     version = models.PositiveIntegerField(default=1, verbose_name="Versión")
     is_public = models.BooleanField(default=False, verbose_name="Público")
+    # Vector de búsqueda ponderado (se mantiene en apps.knowledge_base.indexing, índice GIN solo en PostgreSQL)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         verbose_name = "Documento"
@@ -102,4 +105,57 @@ class Document(ApprovalWorkflowModel):
         return [tag.name for tag in self.tags.all()]
     
     def get_absolute_url(self):
-        return reverse('knowledge_base:document_detail', kwargs={'slug': self.slug})
\ No newline at end of file
+        return reverse('knowledge_base:document_detail', kwargs={'slug': self.slug})
+
+class SearchLog(models.Model):
+    """Registro crudo de búsquedas (se escribe por lotes desde apps.knowledge_base.search_log)"""
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='search_logs', verbose_name="Usuario")
+    query = models.CharField(max_length=255, verbose_name="Búsqueda")
+    normalized_query = models.CharField(max_length=255, verbose_name="Búsqueda normalizada")
+    results_count = models.PositiveIntegerField(default=0, verbose_name="Resultados")
+    created_at = models.DateTimeField(verbose_name="Fecha")
+    
+    class Meta:
+        verbose_name = "Registro de Búsqueda"
+        verbose_name_plural = "Registros de Búsqueda"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.query} ({self.results_count})"
+
+
+class SearchTermDaily(models.Model):
+    """Búsquedas por término y día (rollup de SearchLog)"""
+    date = models.DateField(verbose_name="Fecha")
+    term = models.CharField(max_length=255, verbose_name="Término")
+    searches = models.PositiveIntegerField(default=0, verbose_name="Búsquedas")
+    users = models.PositiveIntegerField(default=0, verbose_name="Usuarios distintos")
+    
+    class Meta:
+        verbose_name = "Término Buscado por Día"
+        verbose_name_plural = "Términos Buscados por Día"
+        unique_together = ['date', 'term']
+        ordering = ['-date', '-searches']
+    
+    def __str__(self):
+        return f"{self.date} - {self.term}: {self.searches}"
+
+
+class SearchZeroResultDaily(models.Model):
+    """Búsquedas sin resultados por término y día (rollup de SearchLog)"""
+    date = models.DateField(verbose_name="Fecha")
+    term = models.CharField(max_length=255, verbose_name="Término")
+    searches = models.PositiveIntegerField(default=0, verbose_name="Búsquedas")
+    
+    class Meta:
+        verbose_name = "Búsqueda sin Resultados por Día"
+        verbose_name_plural = "Búsquedas sin Resultados por Día"
+        unique_together = ['date', 'term']
+        ordering = ['-date', '-searches']
+    
+    def __str__(self):
+        return f"{self.date} - {self.term}: {self.searches}"
@@ -4,10 +4,12 @@ Implementa búsqueda full-text, filtros inteligentes y sugerencias automáticas
 """
 
 from django.db.models import Q, Count
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
 from django.utils import timezone
 from datetime import timedelta
-from .models import Document, Category
+from .models import Document, Category, SearchLog
+from . import search_log
+from .search_backends import get_search_backend
+from .suggestions import suggest
 import re
 
 class DocumentSearchEngine:
@@ -25,7 +27,7 @@ class DocumentSearchEngine:
         clean_query = re.sub(r'[^\w\s]', '', query.strip())
         
         # Base queryset con permisos
-        queryset = Document.objects.select_related('category', 'created_by')
+        queryset = Document.objects.select_related('category', 'created_by').defer('search_vector')
         
         # Aplicar permisos de usuario
         if not user.has_perm('knowledge_base.view_all_documents'):
@@ -33,18 +35,8 @@ class DocumentSearchEngine:
                 Q(status='approved') | Q(created_by=user)
             )
         
-        # Búsqueda PostgreSQL full-text
-        search_vector = SearchVector('title', weight='A') + \
-                       SearchVector('content', weight='B') + \
-                       SearchVector('document_code', weight='A') + \
-                       SearchVector('category__name', weight='C')
-        
-        search_query = SearchQuery(clean_query)
-        
-        queryset = queryset.annotate(
-            search=search_vector,
-            rank=SearchRank(search_vector, search_query)
-        ).filter(search=search_query).order_by('-rank', '-updated_at')
+        # Búsqueda full-text con el backend configurado (PostgreSQL o índice local)
+        queryset = get_search_backend().search(queryset, clean_query)
         
         # Aplicar filtros adicionales
         if filters:
@@ -70,35 +62,8 @@ class DocumentSearchEngine:
         if not query or len(query.strip()) < 2:
             return []
         
-        suggestions = []
-        
-        # Sugerencias de títulos de documentos
-        doc_titles = Document.objects.filter(
-            title__icontains=query,
-            status='approved'
-        ).values_list('title', flat=True)[:5]
-        
-        for title in doc_titles:
-            suggestions.append({
-                'type': 'document',
-                'text': title,
-                'icon': 'fas fa-file-alt',
-                'category': 'Documento'
-            })
-        
-        # Sugerencias de categorías
-        categories = Category.objects.filter(
-            name__icontains=query,
-            is_active=True
-        ).values_list('name', flat=True)[:3]
-        
-        for cat_name in categories:
-            suggestions.append({
-                'type': 'category',
-                'text': cat_name,
-                'icon': 'fas fa-folder',
-                'category': 'Categoría'
-            })
+        # Títulos, categorías y etiquetas desde el índice de prefijos en memoria
+        suggestions = suggest(query)
         
         # Sugerencias de términos comunes
         common_terms = DocumentSearchEngine._get_common_terms(query)
@@ -161,12 +126,13 @@ class DocumentSearchEngine:
     
     @staticmethod
     def get_search_analytics():
-        """Obtener analytics de búsquedas (para dashboard)"""
-        # Implementar tracking de búsquedas populares
+        """Obtener analytics de búsquedas (para dashboard) desde los rollups diarios"""
+        today = search_log.daily_totals()
         return {
-            'total_searches_today': 0,  # Implementar con modelo SearchLog
-            'popular_terms': [],        # Top términos buscados
-            'zero_results': 0,          # Búsquedas sin resultados
+            'total_searches_today': today['searches'],
+            'popular_terms': search_log.popular_terms(days=7),
+            'zero_results': today['zero_results'],
+            'zero_result_terms': search_log.popular_terms(days=7, zero_results=True),
         }
 
 class SmartSearchFilters:
@@ -202,18 +168,33 @@ class SearchHistory:
     
     @staticmethod
     def save_search(user, query, results_count):
-        """Guardar búsqueda en historial (implementar modelo SearchLog)"""
-        # TODO: Crear modelo SearchLog para tracking
-        pass
+        """Guardar búsqueda en historial (en memoria; se escribe por lotes)"""
+        if query and query.strip():
+            search_log.buffer.log(user, query.strip(), results_count)
     
     @staticmethod
     def get_user_history(user, limit=10):
-        """Obtener historial de búsquedas del usuario"""
-        # TODO: Implementar con modelo SearchLog
-        return []
+        """Obtener historial de búsquedas del usuario (más recientes primero, sin repetir)"""
+        pending = [
+            (entry.query, entry.normalized_query, entry.created_at)
+            for entry in reversed(search_log.buffer.pending()) if entry.user_id == user.id
+        ]
+        stored = SearchLog.objects.filter(user=user).values_list(
+            'query', 'normalized_query', 'created_at'
+        )[:limit * 5]
+        
+        history = []
+        seen = set()
+        for query, normalized, created_at in pending + list(stored):
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            history.append({'query': query, 'searched_at': created_at})
+            if len(history) >= limit:
+                break
+        return history
     
     @staticmethod
     def get_popular_searches(limit=10):
-        """Obtener búsquedas más populares"""
-        # TODO: Implementar con agregaciones
-        return []
\ No newline at end of file
+        """Obtener búsquedas más populares (últimos 30 días)"""
+        return search_log.popular_terms(days=30, limit=limit)
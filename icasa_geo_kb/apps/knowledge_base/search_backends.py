@@ -0,0 +1,99 @@
+"""
+Backends de búsqueda full-text para documentos
+- postgres: vector tsvector almacenado con índice GIN (ver indexing.py)
+- local: índice invertido en disco (ver local_index.py), para instalaciones con SQLite
+"""
+from typing import Iterable
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, When
+
+from . import indexing
+from .local_index import get_local_index
+from .models import Document
+
+# Candidatos que el índice local entrega antes de aplicar permisos y filtros
+LOCAL_CANDIDATES = 500
+
+
+class PostgresSearchBackend:
+    """Búsqueda sobre Document.search_vector"""
+    name = 'postgres'
+
+    def search(self, queryset, query: str):
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        search_query = SearchQuery(query, config=indexing.SEARCH_CONFIG)
+        return queryset.annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).filter(search_vector=search_query).order_by('-rank', '-updated_at')
+
+    def index_document(self, document: Document):
+        indexing.index_document(document)
+
+    def index_documents(self, documents: Iterable[Document]) -> int:
+        return indexing.index_documents(documents)
+
+    def remove_document(self, document_id: int):
+        pass  # el vector se elimina con la fila
+
+    def rebuild(self, documents: Iterable[Document]) -> int:
+        return indexing.index_documents(documents)
+
+
+class LocalSearchBackend:
+    """Búsqueda BM25 sobre el índice invertido local"""
+    name = 'local'
+
+    def __init__(self, path):
+        self.index = get_local_index(path)
+
+    def search(self, queryset, query: str):
+        if not self.index.exists():
+            # Primera búsqueda en una instalación nueva: construir el índice
+            self.rebuild(indexing.rebuild_queryset().iterator())
+
+        ranked = self.index.search(query, limit=LOCAL_CANDIDATES)
+        if not ranked:
+            return queryset.none()
+
+        ids = [doc_id for doc_id, _ in ranked]
+        ordering = Case(
+            *[When(pk=doc_id, then=position) for position, doc_id in enumerate(ids)],
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=ids).annotate(rank=ordering).order_by('rank')
+
+    def index_document(self, document: Document):
+        # Después de confirmar la transacción; la escritura se hace en lote (ver local_index.py)
+        def queue():
+            self.index.queue_document(document.pk, indexing.document_fields(document))
+        transaction.on_commit(queue)
+
+    def index_documents(self, documents: Iterable[Document]) -> int:
+        entries = [(document.pk, indexing.document_fields(document)) for document in documents]
+        self.index.add_documents(entries)
+        return len(entries)
+
+    def remove_document(self, document_id: int):
+        transaction.on_commit(lambda: self.index.queue_removal(document_id))
+
+    def rebuild(self, documents: Iterable[Document]) -> int:
+        entries = [(document.pk, indexing.document_fields(document)) for document in documents]
+        self.index.rebuild(entries)
+        return len(entries)
+
+
+def get_search_backend():
+    """
+    Backend configurado en KNOWLEDGE_SEARCH_BACKEND ('postgres' o 'local');
+    por defecto se elige según el motor de base de datos
+    """
+    name = getattr(settings, 'KNOWLEDGE_SEARCH_BACKEND', None)
+    if name is None:
+        name = 'postgres' if connection.vendor == 'postgresql' else 'local'
+
+    if name == 'postgres':
+        return PostgresSearchBackend()
+    return LocalSearchBackend(getattr(settings, 'SEARCH_INDEX_DIR', settings.BASE_DIR / 'search_index'))
@@ -0,0 +1,157 @@
+"""
+Registro de búsquedas con escritura por lotes y rollups diarios para analytics
+Las búsquedas se acumulan en memoria y se guardan con bulk_create desde un hilo
+aparte; los reportes leen las tablas diarias en lugar de los registros crudos
+"""
+import atexit
+import threading
+from datetime import date as date_type, datetime, time as time_type, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .local_index import fold_accents
+from .models import SearchLog, SearchTermDaily, SearchZeroResultDaily
+
+# Registros acumulados antes de forzar una escritura
+BATCH_SIZE = getattr(settings, 'SEARCH_LOG_BATCH_SIZE', 100)
+
+# Segundos máximos que un registro espera en memoria
+FLUSH_INTERVAL = getattr(settings, 'SEARCH_LOG_FLUSH_INTERVAL', 10)
+
+
+def normalize_query(query: str) -> str:
+    """Término normalizado para agrupar ('Política  de Calidad' -> 'politica de calidad')"""
+    return ' '.join(fold_accents(query or '').split())[:255]
+
+
+class SearchLogBuffer:
+    """Buffer en memoria de SearchLog que se vacía por tamaño o por tiempo"""
+
+    def __init__(self, batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: List[SearchLog] = []
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+
+    def log(self, user, query: str, results_count: int):
+        """Agregar una búsqueda al buffer (no toca la base de datos en la request)"""
+        entry = SearchLog(
+            user=user if user is not None and user.is_authenticated else None,
+            query=query[:255],
+            normalized_query=normalize_query(query),
+            results_count=results_count,
+            created_at=timezone.now(),
+        )
+        with self._lock:
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._flush_in_background()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self._flush_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def pending(self) -> List[SearchLog]:
+        with self._lock:
+            return list(self._pending)
+
+    def _take(self) -> List[SearchLog]:
+        with self._lock:
+            batch, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return batch
+
+    def _flush_in_background(self):
+        thread = threading.Thread(target=self._flush_thread, daemon=True)
+        thread.start()
+
+    def _flush_thread(self):
+        try:
+            self.flush()
+        finally:
+            # El hilo abre su propia conexión; se cierra al terminar
+            connections.close_all()
+
+    def flush(self) -> int:
+        """Guardar los registros pendientes con un solo bulk_create"""
+        batch = self._take()
+        if batch:
+            SearchLog.objects.bulk_create(batch, batch_size=500)
+        return len(batch)
+
+
+buffer = SearchLogBuffer()
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        buffer.flush()
+    except Exception:
+        pass  # la base de datos puede no estar disponible al terminar el proceso
+
+
+def _day_range(day: date_type):
+    start = timezone.make_aware(datetime.combine(day, time_type.min))
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(day: date_type) -> int:
+    """Recalcular (de forma idempotente) los rollups de un día; devuelve los términos agregados"""
+    start, end = _day_range(day)
+    rows = list(
+        SearchLog.objects.filter(created_at__gte=start, created_at__lt=end)
+        .values('normalized_query')
+        .annotate(
+            searches=Count('id'),
+            users=Count('user', distinct=True),
+            zero_results=Count('id', filter=Q(results_count=0)),
+        )
+    )
+
+    with transaction.atomic():
+        SearchTermDaily.objects.filter(date=day).delete()
+        SearchZeroResultDaily.objects.filter(date=day).delete()
+        SearchTermDaily.objects.bulk_create([
+            SearchTermDaily(date=day, term=row['normalized_query'], searches=row['searches'], users=row['users'])
+            for row in rows
+        ], batch_size=500)
+        SearchZeroResultDaily.objects.bulk_create([
+            SearchZeroResultDaily(date=day, term=row['normalized_query'], searches=row['zero_results'])
+            for row in rows if row['zero_results']
+        ], batch_size=500)
+    return len(rows)
+
+
+def prune_logs(keep_days: int) -> int:
+    """Eliminar registros crudos más antiguos que keep_days (los rollups se conservan)"""
+    limit, _ = _day_range(timezone.localdate() - timedelta(days=keep_days))
+    deleted, _ = SearchLog.objects.filter(created_at__lt=limit).delete()
+    return deleted
+
+
+def popular_terms(days: int = 7, limit: int = 10, zero_results: bool = False) -> List[dict]:
+    """Términos más buscados (o sin resultados) en los últimos días, desde los rollups"""
+    model = SearchZeroResultDaily if zero_results else SearchTermDaily
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return list(
+        model.objects.filter(date__gte=since)
+        .values('term')
+        .annotate(total=Sum('searches'))
+        .order_by('-total', 'term')[:limit]
+    )
+
+
+def daily_totals(day: Optional[date_type] = None) -> dict:
+    """Totales de un día desde los rollups"""
+    day = day or timezone.localdate()
+    searches = SearchTermDaily.objects.filter(date=day).aggregate(total=Sum('searches'))['total'] or 0
+    zero = SearchZeroResultDaily.objects.filter(date=day).aggregate(total=Sum('searches'))['total'] or 0
+    return {'searches': searches, 'zero_results': zero}
@@ -0,0 +1,110 @@
+"""
+Signals para la base de conocimiento
+"""
+from django.db.models import Count, Q
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from taggit.models import Tag, TaggedItem
+from .models import Category, Document
+from .metrics import invalidate_snapshot
+from .indexing import rebuild_queryset
+from .search_backends import get_search_backend
+from .suggestions import update_suggestions
+
+
+@receiver(post_init, sender=Document)
+def remember_document_status(sender, instance, **kwargs):
+    """Guardar el estado original para detectar cambios de estado al guardar"""
+    instance._original_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Document)
+def document_status_changed(sender, instance, created, **kwargs):
+    """Invalidar el snapshot de KPIs al crear un documento o cambiar su estado"""
+    if created or instance.status != instance._original_status:
+        invalidate_snapshot()
+    instance._original_status = instance.status
+
+
+@receiver(post_save, sender=Document)
+def document_saved_index(sender, instance, **kwargs):
+    """Mantener el índice de búsqueda del documento al guardar"""
+    get_search_backend().index_document(instance)
+
+
+@receiver(post_init, sender=Category)
+def remember_category_name(sender, instance, **kwargs):
+    instance._original_name = instance.__dict__.get('name')
+
+
+@receiver(post_save, sender=Category)
+def category_renamed(sender, instance, created, **kwargs):
+    """El nombre de la categoría forma parte del vector: reindexar sus documentos al renombrarla"""
+    if not created and instance.name != instance._original_name:
+        get_search_backend().index_documents(rebuild_queryset().filter(category=instance))
+    instance._original_name = instance.name
+
+
+@receiver(post_delete, sender=Document)
+def document_deleted(sender, instance, **kwargs):
+    invalidate_snapshot()
+    get_search_backend().remove_document(instance.pk)
+
+
+def _document_suggestion(instance):
+    """Texto del documento en las sugerencias (None si no aparece: solo los aprobados)"""
+    return instance.__dict__.get('title') if instance.__dict__.get('status') == 'approved' else None
+
+
+@receiver(post_init, sender=Document)
+def remember_document_suggestion(sender, instance, **kwargs):
+    instance._original_suggestion = _document_suggestion(instance)
+
+
+@receiver(post_save, sender=Document)
+def document_suggestion_changed(sender, instance, created, **kwargs):
+    """Solo se actualiza (y se avisa a los demás procesos) si cambió la entrada indexada"""
+    suggestion = _document_suggestion(instance)
+    if created or suggestion != instance._original_suggestion:
+        update_suggestions('document', instance.pk, suggestion)
+    instance._original_suggestion = suggestion
+
+
+@receiver(post_delete, sender=Document)
+def document_suggestion_deleted(sender, instance, **kwargs):
+    update_suggestions('document', instance.pk)
+
+
+def _category_suggestion(instance):
+    return instance.__dict__.get('name') if instance.__dict__.get('is_active') else None
+
+
+@receiver(post_init, sender=Category)
+def remember_category_suggestion(sender, instance, **kwargs):
+    instance._original_suggestion = _category_suggestion(instance)
+
+
+@receiver(post_save, sender=Category)
+def category_suggestion_changed(sender, instance, created, **kwargs):
+    suggestion = _category_suggestion(instance)
+    if created or suggestion != instance._original_suggestion:
+        update_suggestions('category', instance.pk, suggestion)
+    instance._original_suggestion = suggestion
+
+
+@receiver(post_delete, sender=Category)
+def category_suggestion_deleted(sender, instance, **kwargs):
+    update_suggestions('category', instance.pk)
+
+
+@receiver(post_save, sender=TaggedItem)
+@receiver(post_delete, sender=TaggedItem)
+def tag_suggestion_changed(sender, instance, **kwargs):
+    """Recontar los documentos aprobados de la etiqueta (su popularidad)"""
+    tag = Tag.objects.filter(pk=instance.tag_id).annotate(
+        documents=Count('document', filter=Q(document__status='approved'))
+    ).values_list('name', 'documents').first()
+    if tag and tag[1]:
+        update_suggestions('tag', instance.tag_id, tag[0], tag[1])
+    else:
+        update_suggestions('tag', instance.tag_id)
@@ -0,0 +1,242 @@
+"""
+Índice de prefijos en memoria para las sugerencias de búsqueda (typeahead)
+Indexa títulos de documentos aprobados, categorías activas y etiquetas en un
+arreglo ordenado de claves sin acentos; cada palabra de un texto es un punto
+de entrada, de modo que "cal" sugiere "Manual de Calidad"
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from taggit.models import Tag
+
+from .local_index import fold_accents
+from .models import Category, Document
+
+# Contador compartido de reconstrucciones (para que otros procesos recarguen el índice)
+GENERATION_CACHE_KEY = 'knowledge_base:suggestions:generation'
+
+# Prefijos cortos con su ranking en cache (son los más frecuentes y los de rangos más largos)
+SHORT_PREFIX = 3
+
+# Palabras de un texto que se usan como punto de entrada
+MAX_WORDS = 8
+
+LIMITS = {'document': 5, 'category': 3, 'tag': 3}
+TYPE_ORDER = {'document': 0, 'category': 1, 'tag': 2}
+PRESENTATION = {
+    'document': ('fas fa-file-alt', 'Documento'),
+    'category': ('fas fa-folder', 'Categoría'),
+    'tag': ('fas fa-tag', 'Etiqueta'),
+}
+
+WORD_START_RE = re.compile(r'\w+')
+
+_lock = threading.RLock()
+_index = None
+_index_generation = None
+
+
+def normalize(text: str) -> str:
+    return ' '.join(fold_accents(text or '').split())
+
+
+class SuggestionIndex:
+    """Arreglo ordenado de (clave, tipo, id) + entradas con texto y popularidad"""
+
+    def __init__(self):
+        self.keys: List[Tuple[str, str, int]] = []
+        self.entries: Dict[Tuple[str, int], dict] = {}
+        self.by_text: Dict[str, Tuple[str, int]] = {}
+        self._top: Dict[str, List[Tuple[str, int]]] = {}
+
+    @classmethod
+    def build(cls) -> 'SuggestionIndex':
+        """Construir el índice con tres consultas (las claves se ordenan una sola vez al final)"""
+        index = cls()
+        for document_id, title in Document.objects.filter(status='approved').values_list('id', 'title'):
+            index._store('document', document_id, title, 0)
+
+        for category_id, name, documents in Category.objects.filter(is_active=True).annotate(
+            documents=Count('document', filter=Q(document__status='approved'))
+        ).values_list('id', 'name', 'documents'):
+            index._store('category', category_id, name, documents)
+
+        for tag_id, name, documents in Tag.objects.annotate(
+            documents=Count('document', filter=Q(document__status='approved'))
+        ).filter(documents__gt=0).values_list('id', 'name', 'documents'):
+            index._store('tag', tag_id, name, documents)
+
+        index.keys.sort()
+        return index
+
+    def _store(self, kind: str, object_id: int, text: str, popularity: int) -> List[str]:
+        """Registrar la entrada y agregar sus claves al final (sin ordenar)"""
+        keys = self._entry_keys(text)
+        if keys:
+            self.keys.extend((key, kind, object_id) for key in keys)
+            self.entries[(kind, object_id)] = {'text': text, 'popularity': popularity, 'keys': keys}
+            self.by_text[normalize(text)] = (kind, object_id)
+        return keys
+
+    @staticmethod
+    def _entry_keys(text: str) -> List[str]:
+        folded = normalize(text)
+        return [folded[match.start():] for match in WORD_START_RE.finditer(folded)][:MAX_WORDS]
+
+    def _invalidate_top(self, keys: List[str]):
+        for key in keys:
+            for size in range(1, SHORT_PREFIX + 1):
+                self._top.pop(key[:size], None)
+
+    # Mutaciones incrementales
+
+    def upsert(self, kind: str, object_id: int, text: str, popularity: Optional[int] = None):
+        """Agregar o actualizar una entrada (popularity=None conserva la actual)"""
+        ref = (kind, object_id)
+        previous = self.entries.get(ref)
+        if previous is not None:
+            if popularity is None:
+                popularity = previous['popularity']
+            self.remove(kind, object_id)
+
+        keys = self._entry_keys(text)
+        if not keys:
+            return
+        for key in keys:
+            insort(self.keys, (key, kind, object_id))
+        self.entries[ref] = {'text': text, 'popularity': popularity or 0, 'keys': keys}
+        self.by_text[normalize(text)] = ref
+        self._invalidate_top(keys)
+
+    def remove(self, kind: str, object_id: int):
+        entry = self.entries.pop((kind, object_id), None)
+        if entry is None:
+            return
+        for key in entry['keys']:
+            position = bisect_left(self.keys, (key, kind, object_id))
+            if position < len(self.keys) and self.keys[position] == (key, kind, object_id):
+                del self.keys[position]
+        if self.by_text.get(normalize(entry['text'])) == (kind, object_id):
+            del self.by_text[normalize(entry['text'])]
+        self._invalidate_top(entry['keys'])
+
+    def bump(self, text: str, amount: int = 1) -> bool:
+        """Sumar popularidad a la entrada cuyo texto coincide exactamente"""
+        ref = self.by_text.get(normalize(text))
+        if ref is None:
+            return False
+        entry = self.entries[ref]
+        entry['popularity'] += amount
+        self._invalidate_top(entry['keys'])
+        return True
+
+    # Consultas
+
+    def _rank(self, refs) -> List[Tuple[str, int]]:
+        return sorted(
+            set(refs),
+            key=lambda ref: (-self.entries[ref]['popularity'], TYPE_ORDER[ref[0]], self.entries[ref]['text'])
+        )
+
+    def _matches(self, prefix: str) -> List[Tuple[str, int]]:
+        """Entradas con alguna palabra que empieza con el prefijo, ordenadas por popularidad"""
+        if len(prefix) <= SHORT_PREFIX and prefix in self._top:
+            return self._top[prefix]
+
+        refs = []
+        position = bisect_left(self.keys, (prefix,))
+        while position < len(self.keys) and self.keys[position][0].startswith(prefix):
+            _, kind, object_id = self.keys[position]
+            refs.append((kind, object_id))
+            position += 1
+
+        ranked = self._rank(refs)
+        if len(prefix) <= SHORT_PREFIX:
+            self._top[prefix] = ranked
+        return ranked
+
+    def suggest(self, query: str) -> List[dict]:
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        counts = dict.fromkeys(LIMITS, 0)
+        suggestions = []
+        remaining = sum(LIMITS.values())
+        for kind, object_id in self._matches(prefix):
+            if counts[kind] >= LIMITS[kind]:
+                continue
+            counts[kind] += 1
+            icon, label = PRESENTATION[kind]
+            suggestions.append({
+                'type': kind,
+                'text': self.entries[(kind, object_id)]['text'],
+                'icon': icon,
+                'category': label,
+            })
+            remaining -= 1
+            if not remaining:
+                break
+        return suggestions
+
+
+def get_suggestion_index() -> SuggestionIndex:
+    """Índice del proceso, reconstruido si otro proceso lo invalidó"""
+    global _index, _index_generation
+
+    generation = cache.get(GENERATION_CACHE_KEY, 0)
+    with _lock:
+        if _index is None or _index_generation != generation:
+            _index = SuggestionIndex.build()
+            _index_generation = generation
+        return _index
+
+
+def suggest(query: str) -> List[dict]:
+    """Sugerencias para un prefijo (títulos, categorías y etiquetas)"""
+    index = get_suggestion_index()
+    with _lock:
+        return index.suggest(query)
+
+
+def _publish_change():
+    """Avisar a los demás procesos; este proceso ya aplicó el cambio incremental"""
+    global _index_generation
+    try:
+        generation = cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        generation = 1
+        cache.set(GENERATION_CACHE_KEY, generation, None)
+    # Si otro proceso publicó cambios entretanto, se reconstruirá en la próxima consulta
+    if generation == (_index_generation or 0) + 1:
+        _index_generation = generation
+
+
+def update_suggestions(kind: str, object_id: int, text: Optional[str] = None, popularity: Optional[int] = None):
+    """
+    Actualizar (o eliminar si text es None) una entrada del índice al confirmar la transacción
+    El aviso a los demás procesos se publica siempre, aunque este proceso aún no tenga índice
+    (admin, shell, comandos o tareas en segundo plano)
+    """
+    def apply():
+        with _lock:
+            if _index is not None:
+                if text is None:
+                    _index.remove(kind, object_id)
+                else:
+                    _index.upsert(kind, object_id, text, popularity)
+            _publish_change()
+
+    transaction.on_commit(apply)
+
+
+def record_search(query: str):
+    """Sumar popularidad a la sugerencia que coincide con una búsqueda ejecutada"""
+    with _lock:
+        if _index is not None:
+            _index.bump(query)
@@ -3,7 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CategoryViewSet, DocumentViewSet,
     knowledge_base_dashboard, category_detail, document_detail, document_create, document_edit,
-    search_documents, search_suggestions, advanced_search, categories_management, category_create_ajax, category_templates
+    search_documents, search_suggestions, search_analytics_api, advanced_search, categories_management, category_create_ajax, category_templates
 )
 
 app_name = 'knowledge_base'
@@ -20,6 +20,7 @@ urlpatterns = [
     path('search/', search_documents, name='search'),
     path('search/advanced/', advanced_search, name='advanced_search'),
     path('search/suggestions/', search_suggestions, name='search_suggestions'),
+    path('search/analytics/', search_analytics_api, name='search_analytics'),
     path('categories/manage/', categories_management, name='categories_management'),
     path('categories/create/', category_create_ajax, name='category_create_ajax'),
     path('category/<slug:slug>/', category_detail, name='category_detail'),
@@ -9,6 +9,7 @@ from rest_framework.response import Response
 from .models import Category, Document
 from .serializers import CategorySerializer, DocumentSerializer
 from .forms import DocumentForm, CategoryForm
+from .metrics import get_snapshot
 
 class CategoryViewSet(viewsets.ModelViewSet):
     queryset = Category.objects.filter(is_active=True)
@@ -63,39 +64,36 @@ class DocumentViewSet(viewsets.ModelViewSet):
 @login_required
 def knowledge_base_dashboard(request):
     """Dashboard Ejecutivo Inteligente del Manual de Organización"""
-    from datetime import datetime, timedelta
-    from django.db.models import Count, Q, Avg
-    from django.utils import timezone
-    
-    # Categorías principales
-    main_categories = Category.objects.filter(parent=None, is_active=True)
-    
-    # Agregar documentos recientes a cada categoría
+    from django.db.models import OuterRef, Subquery
+    
+    # Categorías principales con el documento aprobado más reciente de su árbol (una sola consulta)
+    latest_document = Document.objects.filter(
+        category__tree_id=OuterRef('tree_id'), status='approved'
+    ).order_by('-updated_at').values('id')[:1]
+    main_categories = list(
+        Category.objects.filter(parent=None, is_active=True).annotate(latest_document_id=Subquery(latest_document))
+    )
+    latest_documents = Document.objects.in_bulk(
+        [category.latest_document_id for category in main_categories if category.latest_document_id]
+    )
     for category in main_categories:
-        category.recent_documents = Document.objects.filter(
-            category__in=category.get_descendants(include_self=True),
-            status='approved'
-        ).order_by('-updated_at')[:1]
+        document = latest_documents.get(category.latest_document_id)
+        category.recent_documents = [document] if document else []
     
     # === MÉTRICAS EJECUTIVAS INTELIGENTES ===
     
-    # 1. Índice de Salud Documental
-    now = timezone.now()
-    thirty_days = now - timedelta(days=30)
-    ninety_days = now - timedelta(days=90)
+    # KPIs precalculados (cache con TTL, se invalida al cambiar el estado de un documento)
+    kpis = get_snapshot()
+    documents = kpis['documents']
     
-    total_docs = Document.objects.count()
-    vigentes = Document.objects.filter(updated_at__gte=ninety_days).count()
-    por_vencer = Document.objects.filter(
-        updated_at__lt=ninety_days, updated_at__gte=ninety_days - timedelta(days=30)
-    ).count()
-    obsoletos = Document.objects.filter(updated_at__lt=ninety_days - timedelta(days=30)).count()
+    # 1. Índice de Salud Documental
+    total_docs = documents['total']
+    vigentes = documents['recientes']
+    por_vencer = documents['recientes_por_vencer']
+    obsoletos = documents['desactualizados']
     
     # 2. Documentos Fuera de SLA (más de 48 horas en revisión)
-    sla_limit = now - timedelta(hours=48)
-    docs_fuera_sla = Document.objects.filter(
-        status='review', updated_at__lt=sla_limit
-    ).count()
+    docs_fuera_sla = documents['fuera_sla']
     
     # 3. Mis Tareas Pendientes (personalizado por usuario)
     mis_pendientes = Document.objects.filter(
@@ -104,29 +102,11 @@ def knowledge_base_dashboard(request):
     )[:5]
     
     # 4. Top 5 Categorías con Documentos Desactualizados
-    categorias_criticas = Category.objects.annotate(
-        docs_obsoletos=Count('document', filter=Q(
-            document__updated_at__lt=ninety_days,
-            document__status='approved'
-        ))
-    ).filter(docs_obsoletos__gt=0).order_by('-docs_obsoletos')[:5]
+    categorias_criticas = kpis['categorias_criticas']
     
     # 5. Métricas de Actividad (últimos 30 días)
-    docs_creados_mes = Document.objects.filter(created_at__gte=thirty_days).count()
-    docs_aprobados_mes = Document.objects.filter(
-        status='approved', updated_at__gte=thirty_days
-    ).count()
-    
-    # 6. Tiempo Promedio de Aprobación
-    from django.db.models import F, ExpressionWrapper, DurationField
-    tiempo_promedio = Document.objects.filter(
-        status='approved', created_at__gte=thirty_days
-    ).aggregate(
-        promedio=Avg(ExpressionWrapper(
-            F('updated_at') - F('created_at'),
-            output_field=DurationField()
-        ))
-    )['promedio']
+    docs_creados_mes = documents['creados_mes']
+    docs_aprobados_mes = documents['aprobados_mes']
     
     # 7. Documentos más consultados (simulado - implementar tracking real)
     docs_populares = Document.objects.filter(status='approved').order_by('-updated_at')[:5]
@@ -159,13 +139,13 @@ def knowledge_base_dashboard(request):
         'vigentes': vigentes,
         'por_vencer': por_vencer, 
         'obsoletos': obsoletos,
-        'salud_porcentaje': round((vigentes / total_docs * 100) if total_docs > 0 else 0),
+        'salud_porcentaje': round(kpis['frescura_porcentaje']),
         
         # KPIs Ejecutivos
         'docs_fuera_sla': docs_fuera_sla,
         'docs_creados_mes': docs_creados_mes,
         'docs_aprobados_mes': docs_aprobados_mes,
-        'tiempo_promedio_dias': tiempo_promedio.days if tiempo_promedio else 0,
+        'tiempo_promedio_dias': kpis['tiempo_promedio_dias'],
         
         # Análisis
         'categorias_criticas': categorias_criticas,
@@ -351,7 +331,8 @@ def document_edit(request, slug):
 @login_required
 def search_documents(request):
     """Búsqueda avanzada de documentos con filtros"""
-    from .search import DocumentSearchEngine, SmartSearchFilters
+    from .search import DocumentSearchEngine, SmartSearchFilters, SearchHistory
+    from .suggestions import record_search
     
     query = request.GET.get('q', '')
     documents = []
@@ -373,6 +354,8 @@ def search_documents(request):
     if query:
         documents = DocumentSearchEngine.search_documents(query, request.user, filters)
         categories = DocumentSearchEngine.search_categories(query)
+        record_search(query)
+        SearchHistory.save_search(request.user, query, len(documents))
     
     # Obtener filtros disponibles
     available_filters = SmartSearchFilters.get_available_filters()
@@ -402,6 +385,20 @@ def search_suggestions(request):
         'count': len(suggestions)
     })
 
+@login_required
+def search_analytics_api(request):
+    """API de analytics de búsquedas (desde los rollups diarios)"""
+    from .search import DocumentSearchEngine, SearchHistory
+    
+    return JsonResponse({
+        'success': True,
+        'analytics': DocumentSearchEngine.get_search_analytics(),
+        'history': [
+            {'query': item['query'], 'searched_at': item['searched_at'].isoformat()}
+            for item in SearchHistory.get_user_history(request.user)
+        ],
+    })
+
 @login_required
 def advanced_search(request):
     """Página de búsqueda avanzada"""
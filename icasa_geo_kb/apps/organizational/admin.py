@@ -21,9 +21,9 @@ class DepartmentalChartAdmin(admin.ModelAdmin):
 
 @admin.register(Position)
 class PositionAdmin(admin.ModelAdmin):
-    list_display = ['title', 'department', 'level', 'reports_to', 'get_current_employee']
+    list_display = ['title', 'code', 'department', 'level', 'reports_to', 'get_current_employee']
     list_filter = ['department', 'level']
-    search_fields = ['title', 'department', 'responsibilities']
+    search_fields = ['title', 'code', 'department', 'responsibilities']
     
     def get_current_employee(self, obj):
         employee = obj.get_current_employee()
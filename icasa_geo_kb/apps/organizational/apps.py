@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class OrganizationalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.organizational'
-    verbose_name = 'Módulo Organizacional'
\ No newline at end of file
+    verbose_name = 'Módulo Organizacional'
+    
+    def ready(self):
+        import apps.organizational.signals
@@ -0,0 +1,117 @@
+"""
+Cache en disco de archivos exportados (Libro de Organización en PDF)
+El archivo se nombra con un hash del contenido del organigrama (id, chart_data, puestos del
+editor con su título, jefe y ocupante actuales, y versión): mientras el organigrama no cambie,
+las descargas se sirven desde MEDIA_ROOT
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Cambiar al modificar el diseño del PDF (invalida los archivos ya generados)
+RENDERER_VERSION = 2
+
+# Carpeta dentro de MEDIA_ROOT
+EXPORTS_DIR = getattr(settings, 'ORG_EXPORTS_DIR', 'exports/charts')
+
+# Segundos que un render se considera en curso (evita encolarlo dos veces)
+PENDING_TTL = getattr(settings, 'ORG_EXPORT_PENDING_TTL', 600)
+
+PENDING_CACHE_KEY = 'organizational:artifact:pending:{}'
+
+
+def _encode(value) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder).encode()
+
+
+def chart_content_hash(chart) -> str:
+    """Hash del contenido que determina el PDF y el diagrama"""
+    from .layout import structure_nodes
+
+    data = chart.structure_data()
+    digest = hashlib.sha256()
+    digest.update(f"{RENDERER_VERSION}:{chart.id}:{chart.version}:".encode())
+    digest.update(_encode(data))
+    positions = data.get('positions') or []
+    if positions and 'position_id' in positions[0]:
+        # Los puestos del editor solo guardan id y coordenadas; título, jefe y ocupante vienen de Position
+        digest.update(_encode(structure_nodes(data)))
+    return digest.hexdigest()
+
+
+def _chart_dir(chart_id: int) -> Path:
+    return Path(settings.MEDIA_ROOT) / EXPORTS_DIR / str(chart_id)
+
+
+def artifact_path(chart, kind: str = 'book') -> Path:
+    return _chart_dir(chart.id) / f"{kind}-{chart_content_hash(chart)[:32]}.pdf"
+
+
+def _error_path(path: Path) -> Path:
+    return path.with_suffix('.error')
+
+
+def artifact_status(path: Path) -> Dict:
+    """Estado del archivo: ready, failed, pending o missing"""
+    if path.exists():
+        return {'status': 'ready', 'path': path}
+    error_path = _error_path(path)
+    if error_path.exists():
+        return {'status': 'failed', 'path': path, 'error': error_path.read_text(encoding='utf-8')}
+    if cache.get(PENDING_CACHE_KEY.format(path.name)):
+        return {'status': 'pending', 'path': path}
+    return {'status': 'missing', 'path': path}
+
+
+def clear_pending(path):
+    cache.delete(PENDING_CACHE_KEY.format(Path(path).name))
+
+
+def request_book(chart) -> Dict:
+    """Devolver el PDF en cache o encolar su generación (una sola vez por contenido)"""
+    from .jobs import enqueue_book_render
+
+    path = artifact_path(chart)
+    status = artifact_status(path)
+    if status['status'] == 'failed':
+        # El error se informa una vez; la siguiente solicitud reintenta
+        _error_path(path).unlink(missing_ok=True)
+    elif status['status'] == 'missing':
+        if cache.add(PENDING_CACHE_KEY.format(path.name), True, PENDING_TTL):
+            enqueue_book_render(chart.id, str(path))
+        status['status'] = 'pending'
+    return status
+
+
+def render_book(chart_id: int, path: str) -> str:
+    """Generar el PDF en path (en el worker); escritura atómica con archivo temporal"""
+    from .exporters import PDFExporter
+    from .models import DepartmentalChart
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        chart = DepartmentalChart.objects.get(pk=chart_id)
+        with open(temp_path, 'wb') as output:
+            PDFExporter(chart).build_organizational_book(output)
+        os.replace(temp_path, path)
+    except Exception as e:
+        temp_path.unlink(missing_ok=True)
+        _error_path(path).write_text(str(e) or e.__class__.__name__, encoding='utf-8')
+        raise
+    finally:
+        clear_pending(path)
+
+    # Versiones anteriores del mismo organigrama ya no se sirven
+    kind = path.name.split('-', 1)[0]
+    for stale in path.parent.glob(f"{kind}-*"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    return str(path)
@@ -0,0 +1,221 @@
+"""
+Motor de la matriz de competencias (Empleados vs Habilidades)
+Carga todos los EmployeeSkill en una sola consulta y los guarda en matrices
+densas de NumPy para calcular resúmenes vectorizados
+"""
+from datetime import date as date_type, timedelta
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Employee, Skill, EmployeeSkill, JobProfile
+from .occupancy import OccupancyIndex
+
+# Códigos int8 de estado (0 = sin asignar)
+STATUS_CODES = {
+    'not_assigned': 0,
+    'needs_training': 1,
+    'training': 2,
+    'certified': 3,
+    'expired': 4,
+}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+STATUS_COLORS = {
+    'certified': 'green',
+    'training': 'yellow',
+    'needs_training': 'red',
+    'expired': 'gray',
+    'not_assigned': 'white',
+}
+
+NO_EXPIRY = np.datetime64('NaT', 'D')
+
+
+class CompetencyMatrix:
+    """Matriz densa empleado x habilidad con niveles y estados en int8"""
+
+    def __init__(self, employees: List[Employee], skills: List[Skill], records: Iterable[tuple]):
+        self.employees = employees
+        self.skills = skills
+
+        employee_ids = np.array([e.id for e in employees], dtype=np.int64)
+        skill_ids = np.array([s.id for s in skills], dtype=np.int64)
+
+        shape = (len(employees), len(skills))
+        self.levels = np.zeros(shape, dtype=np.int8)
+        self.statuses = np.zeros(shape, dtype=np.int8)
+        self.expiry = np.full(shape, NO_EXPIRY, dtype='datetime64[D]')
+
+        records = list(records)
+        if not records or not len(employees) or not len(skills):
+            return
+
+        # records: (employee_id, skill_id, level, status, expiry_date)
+        columns = list(zip(*records))
+        rec_employees = np.array(columns[0], dtype=np.int64)
+        rec_skills = np.array(columns[1], dtype=np.int64)
+
+        # Traducir IDs a índices de fila/columna con búsqueda binaria vectorizada
+        employee_order = np.argsort(employee_ids)
+        skill_order = np.argsort(skill_ids)
+        rows = np.searchsorted(employee_ids[employee_order], rec_employees)
+        cols = np.searchsorted(skill_ids[skill_order], rec_skills)
+        rows = np.clip(rows, 0, len(employee_ids) - 1)
+        cols = np.clip(cols, 0, len(skill_ids) - 1)
+        valid = (employee_ids[employee_order][rows] == rec_employees) & (skill_ids[skill_order][cols] == rec_skills)
+
+        rows = employee_order[rows[valid]]
+        cols = skill_order[cols[valid]]
+        self.levels[rows, cols] = np.array(columns[2], dtype=np.int8)[valid]
+        # Estados: se codifican los valores únicos y se expanden con el índice inverso
+        unique_statuses, inverse = np.unique(np.array(columns[3], dtype=object).astype(str), return_inverse=True)
+        status_codes = np.array([STATUS_CODES.get(status, 0) for status in unique_statuses], dtype=np.int8)
+        self.statuses[rows, cols] = status_codes[inverse][valid]
+        self.expiry[rows, cols] = np.array(
+            [d if d is not None else NO_EXPIRY for d in columns[4]], dtype='datetime64[D]'
+        )[valid]
+
+    @classmethod
+    def build(cls, employees=None, skills=None) -> 'CompetencyMatrix':
+        """Construir la matriz con una consulta por tabla (empleados, habilidades, competencias)"""
+        if employees is None:
+            employees = Employee.objects.filter(is_active=True).order_by('first_name', 'last_name')
+        if skills is None:
+            skills = Skill.objects.all().order_by('category', 'name')
+
+        employees = list(employees)
+        skills = list(skills)
+
+        records = EmployeeSkill.objects.filter(
+            employee__is_active=True
+        ).values_list('employee_id', 'skill_id', 'level', 'status', 'expiry_date')
+
+        return cls(employees, skills, records)
+
+    # Resúmenes vectorizados
+
+    def status_counts(self) -> Dict[int, Dict[str, int]]:
+        """Conteo de empleados por estado para cada habilidad"""
+        counts = {
+            name: np.count_nonzero(self.statuses == code, axis=0)
+            for name, code in STATUS_CODES.items()
+        }
+        total = len(self.employees)
+        coverage = np.count_nonzero(self.levels > 0, axis=0)
+
+        return {
+            skill.id: {
+                **{name: int(values[j]) for name, values in counts.items()},
+                'coverage': round(coverage[j] / total * 100, 1) if total else 0,
+            }
+            for j, skill in enumerate(self.skills)
+        }
+
+    def expiring_certifications(self, within_days: int = 90, today: Optional[date_type] = None) -> Dict[int, Dict[str, int]]:
+        """Certificaciones vencidas y por vencer (en los próximos within_days días) por habilidad"""
+        if today is None:
+            today = timezone.now().date()
+        start = np.datetime64(today, 'D')
+        limit = np.datetime64(today + timedelta(days=within_days), 'D')
+
+        has_expiry = ~np.isnat(self.expiry)
+        certified = self.statuses == STATUS_CODES['certified']
+        expired = np.count_nonzero(has_expiry & (self.expiry < start), axis=0)
+        expiring = np.count_nonzero(certified & has_expiry & (self.expiry >= start) & (self.expiry <= limit), axis=0)
+
+        return {
+            skill.id: {'expired': int(expired[j]), 'expiring': int(expiring[j])}
+            for j, skill in enumerate(self.skills)
+        }
+
+    def requirement_matrix(self, today: Optional[date_type] = None) -> np.ndarray:
+        """
+        Nivel requerido por empleado x habilidad según el JobProfile.technical_skills
+        del puesto que ocupa (acepta nombres de habilidad o {"name"/"skill", "level"})
+        """
+        if today is None:
+            today = timezone.now().date()
+
+        required = np.zeros(self.levels.shape, dtype=np.int8)
+        if not self.employees or not self.skills:
+            return required
+
+        skill_index = {skill.name.strip().lower(): j for j, skill in enumerate(self.skills)}
+        profiles = {
+            position_id: technical_skills
+            for position_id, technical_skills in JobProfile.objects.values_list('position_id', 'technical_skills')
+        }
+        occupancy = OccupancyIndex.load(list(profiles))
+
+        # Empleado -> fila de la matriz
+        employee_row = {employee.id: i for i, employee in enumerate(self.employees)}
+
+        for position_id, technical_skills in profiles.items():
+            employee = occupancy.employee_on(position_id, today)
+            if employee is None or employee.id not in employee_row:
+                continue
+            i = employee_row[employee.id]
+            for requirement in technical_skills or []:
+                if isinstance(requirement, dict):
+                    name = requirement.get('name') or requirement.get('skill') or ''
+                    level = int(requirement.get('level', 1) or 1)
+                else:
+                    name, level = str(requirement), 1
+                j = skill_index.get(name.strip().lower())
+                if j is not None:
+                    required[i, j] = max(required[i, j], level)
+
+        return required
+
+    def skill_gaps(self, today: Optional[date_type] = None) -> Dict[str, Dict[int, int]]:
+        """Brecha (niveles faltantes) respecto a los perfiles de puesto, por empleado y por habilidad"""
+        required = self.requirement_matrix(today)
+        gap = np.clip(required.astype(np.int16) - self.levels, 0, None)
+
+        per_employee = gap.sum(axis=1)
+        per_skill = np.count_nonzero(gap, axis=0)
+        return {
+            'employees': {employee.id: int(per_employee[i]) for i, employee in enumerate(self.employees)},
+            'skills': {skill.id: int(per_skill[j]) for j, skill in enumerate(self.skills)},
+        }
+
+    # Renderizado
+
+    def rows(self, start: int = 0, stop: Optional[int] = None) -> List[Dict]:
+        """Filas de la matriz (con celdas alineadas a self.skills) para un rango de empleados"""
+        result = []
+        for i in range(start, len(self.employees) if stop is None else min(stop, len(self.employees))):
+            cells = []
+            for j, skill in enumerate(self.skills):
+                status = STATUS_NAMES[int(self.statuses[i, j])]
+                cells.append({
+                    'skill': skill,
+                    'level': int(self.levels[i, j]),
+                    'status': status,
+                    'color': STATUS_COLORS[status],
+                })
+            result.append({'employee': self.employees[i], 'cells': cells})
+        return result
+
+    def to_json(self, start: int = 0, stop: Optional[int] = None) -> Dict:
+        """Representación JSON compacta (niveles y estados como listas de enteros)"""
+        stop = len(self.employees) if stop is None else min(stop, len(self.employees))
+        return {
+            'skills': [
+                {'id': skill.id, 'name': skill.name, 'category': skill.category}
+                for skill in self.skills
+            ],
+            'statuses': STATUS_NAMES,
+            'employees': [
+                {
+                    'id': employee.id,
+                    'employee_id': employee.employee_id,
+                    'name': f"{employee.first_name} {employee.last_name}",
+                    'levels': self.levels[i].tolist(),
+                    'statuses': self.statuses[i].tolist(),
+                }
+                for i, employee in enumerate(self.employees[start:stop], start=start)
+            ],
+        }
@@ -0,0 +1,83 @@
+"""
+Guardado en bloque de las coordenadas del organigrama interactivo
+El editor envía solo los puestos que movió junto con la versión del acomodo que
+cargó; si otro usuario guardó antes, la versión no coincide y se rechaza el cambio
+"""
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OrganigramLayout, Position
+from .org_tree import invalidate_org_tree
+
+LAYOUT_NAME = 'interactivo'
+
+# Filas por sentencia de bulk_update
+BATCH_SIZE = 500
+
+
+class StaleLayoutError(Exception):
+    """El acomodo cambió desde que el editor lo cargó"""
+
+    def __init__(self, current_version: int):
+        super().__init__(f"El organigrama fue modificado por otro usuario (versión actual {current_version})")
+        self.current_version = current_version
+
+
+def get_layout_version() -> int:
+    version = OrganigramLayout.objects.filter(name=LAYOUT_NAME).values_list('version', flat=True).first()
+    return version or 0
+
+
+def _bump_version(expected: Optional[int], user) -> int:
+    """Incrementar la versión si sigue siendo expected (compare-and-swap en un UPDATE)"""
+    OrganigramLayout.objects.get_or_create(name=LAYOUT_NAME)
+    layouts = OrganigramLayout.objects.filter(name=LAYOUT_NAME)
+    if expected is not None:
+        layouts = layouts.filter(version=expected)
+    user = user if user is not None and user.is_authenticated else None
+    if not layouts.update(version=F('version') + 1, updated_by=user, updated_at=timezone.now()):
+        raise StaleLayoutError(get_layout_version())
+    return get_layout_version()
+
+
+@transaction.atomic
+def save_coordinates(moved: Iterable[Dict], version: Optional[int] = None, user=None) -> Dict:
+    """
+    Guardar las coordenadas de los puestos movidos ({'id', 'x', 'y'})
+    Una consulta para leer, un bulk_update para escribir; no modifica updated_at
+    """
+    coordinates = {}
+    for item in moved:
+        coordinates[int(item['id'])] = (int(item['x']), int(item['y']))
+
+    new_version = _bump_version(version, user)
+
+    positions = Position.objects.only('id', 'x_position', 'y_position').in_bulk(list(coordinates))
+    changed = []
+    for position_id, (x, y) in coordinates.items():
+        position = positions.get(position_id)
+        if position is not None and (position.x_position, position.y_position) != (x, y):
+            position.x_position, position.y_position = x, y
+            changed.append(position)
+    Position.objects.bulk_update(changed, ['x_position', 'y_position'], batch_size=BATCH_SIZE)
+
+    if changed:
+        # bulk_update no dispara signals
+        transaction.on_commit(invalidate_org_tree)
+    return {
+        'updated_count': len(changed),
+        'ignored': [position_id for position_id in coordinates if position_id not in positions],
+        'version': new_version,
+    }
+
+
+@transaction.atomic
+def reset_coordinates(version: Optional[int] = None, user=None) -> Dict:
+    """Volver todos los puestos al diagrama automático (coordenadas en 0)"""
+    new_version = _bump_version(version, user)
+    updated = Position.objects.exclude(x_position=0, y_position=0).update(x_position=0, y_position=0)
+    transaction.on_commit(invalidate_org_tree)
+    return {'updated_count': updated, 'version': new_version}
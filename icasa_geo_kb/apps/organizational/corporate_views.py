@@ -5,17 +5,23 @@ Incluye sandbox, importación, exportación y flujos de aprobación
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.urls import reverse
 from django.core.files.uploadedfile import UploadedFile
 import json
 import pandas as pd
 from typing import Dict, Any
 
-from .models import DepartmentalChart, OrganizationalSnapshot, ImportLog, ApprovalWorkflow
-from .importers import get_importer, validate_import_file, generate_excel_template
-from .exporters import export_chart
+from .models import DepartmentalChart, OrganizationalSnapshot, ImportLog, ImportJob, ApprovalWorkflow
+from .importers import validate_import_file, generate_excel_template
+from .jobs import enqueue_import, job_progress
+from .exporters import export_chart, PDFExporter
+from .artifacts import artifact_path, artifact_status, request_book
+from .diff import cached_diff, chart_version_token
+from .snapshots import record_snapshot
+from .sandbox import MERGE_STRATEGIES, MergeConflictError
 
 # Decoradores de permisos
 def is_manager_or_admin(user):
@@ -92,9 +98,9 @@ def create_sandbox(request):
                 sandbox_chart.save()
             
             # Crear snapshot del estado inicial
-            OrganizationalSnapshot.objects.create(
-                chart=sandbox_chart,
-                snapshot_data=sandbox_chart.chart_data,
+            record_snapshot(
+                sandbox_chart,
+                sandbox_chart.structure_data(),
                 version_tag='sandbox-initial',
                 created_by=request.user,
                 notes='Estado inicial de la simulación'
@@ -164,23 +170,22 @@ def save_sandbox_changes(request, sandbox_id):
                     'error': 'Datos del organigrama requeridos'
                 })
             
-            # Crear snapshot del estado anterior
-            OrganizationalSnapshot.objects.create(
-                chart=sandbox_chart,
-                snapshot_data=sandbox_chart.chart_data,
+            # Crear snapshot del estado anterior (no se duplica si coincide con el último)
+            record_snapshot(
+                sandbox_chart,
+                sandbox_chart.structure_data(),
                 version_tag=f'auto-{timezone.now().strftime("%Y%m%d-%H%M%S")}',
                 created_by=request.user,
                 notes='Guardado automático antes de cambios'
             )
             
             # Actualizar datos
-            sandbox_chart.chart_data = new_chart_data
-            sandbox_chart.save()
+            sandbox_chart.set_structure_data(new_chart_data)
             
             # Crear snapshot del nuevo estado
-            OrganizationalSnapshot.objects.create(
-                chart=sandbox_chart,
-                snapshot_data=new_chart_data,
+            record_snapshot(
+                sandbox_chart,
+                sandbox_chart.structure_data(),
                 version_tag=f'save-{timezone.now().strftime("%Y%m%d-%H%M%S")}',
                 created_by=request.user,
                 notes=snapshot_notes or 'Cambios guardados'
@@ -292,31 +297,21 @@ def import_from_file(request):
             file_ext = import_file.name.split('.')[-1].lower()
             import_type = 'excel' if file_ext in ['xlsx', 'xls'] else file_ext
             
-            # Obtener importador
-            importer = get_importer(import_type, request.user)
-            
-            # Importar
-            if import_type in ['excel', 'csv']:
-                success, chart = importer.import_from_file(import_file, chart_name, department)
-            else:
+            if import_type not in ['excel', 'csv']:
                 return JsonResponse({
                     'success': False,
                     'error': f'Tipo de archivo no soportado: {file_ext}'
                 })
             
-            if success:
-                return JsonResponse({
-                    'success': True,
-                    'message': f'Organigrama importado exitosamente. Procesados: {importer.success_records} registros',
-                    'chart_id': chart.id,
-                    'warnings': importer.warnings,
-                    'errors': importer.errors
-                })
-            else:
-                return JsonResponse({
-                    'success': False,
-                    'error': f'Error en importación: {"; ".join(importer.errors)}'
-                })
+            # Guardar archivo y encolar (el worker procesa la importación fuera de la request)
+            job = enqueue_import(import_file, chart_name, department, import_type, request.user)
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Importación en cola. Puedes consultar su avance.',
+                'job_id': job.id,
+                'status_url': reverse('organizational:import_job_status', args=[job.id])
+            }, status=202)
                 
         except Exception as e:
             return JsonResponse({
@@ -326,6 +321,16 @@ def import_from_file(request):
     
     return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
 
+@login_required
+def import_job_status(request, job_id):
+    """Avance de una importación en segundo plano (para consultar periódicamente)"""
+    
+    job = get_object_or_404(ImportJob.objects.select_related('import_log'), id=job_id)
+    if job.created_by_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+    
+    return JsonResponse({'success': True, **job_progress(job)})
+
 # FUNCIONALIDADES DE EXPORTACIÓN
 
 @login_required
@@ -352,11 +357,23 @@ def export_menu(request, chart_id):
             'description': 'Tabla con todos los puestos para análisis de nómina y estadísticas',
             'icon': '📊'
         },
+        {
+            'type': 'csv',
+            'name': 'Estructura Plana (CSV)',
+            'description': 'Misma tabla en CSV; la descarga empieza de inmediato en organigramas grandes',
+            'icon': '🧾'
+        },
         {
             'type': 'powerpoint',
             'name': 'Presentación (PowerPoint)',
             'description': 'Slides editables para presentaciones ejecutivas',
             'icon': '📽️'
+        },
+        {
+            'type': 'svg',
+            'name': 'Diagrama (SVG)',
+            'description': 'Organigrama completo como imagen vectorial',
+            'icon': '🖼️'
         }
     ]
     
@@ -380,6 +397,9 @@ def export_chart_file(request, chart_id, export_type):
             'error': 'No tienes permisos para exportar esta simulación'
         }, status=403)
     
+    if export_type == 'pdf':
+        return _book_response(request, chart)
+    
     try:
         # Exportar usando el sistema de exportadores
         response = export_chart(chart, export_type)
@@ -391,6 +411,47 @@ def export_chart_file(request, chart_id, export_type):
             'error': f'Error al exportar: {str(e)}'
         }, status=500)
 
+def _book_response(request, chart):
+    """PDF desde la cache en disco; si no existe se genera en segundo plano (202)"""
+    
+    artifact = request_book(chart)
+    if artifact['status'] == 'ready':
+        return FileResponse(
+            open(artifact['path'], 'rb'),
+            as_attachment=True,
+            filename=PDFExporter(chart).book_filename(),
+            content_type='application/pdf'
+        )
+    
+    if artifact['status'] == 'failed':
+        return JsonResponse({
+            'success': False,
+            'error': f"Error al exportar: {artifact['error']}"
+        }, status=500)
+    
+    return JsonResponse({
+        'success': True,
+        'status': artifact['status'],
+        'status_url': reverse('organizational:export_book_status', args=[chart.id]),
+        'download_url': reverse('organizational:export_chart_file', args=[chart.id, 'pdf']),
+    }, status=202)
+
+@login_required
+def export_book_status(request, chart_id):
+    """Estado de la generación del Libro de Organización (para consultar periódicamente)"""
+    
+    chart = get_object_or_404(DepartmentalChart, id=chart_id)
+    if chart.is_sandbox and chart.created_by != request.user:
+        return JsonResponse({'success': False, 'error': 'Sin permisos'}, status=403)
+    
+    artifact = artifact_status(artifact_path(chart))
+    return JsonResponse({
+        'success': artifact['status'] != 'failed',
+        'status': artifact['status'],
+        'error': artifact.get('error'),
+        'download_url': reverse('organizational:export_chart_file', args=[chart.id, 'pdf']),
+    })
+
 # FUNCIONALIDADES DE APROBACIÓN
 
 @login_required
@@ -492,11 +553,25 @@ def process_approval(request, approval_id):
             
             # Procesar según la acción
             if action == 'approve':
-                # Aprobar y publicar cambios
-                success = approval_request.chart.approve_and_publish(
-                    approver=request.user,
-                    justification=notes
-                )
+                # Aprobar y publicar cambios (fusionando con otra simulación ya publicada)
+                conflict_strategy = data.get('conflict_strategy')
+                if conflict_strategy not in (None, *MERGE_STRATEGIES):
+                    return JsonResponse({
+                        'success': False,
+                        'error': 'Estrategia de conflictos inválida. Debe ser "ours" o "theirs"'
+                    })
+                try:
+                    success = approval_request.chart.approve_and_publish(
+                        approver=request.user,
+                        justification=notes,
+                        conflict_strategy=conflict_strategy
+                    )
+                except MergeConflictError as e:
+                    return JsonResponse({
+                        'success': False,
+                        'error': f'No se puede publicar la simulación: {e}',
+                        'conflicts': e.conflicts
+                    }, status=409)
                 
                 if success:
                     approval_request.status = 'approved'
@@ -567,29 +642,15 @@ def get_version_diff(request, chart_id, version1_id, version2_id):
     try:
         chart = get_object_or_404(DepartmentalChart, id=chart_id)
         
-        # Obtener las dos versiones a comparar
-        if version1_id == 'current':
-            version1_data = chart.chart_data
-        else:
-            snapshot1 = get_object_or_404(OrganizationalSnapshot, id=version1_id, chart=chart)
-            version1_data = snapshot1.snapshot_data
-        
-        if version2_id == 'current':
-            version2_data = chart.chart_data
-        else:
-            snapshot2 = get_object_or_404(OrganizationalSnapshot, id=version2_id, chart=chart)
-            version2_data = snapshot2.snapshot_data
-        
-        # Calcular diferencias (implementación simplificada)
-        differences = {
-            'added_positions': [],
-            'removed_positions': [],
-            'modified_positions': [],
-            'summary': 'Comparación de versiones realizada'
-        }
+        # Obtener las dos versiones a comparar (en cache por par de versiones)
+        def version(version_id):
+            if version_id == 'current':
+                return chart_version_token(chart), chart.structure_data
+            snapshot = get_object_or_404(OrganizationalSnapshot, id=version_id, chart=chart)
+            return f"snapshot-{snapshot.id}", snapshot.get_data
         
-        # Aquí iría la lógica completa de comparación
-        # Por simplicidad, retornamos estructura básica
+        (token1, load1), (token2, load2) = version(version1_id), version(version2_id)
+        differences = cached_diff(token1, token2, load1, load2)
         
         return JsonResponse({
             'success': True,
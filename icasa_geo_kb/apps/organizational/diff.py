@@ -0,0 +1,205 @@
+"""
+Comparación estructural de dos versiones de un organigrama
+Cada puesto recibe un hash de sus datos y de su subárbol (árbol de Merkle); al recorrer
+la versión nueva, los subárboles con el mismo hash en ambas versiones se omiten completos
+"""
+import hashlib
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .hierarchy import Hierarchy
+from .layout import structure_nodes
+from .org_tree import GENERATION_CACHE_KEY
+
+DIFF_CACHE_KEY = 'organizational:diff:v2:{}:{}:{}'
+DIFF_CACHE_TTL = getattr(settings, 'ORG_DIFF_CACHE_TTL', 60 * 60 * 24)
+
+
+class HashedTree:
+    """Puestos de una versión con sus datos y el hash de su subárbol"""
+
+    def __init__(self, nodes: List[Dict]):
+        # La primera aparición de una clave gana (igual que la jerarquía)
+        self.nodes: Dict[str, Dict] = {}
+        for node in nodes:
+            self.nodes.setdefault(node['key'], node)
+        keys = list(self.nodes)
+        self.hierarchy = Hierarchy(keys, [self.nodes[key]['reports_to'] for key in keys])
+
+        hierarchy = self.hierarchy
+        n = len(keys)
+        # Recorrido en anchura; los ciclos se recorren desde su primer puesto
+        order: List[int] = []
+        seen = bytearray(n)
+        for start in hierarchy.roots + [cycle[0] for cycle in hierarchy.cycles]:
+            if seen[start]:
+                continue
+            seen[start] = 1
+            order.append(start)
+            head = len(order) - 1
+            while head < len(order):
+                i = order[head]
+                head += 1
+                for c in hierarchy.get_children(i):
+                    if not seen[c]:
+                        seen[c] = 1
+                        order.append(c)
+
+        # Datos propios como tupla (comparación directa) y hash del subárbol
+        self.own: List[tuple] = [()] * n
+        self.subtree_hash: List[bytes] = [b''] * n
+        child_hashes: List[List[bytes]] = [[] for _ in range(n)]
+        parents = hierarchy.parent
+        for i in reversed(order):
+            node = self.nodes[keys[i]]
+            own = (node.get('title') or '', node.get('department') or '', node.get('employee') or '')
+            self.own[i] = own
+            digest = hashlib.blake2b(f"{keys[i]}\0{own[0]}\0{own[1]}\0{own[2]}".encode(), digest_size=16)
+            hashes = child_hashes[i]
+            if hashes:
+                hashes.sort()
+                digest.update(b''.join(hashes))
+            subtree_hash = self.subtree_hash[i] = digest.digest()
+            parent = parents[i]
+            if parent >= 0 and not self.subtree_hash[parent]:
+                child_hashes[parent].append(subtree_hash)
+
+    def parent_key(self, i: int) -> Optional[str]:
+        parent = self.hierarchy.parent[i]
+        return self.hierarchy.keys[parent] if parent >= 0 else None
+
+
+def _position(node: Dict) -> Dict:
+    return {
+        'id': node['key'],
+        'title': node.get('title') or '',
+        'department': node.get('department') or '',
+        'reports_to': node.get('reports_to'),
+    }
+
+
+def diff_trees(old: HashedTree, new: HashedTree) -> Dict:
+    """Altas, bajas, cambios de jefe, de nombre, de ocupante y de departamento entre dos versiones"""
+    old_index = old.hierarchy.index
+    new_keys = new.hierarchy.keys
+
+    moved, renamed, occupants, modified = [], [], [], []
+    compared = 0
+    stack = list(new.hierarchy.roots) + [cycle[0] for cycle in new.hierarchy.cycles]
+    visited = bytearray(len(new_keys))
+    while stack:
+        i = stack.pop()
+        if visited[i]:
+            continue
+        visited[i] = 1
+        key = new_keys[i]
+        j = old_index.get(key)
+        if j is not None and old.subtree_hash[j] == new.subtree_hash[i] and old.parent_key(j) == new.parent_key(i):
+            # Subárbol idéntico: ni el puesto ni sus subordinados cambiaron
+            continue
+        compared += 1
+        stack.extend(new.hierarchy.get_children(i))
+        if j is None or old.own[j] == new.own[i] and old.parent_key(j) == new.parent_key(i):
+            continue
+
+        before, after = old.nodes[key], new.nodes[key]
+        changes = []
+        if old.parent_key(j) != new.parent_key(i):
+            changes.append('reports_to')
+            moved.append({
+                'id': key,
+                'title': after.get('title') or '',
+                'from': old.parent_key(j),
+                'from_title': old.nodes[old.parent_key(j)]['title'] if old.parent_key(j) else None,
+                'to': new.parent_key(i),
+                'to_title': new.nodes[new.parent_key(i)]['title'] if new.parent_key(i) else None,
+            })
+        if (before.get('title') or '') != (after.get('title') or ''):
+            changes.append('title')
+            renamed.append({'id': key, 'from': before.get('title') or '', 'to': after.get('title') or ''})
+        if (before.get('employee') or '') != (after.get('employee') or ''):
+            changes.append('employee')
+            occupants.append({
+                'id': key,
+                'title': after.get('title') or '',
+                'from': before.get('employee') or None,
+                'to': after.get('employee') or None,
+            })
+        if (before.get('department') or '') != (after.get('department') or ''):
+            changes.append('department')
+        modified.append({**_position(after), 'changes': changes})
+
+    added = [_position(new.nodes[key]) for key in new_keys if key not in old_index]
+    removed = [_position(old.nodes[key]) for key in old.hierarchy.keys if key not in new.hierarchy.index]
+
+    # Los cambios de departamento solo tienen detalle en modified_positions
+    departments = sum(1 for entry in modified if 'department' in entry['changes'])
+    counts = [
+        (len(added), 'alta', 'altas'),
+        (len(removed), 'baja', 'bajas'),
+        (len(moved), 'cambio de jefe', 'cambios de jefe'),
+        (len(renamed), 'cambio de nombre', 'cambios de nombre'),
+        (len(occupants), 'cambio de ocupante', 'cambios de ocupante'),
+        (departments, 'cambio de departamento', 'cambios de departamento'),
+    ]
+    summary = ', '.join(f"{count} {singular if count == 1 else plural}" for count, singular, plural in counts if count)
+
+    return {
+        'added_positions': added,
+        'removed_positions': removed,
+        'moved_positions': moved,
+        'renamed_positions': renamed,
+        'occupant_changes': occupants,
+        'modified_positions': modified,
+        'summary': summary or 'Sin cambios en la estructura',
+        'compared_positions': compared,
+    }
+
+
+def empty_diff(summary: str) -> Dict:
+    """Resultado sin diferencias con la misma forma que diff_trees"""
+    return {
+        'added_positions': [],
+        'removed_positions': [],
+        'moved_positions': [],
+        'renamed_positions': [],
+        'occupant_changes': [],
+        'modified_positions': [],
+        'summary': summary,
+        'compared_positions': 0,
+    }
+
+
+def diff_structures(old_data: Dict, new_data: Dict) -> Dict:
+    """Comparar dos payloads de chart_data o de instantáneas"""
+    return diff_trees(HashedTree(structure_nodes(old_data)), HashedTree(structure_nodes(new_data)))
+
+
+def cached_diff(old_token: str, new_token: str, load_old, load_new) -> Dict:
+    """
+    Diferencias en cache por par de versiones
+    Los tokens identifican el contenido (id de instantánea o hash del organigrama); la
+    generación del árbol entra en la clave porque los puestos del editor se completan con Position
+    """
+    key = DIFF_CACHE_KEY.format(cache.get(GENERATION_CACHE_KEY, 0), old_token, new_token)
+    result = cache.get(key)
+    if result is None:
+        result = diff_structures(load_old(), load_new())
+        cache.set(key, result, DIFF_CACHE_TTL)
+    return result
+
+
+def chart_version_token(chart) -> str:
+    from .artifacts import chart_content_hash
+
+    return f"chart-{chart.id}-{chart_content_hash(chart)[:32]}"
+
+
+def diff_charts(old_chart, new_chart) -> Dict:
+    """Diferencias entre dos organigramas (p. ej. una simulación y su original)"""
+    return cached_diff(
+        chart_version_token(old_chart), chart_version_token(new_chart),
+        old_chart.structure_data, new_chart.structure_data
+    )
@@ -2,11 +2,13 @@
 Exportadores corporativos para organigramas
 Soporta PDF, Excel, PowerPoint, Visio y formatos corporativos
 """
-import pandas as pd
+import csv
+import tempfile
 from io import BytesIO
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.utils.functional import cached_property
 from reportlab.lib.pagesizes import letter, A4, A3
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -18,6 +20,8 @@ import json
 from datetime import datetime
 from typing import Dict, List, Any, Optional
 from .models import DepartmentalChart
+from .layout import get_chart_layout
+from .rendering import page_drawing, pptx_available, render_pptx, render_svg
 
 class BaseExporter:
     """Clase base para exportadores"""
@@ -26,6 +30,11 @@ class BaseExporter:
         self.chart = chart
         self.export_date = datetime.now()
     
+    @cached_property
+    def structure(self) -> Dict:
+        """Contenido del organigrama (en simulaciones incluye sus cambios)"""
+        return self.chart.structure_data()
+    
     def get_chart_metadata(self) -> Dict:
         """Obtener metadatos del organigrama"""
         return {
@@ -43,12 +52,30 @@ class BaseExporter:
 class PDFExporter(BaseExporter):
     """Exportador a PDF corporativo con branding ICASA"""
     
+    # Espacio para el diagrama dentro de los márgenes de A4 (puntos)
+    DIAGRAM_FRAME = (A4[0] - 144, A4[1] - 200)
+    
+    def book_filename(self) -> str:
+        return f"Libro_Organizacion_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.pdf"
+    
     def export_organizational_book(self) -> HttpResponse:
-        """Exportar 'Libro de Organización' completo en PDF"""
+        """Exportar 'Libro de Organización' completo en PDF (síncrono; ver artifacts.py)"""
         
         buffer = BytesIO()
+        self.build_organizational_book(buffer)
+        
+        # Preparar respuesta
+        buffer.seek(0)
+        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{self.book_filename()}"'
+        
+        return response
+    
+    def build_organizational_book(self, output):
+        """Generar el PDF del 'Libro de Organización' en un archivo o buffer"""
+        
         doc = SimpleDocTemplate(
-            buffer,
+            output,
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
@@ -107,14 +134,6 @@ class PDFExporter(BaseExporter):
         
         # Generar PDF
         doc.build(story)
-        
-        # Preparar respuesta
-        buffer.seek(0)
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-        filename = f"Libro_Organizacion_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        return response
     
     def _create_cover_page(self, title_style, styles) -> List:
         """Crear portada del documento"""
@@ -205,7 +224,7 @@ class PDFExporter(BaseExporter):
         return general_info
     
     def _create_visual_chart(self, heading_style, styles) -> List:
-        """Crear representación visual del organigrama"""
+        """Crear el diagrama del organigrama (dibujo vectorial paginado)"""
         
         visual_content = [
             Paragraph("2. ORGANIGRAMA VISUAL", heading_style),
@@ -214,56 +233,18 @@ class PDFExporter(BaseExporter):
             Spacer(1, 0.3*inch)
         ]
         
-        # Aquí iría la lógica para generar el diagrama visual
-        # Por simplicidad, creamos una tabla jerárquica
-        if self.chart.chart_data and 'positions' in self.chart.chart_data:
-            positions = self.chart.chart_data['positions']
-            
-            # Agrupar por nivel
-            levels = {}
-            for pos in positions:
-                level = pos.get('level', 1)
-                if level not in levels:
-                    levels[level] = []
-                levels[level].append(pos)
-            
-            # Crear tabla por niveles
-            for level in sorted(levels.keys()):
-                level_positions = levels[level]
-                
-                visual_content.append(Paragraph(f"Nivel {level}:", styles['Heading4']))
-                
-                # Crear tabla para este nivel
-                pos_data = [['Puesto', 'Empleado Actual', 'Reporta a']]
-                
-                for pos in level_positions:
-                    reports_to = ""
-                    if pos.get('reports_to'):
-                        # Buscar el nombre del jefe
-                        for p in positions:
-                            if p['id'] == pos['reports_to']:
-                                reports_to = p['title']
-                                break
-                    
-                    pos_data.append([
-                        pos['title'],
-                        pos.get('current_employee', 'VACANTE'),
-                        reports_to
-                    ])
-                
-                pos_table = Table(pos_data, colWidths=[2.5*inch, 2*inch, 2*inch])
-                pos_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#8BC34A')),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 9),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey)
-                ]))
-                
-                visual_content.extend([pos_table, Spacer(1, 0.2*inch)])
+        if not self.structure.get('positions'):
+            return visual_content
+        
+        layout = get_chart_layout(self.chart, page_size=self.DIAGRAM_FRAME)
+        pages = layout['pages']
+        for number, page in enumerate(pages):
+            if number:
+                visual_content.extend([
+                    PageBreak(),
+                    Paragraph(f"Organigrama (página {number + 1} de {len(pages)})", styles['Heading4']),
+                ])
+            visual_content.append(page_drawing(layout, page, *self.DIAGRAM_FRAME))
         
         return visual_content
     
@@ -275,8 +256,8 @@ class PDFExporter(BaseExporter):
             Spacer(1, 0.2*inch)
         ]
         
-        if self.chart.chart_data and 'positions' in self.chart.chart_data:
-            positions = self.chart.chart_data['positions']
+        if 'positions' in self.structure:
+            positions = self.structure['positions']
             
             for i, pos in enumerate(positions):
                 descriptions.extend([
@@ -304,8 +285,8 @@ class PDFExporter(BaseExporter):
         ]
         
         # Crear matriz RACI (Responsible, Accountable, Consulted, Informed)
-        if self.chart.chart_data and 'positions' in self.chart.chart_data:
-            positions = self.chart.chart_data['positions']
+        if 'positions' in self.structure:
+            positions = self.structure['positions']
             
             # Procesos típicos (esto podría venir de la base de datos)
             processes = [
@@ -383,113 +364,141 @@ class PDFExporter(BaseExporter):
         
         return appendices
 
+class _Echo:
+    """Buffer mínimo para csv.writer: devuelve la línea en lugar de guardarla"""
+    
+    def write(self, value):
+        return value
+
 class ExcelExporter(BaseExporter):
     """Exportador a Excel para análisis y nómina"""
     
-    def export_flat_structure(self) -> HttpResponse:
-        """Exportar estructura plana para análisis"""
+    FLAT_COLUMNS = [
+        'ID_Puesto', 'Nombre_Puesto', 'Departamento', 'Nivel', 'ID_Jefe', 'Nombre_Jefe',
+        'Empleado_Actual', 'Responsabilidades', 'Estado', 'Fecha_Actualizacion'
+    ]
+    
+    def iter_flat_rows(self, stats: Dict = None):
+        """Filas de la estructura plana (una pasada; el jefe se resuelve con un diccionario)"""
         
-        # Crear DataFrame
-        data = []
+        positions = self.structure.get('positions', [])
+        titles = {pos.get('id'): pos.get('title', '') for pos in positions}
+        export_date = self.export_date.strftime('%d/%m/%Y')
         
-        if self.chart.chart_data and 'positions' in self.chart.chart_data:
-            positions = self.chart.chart_data['positions']
+        for pos in positions:
+            boss_id = pos.get('reports_to')
+            employee = pos.get('current_employee')
+            level = pos.get('level', 1)
             
-            for pos in positions:
-                # Buscar nombre del jefe
-                reports_to_name = ""
-                if pos.get('reports_to'):
-                    for p in positions:
-                        if p['id'] == pos['reports_to']:
-                            reports_to_name = p['title']
-                            break
-                
-                data.append({
-                    'ID_Puesto': pos['id'],
-                    'Nombre_Puesto': pos['title'],
-                    'Departamento': pos['department'],
-                    'Nivel': pos.get('level', 1),
-                    'ID_Jefe': pos.get('reports_to', ''),
-                    'Nombre_Jefe': reports_to_name,
-                    'Empleado_Actual': pos.get('current_employee', 'VACANTE'),
-                    'Responsabilidades': pos.get('responsibilities', ''),
-                    'Estado': 'Ocupado' if pos.get('current_employee') else 'Vacante',
-                    'Fecha_Actualizacion': self.export_date.strftime('%d/%m/%Y')
-                })
-        
-        df = pd.DataFrame(data)
-        
-        # Crear archivo Excel
-        buffer = BytesIO()
-        with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-            # Hoja principal
-            df.to_excel(writer, sheet_name='Estructura_Organizacional', index=False)
-            
-            # Hoja de estadísticas
-            stats_data = {
-                'Métrica': [
-                    'Total de Puestos',
-                    'Puestos Ocupados',
-                    'Puestos Vacantes',
-                    'Porcentaje de Ocupación',
-                    'Niveles Jerárquicos'
-                ],
-                'Valor': [
-                    len(data),
-                    len([d for d in data if d['Estado'] == 'Ocupado']),
-                    len([d for d in data if d['Estado'] == 'Vacante']),
-                    f"{(len([d for d in data if d['Estado'] == 'Ocupado']) / len(data) * 100):.1f}%" if data else "0%",
-                    len(set(d['Nivel'] for d in data)) if data else 0
-                ]
-            }
+            if stats is not None:
+                stats['total'] += 1
+                stats['occupied'] += 1 if employee else 0
+                stats['levels'].add(level)
             
-            stats_df = pd.DataFrame(stats_data)
-            stats_df.to_excel(writer, sheet_name='Estadisticas', index=False)
+            yield [
+                pos.get('id'),
+                pos.get('title', ''),
+                pos.get('department', ''),
+                level,
+                boss_id or '',
+                titles.get(boss_id, '') if boss_id else '',
+                employee or 'VACANTE',
+                pos.get('responsibilities', ''),
+                'Ocupado' if employee else 'Vacante',
+                export_date
+            ]
+    
+    def export_flat_structure(self) -> FileResponse:
+        """Exportar estructura plana para análisis (libro write-only enviado por bloques)"""
+        
+        from openpyxl import Workbook
+        
+        workbook = Workbook(write_only=True)
+        
+        # Hoja principal: las filas se escriben a disco a medida que se generan
+        sheet = workbook.create_sheet('Estructura_Organizacional')
+        sheet.append(self.FLAT_COLUMNS)
+        stats = {'total': 0, 'occupied': 0, 'levels': set()}
+        for row in self.iter_flat_rows(stats):
+            sheet.append(row)
+        
+        # Hoja de estadísticas (calculadas en la misma pasada)
+        total, occupied = stats['total'], stats['occupied']
+        stats_sheet = workbook.create_sheet('Estadisticas')
+        stats_sheet.append(['Métrica', 'Valor'])
+        stats_sheet.append(['Total de Puestos', total])
+        stats_sheet.append(['Puestos Ocupados', occupied])
+        stats_sheet.append(['Puestos Vacantes', total - occupied])
+        stats_sheet.append(['Porcentaje de Ocupación', f"{occupied / total * 100:.1f}%" if total else "0%"])
+        stats_sheet.append(['Niveles Jerárquicos', len(stats['levels'])])
+        
+        # Archivo temporal en disco (no en memoria); FileResponse lo envía por bloques
+        output = tempfile.TemporaryFile()
+        workbook.save(output)
+        output.seek(0)
         
-        # Preparar respuesta
-        buffer.seek(0)
-        response = HttpResponse(
-            buffer.getvalue(),
+        filename = f"Estructura_Organizacional_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.xlsx"
+        return FileResponse(
+            output,
+            as_attachment=True,
+            filename=filename,
             content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
         )
-        filename = f"Estructura_Organizacional_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.xlsx"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    
+    def export_flat_csv(self) -> StreamingHttpResponse:
+        """Exportar la estructura plana como CSV; el envío empieza con la primera fila"""
+        
+        writer = csv.writer(_Echo())
+        
+        def rows():
+            yield '\ufeff'  # BOM para que Excel detecte UTF-8
+            yield writer.writerow(self.FLAT_COLUMNS)
+            for row in self.iter_flat_rows():
+                yield writer.writerow(row)
         
+        response = StreamingHttpResponse(rows(), content_type='text/csv; charset=utf-8')
+        filename = f"Estructura_Organizacional_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.csv"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
 class PowerPointExporter(BaseExporter):
     """Exportador a PowerPoint para presentaciones"""
     
+    # Área útil de una diapositiva 16:9 (puntos, sin márgenes ni título)
+    SLIDE_FRAME = (960 - 48, 540 - 64)
+    
     def export_presentation(self) -> HttpResponse:
-        """Exportar presentación de PowerPoint (placeholder)"""
-        
-        # Nota: Para implementación completa se necesitaría python-pptx
-        # Por ahora, exportamos como JSON que puede ser importado
-        
-        presentation_data = {
-            'title': f"Organigrama {self.chart.department}",
-            'metadata': self.get_chart_metadata(),
-            'slides': [
-                {
-                    'title': 'Portada',
-                    'content': f"Organigrama del Departamento de {self.chart.department}"
-                },
-                {
-                    'title': 'Estructura Organizacional',
-                    'content': self.chart.chart_data
-                }
-            ]
-        }
+        """Exportar presentación de PowerPoint (SVG si python-pptx no está instalado)"""
+        
+        if not pptx_available():
+            return SVGExporter(self.chart).export_svg()
         
-        # Convertir a JSON
-        json_data = json.dumps(presentation_data, indent=2, default=str)
+        layout = get_chart_layout(self.chart, page_size=self.SLIDE_FRAME)
+        content = render_pptx(
+            layout,
+            title=f"Organigrama {self.chart.department}",
+            subtitle=f"{self.chart.name} - v{self.chart.version} - {self.export_date.strftime('%d/%m/%Y')}"
+        )
         
-        response = HttpResponse(json_data, content_type='application/json')
-        filename = f"Presentacion_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.json"
+        response = HttpResponse(
+            content,
+            content_type='application/vnd.openxmlformats-officedocument.presentationml.presentation'
+        )
+        filename = f"Presentacion_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.pptx"
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
         return response
 
+class SVGExporter(BaseExporter):
+    """Exportador del diagrama completo a SVG"""
+    
+    def export_svg(self) -> HttpResponse:
+        layout = get_chart_layout(self.chart)
+        response = HttpResponse(render_svg(layout), content_type='image/svg+xml')
+        filename = f"Organigrama_{self.chart.department}_{self.export_date.strftime('%Y%m%d')}.svg"
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
 # Funciones de utilidad
 
 def get_exporter(export_type: str, chart: DepartmentalChart):
@@ -498,7 +507,9 @@ def get_exporter(export_type: str, chart: DepartmentalChart):
     exporters = {
         'pdf': PDFExporter,
         'excel': ExcelExporter,
-        'powerpoint': PowerPointExporter
+        'csv': ExcelExporter,
+        'powerpoint': PowerPointExporter,
+        'svg': SVGExporter
     }
     
     if export_type not in exporters:
@@ -515,7 +526,11 @@ def export_chart(chart: DepartmentalChart, export_type: str) -> HttpResponse:
         return exporter.export_organizational_book()
     elif export_type == 'excel':
         return exporter.export_flat_structure()
+    elif export_type == 'csv':
+        return exporter.export_flat_csv()
     elif export_type == 'powerpoint':
         return exporter.export_presentation()
+    elif export_type == 'svg':
+        return exporter.export_svg()
     else:
         raise ValueError(f"Método de exportación no definido para: {export_type}")
\ No newline at end of file
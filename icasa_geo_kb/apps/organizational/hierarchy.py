@@ -0,0 +1,165 @@
+"""
+Construcción iterativa de jerarquías organizacionales
+A partir de pares (puesto, jefe) calcula en O(n) el índice del padre, los hijos
+en formato CSR, niveles, tamaño de subárbol y tramo de control, y detecta
+ciclos, jefes inexistentes y claves duplicadas sin usar recursión
+"""
+from array import array
+from typing import Dict, Hashable, List, Optional, Sequence
+
+
+class Hierarchy:
+    """Jerarquía compacta: cada puesto es un índice entero en el orden de entrada"""
+
+    def __init__(self, keys: Sequence[Hashable], parent_keys: Sequence[Optional[Hashable]]):
+        n = len(keys)
+        self.keys = list(keys)
+        self.index: Dict[Hashable, int] = {}
+        self.duplicates: List[Hashable] = []
+        for i, key in enumerate(self.keys):
+            if key in self.index:
+                self.duplicates.append(key)
+            else:
+                self.index[key] = i
+
+        # Índice del padre (-1 si es raíz o si el jefe no existe)
+        self.parent = array('i', [-1]) * n
+        self.orphans: List[int] = []
+        child_counts = array('i', [0]) * n
+        for i, parent_key in enumerate(parent_keys):
+            if parent_key is None or parent_key == '':
+                continue
+            parent_index = self.index.get(parent_key, -1)
+            if parent_index < 0:
+                self.orphans.append(i)
+                continue
+            self.parent[i] = parent_index
+            child_counts[parent_index] += 1
+
+        # Hijos en formato CSR: children[child_offsets[i]:child_offsets[i + 1]]
+        self.child_offsets = array('i', [0]) * (n + 1)
+        for i in range(n):
+            self.child_offsets[i + 1] = self.child_offsets[i] + child_counts[i]
+        self.children = array('i', [0]) * self.child_offsets[n]
+        cursor = array('i', self.child_offsets[:n])
+        for i in range(n):
+            parent_index = self.parent[i]
+            if parent_index >= 0:
+                self.children[cursor[parent_index]] = i
+                cursor[parent_index] += 1
+
+        self.roots = [i for i in range(n) if self.parent[i] < 0]
+        self.level = array('i', [0]) * n
+        self.subtree_size = array('i', [1]) * n
+        self.cycles: List[List[int]] = []
+        self._traverse()
+
+    def _walk(self, start: int, order: List[int], tree_parent: array):
+        """Recorrido en anchura desde start (sin recursión)"""
+        self.level[start] = 1
+        order.append(start)
+        head = len(order) - 1
+        while head < len(order):
+            i = order[head]
+            head += 1
+            for c in self.children[self.child_offsets[i]:self.child_offsets[i + 1]]:
+                if self.level[c] == 0:
+                    self.level[c] = self.level[i] + 1
+                    tree_parent[c] = i
+                    order.append(c)
+
+    def _traverse(self):
+        n = len(self.keys)
+        order: List[int] = []
+        tree_parent = array('i', [-1]) * n
+
+        for root in self.roots:
+            self._walk(root, order, tree_parent)
+
+        if len(order) < n:
+            # Lo que no se alcanzó desde una raíz está en un ciclo o cuelga de uno
+            self._find_cycles()
+            for cycle in self.cycles:
+                # El primer puesto del ciclo se trata como raíz para numerar su rama
+                self._walk(cycle[0], order, tree_parent)
+
+        # Tamaño de subárbol en orden inverso del recorrido (hijos antes que padres)
+        for i in reversed(order):
+            p = tree_parent[i]
+            if p >= 0:
+                self.subtree_size[p] += self.subtree_size[i]
+
+    def _find_cycles(self):
+        """Seguir los punteros al jefe de cada puesto no alcanzado; cada puesto se visita una vez"""
+        state = array('i', [0]) * len(self.keys)  # 0 sin visitar, >0 id del recorrido, -1 terminado
+        for start in range(len(self.keys)):
+            if self.level[start] or state[start]:
+                continue
+            walk_id = start + 1
+            path = []
+            i = start
+            while i >= 0 and state[i] == 0 and not self.level[i]:
+                state[i] = walk_id
+                path.append(i)
+                i = self.parent[i]
+            if i >= 0 and state[i] == walk_id:
+                self.cycles.append(path[path.index(i):])
+            for j in path:
+                state[j] = -1
+
+    def __len__(self):
+        return len(self.keys)
+
+    def span_of_control(self, i: int) -> int:
+        """Reportes directos de un puesto"""
+        return self.child_offsets[i + 1] - self.child_offsets[i]
+
+    def get_children(self, i: int) -> array:
+        return self.children[self.child_offsets[i]:self.child_offsets[i + 1]]
+
+    @property
+    def depth(self) -> int:
+        return max(self.level, default=0)
+
+    def error_messages(self, parent_keys: Sequence[Optional[Hashable]] = None) -> List[str]:
+        """Problemas de la estructura como mensajes de error de importación"""
+        messages = [f"Puesto duplicado: {key}" for key in self.duplicates]
+        for i in self.orphans:
+            boss = f" '{parent_keys[i]}'" if parent_keys is not None else ''
+            messages.append(f"El jefe{boss} del puesto {self.keys[i]} no existe")
+        for cycle in self.cycles:
+            chain = ' -> '.join(str(self.keys[i]) for i in cycle + cycle[:1])
+            messages.append(f"Ciclo en la jerarquía: {chain}")
+        return messages
+
+    def as_dict(self) -> Dict:
+        """Estructura serializable guardada en chart_data['hierarchy']"""
+        keys = self.keys
+        return {
+            'roots': [keys[i] for i in self.roots],
+            'children': {
+                keys[i]: [keys[c] for c in self.get_children(i)]
+                for i in range(len(keys)) if self.span_of_control(i)
+            },
+            'levels': {keys[i]: self.level[i] for i in range(len(keys))},
+            'subtree_sizes': {
+                keys[i]: self.subtree_size[i] for i in range(len(keys)) if self.span_of_control(i)
+            },
+            'orphans': [keys[i] for i in self.orphans],
+            'cycles': [[keys[i] for i in cycle] for cycle in self.cycles],
+        }
+
+
+def build_hierarchy(positions: Sequence[Dict], key: str = 'id', parent_key: str = 'reports_to') -> Hierarchy:
+    """Jerarquía de una lista de diccionarios de puestos (formato de chart_data)"""
+    return Hierarchy(
+        [_normalize(position.get(key)) for position in positions],
+        [_normalize(position.get(parent_key)) for position in positions],
+    )
+
+
+def _normalize(value):
+    """Claves comparables: '7', 7 y ' 7 ' identifican al mismo puesto"""
+    if value is None:
+        return None
+    return str(value).strip()
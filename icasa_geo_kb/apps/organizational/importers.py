@@ -4,20 +4,107 @@ Soporta Excel, CSV, JSON y futuros conectores API
 """
 import pandas as pd
 import json
+from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth.models import User
-from .models import DepartmentalChart, ImportLog
-from typing import Dict, List, Tuple, Any
+from django.utils import timezone
+from .hierarchy import build_hierarchy
+from .models import DepartmentalChart, ImportJob, ImportLog
+from typing import Dict, Iterator, List, Tuple, Any
+
+# Filas que se leen, validan y reportan en cada lote
+IMPORT_BATCH_SIZE = getattr(settings, 'ORG_IMPORT_BATCH_SIZE', 2000)
+
+# Mensajes de error que se guardan en el ImportLog (el total se sigue contando)
+MAX_LOGGED_ERRORS = 500
+
+
+def _count_csv_rows(file) -> int:
+    """Contar filas de un CSV leyendo en bloques (estimado para el avance)"""
+    file.seek(0)
+    lines = 0
+    last = b''
+    for chunk in iter(lambda: file.read(1024 * 1024), b''):
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        lines += chunk.count(b'\n')
+        last = chunk[-1:]
+    if last and last != b'\n':
+        lines += 1
+    file.seek(0)
+    return max(lines - 1, 0)
+
+
+def _csv_batches(file, batch_size: int) -> Iterator:
+    """Primero (columnas, None) y luego DataFrames de batch_size filas como texto"""
+    file.seek(0)
+    reader = pd.read_csv(file, chunksize=batch_size, dtype=str)
+    first = next(reader)
+    columns = [str(column).strip() for column in first.columns]
+    yield columns, None
+    if not first.empty:
+        first.columns = columns
+        yield first
+    for chunk in reader:
+        chunk.columns = columns
+        yield chunk
+
+
+def _excel_batches(file, batch_size: int) -> Iterator:
+    """
+    Primero (columnas, filas estimadas) y luego DataFrames de batch_size filas
+    .xlsx se lee con openpyxl en modo read_only (memoria acotada); .xls con pandas
+    """
+    if file.name.lower().endswith('.xls'):
+        df = pd.read_excel(file)
+        df.columns = [str(column).strip() for column in df.columns]
+        yield list(df.columns), len(df)
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+        return
+    
+    from openpyxl import load_workbook
+    
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ['' if value is None else str(value).strip() for value in header]
+        yield columns, max((sheet.max_row or 1) - 1, 0)
+        
+        batch = []
+        for row in rows:
+            if not any(value not in (None, '') for value in row):
+                continue  # filas vacías al final de la hoja
+            batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+            if len(batch) >= batch_size:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        workbook.close()
 
 class OrganizationalImporter:
     """Clase base para importadores de organigramas"""
     
-    def __init__(self, user: User):
+    def __init__(self, user: User, job=None):
         self.user = user
+        self.job = job
         self.errors = []
         self.warnings = []
         self.processed_records = 0
         self.success_records = 0
+        self.error_count = 0
+    
+    def add_error(self, message: str):
+        """Registrar un error (solo se conservan los primeros MAX_LOGGED_ERRORS mensajes)"""
+        self.error_count += 1
+        if len(self.errors) < MAX_LOGGED_ERRORS:
+            self.errors.append(message)
     
     def validate_required_fields(self, data: Dict, required_fields: List[str]) -> bool:
         """Validar que existan los campos requeridos"""
@@ -39,25 +126,73 @@ class OrganizationalImporter:
             error_log=self.errors,
             imported_by=self.user
         )
+    
+    def start_import_log(self, chart: DepartmentalChart, import_type: str, file_name: str = "",
+                         total_records: int = 0) -> ImportLog:
+        """Crear el registro al inicio para reportar el avance mientras se importa"""
+        log = ImportLog.objects.create(
+            chart=chart,
+            import_type=import_type,
+            file_name=file_name,
+            total_records=total_records,
+            status='running',
+            imported_by=self.user
+        )
+        if self.job is not None:
+            # El endpoint de avance del trabajo lee este registro
+            ImportJob.objects.filter(pk=self.job.pk).update(chart=chart, import_log=log)
+        return log
+    
+    def update_import_log(self, log: ImportLog, status: str = None):
+        """Guardar el avance (un UPDATE por lote; status cierra el registro)"""
+        fields = {
+            'records_processed': self.processed_records,
+            'records_success': self.success_records,
+            'records_errors': self.error_count,
+        }
+        if status is not None:
+            fields.update(status=status, error_log=self.errors, finished_at=timezone.now())
+        ImportLog.objects.filter(pk=log.pk).update(**fields)
+
+    def build_hierarchy(self, positions: List[Dict], assign_levels: bool = True) -> Dict:
+        """Construir la jerarquía (iterativa), registrar ciclos/jefes inexistentes y asignar niveles"""
+        hierarchy = build_hierarchy(positions)
+        for message in hierarchy.error_messages([pos.get('reports_to') for pos in positions]):
+            self.add_error(message)
+        
+        if assign_levels:
+            for position, level in zip(positions, hierarchy.level):
+                position['level'] = level
+        
+        return hierarchy.as_dict()
 
 class ExcelImporter(OrganizationalImporter):
     """Importador para archivos Excel/CSV con estructura organizacional"""
     
     REQUIRED_COLUMNS = ['id_puesto', 'nombre_puesto', 'departamento']
-    OPTIONAL_COLUMNS = ['id_jefe', 'nivel', 'responsabilidades', 'empleado_actual']
+    OPTIONAL_COLUMNS = ['id_jefe', 'nivel', 'responsabilidades', 'empleado_actual',
+                        'id_empleado', 'email_empleado', 'fecha_ingreso']
+    
+    def __init__(self, user: User, batch_size: int = None, job=None):
+        super().__init__(user, job)
+        self.batch_size = batch_size or IMPORT_BATCH_SIZE
     
     def import_from_file(self, file: UploadedFile, chart_name: str, department: str) -> Tuple[bool, DepartmentalChart]:
-        """Importar organigrama desde archivo Excel/CSV"""
+        """Importar organigrama desde archivo Excel/CSV leyendo por lotes"""
         
+        log = None
         try:
-            # Leer archivo
-            if file.name.endswith('.csv'):
-                df = pd.read_csv(file)
-            else:
-                df = pd.read_excel(file)
+            is_csv = file.name.lower().endswith('.csv')
+            total_rows = _count_csv_rows(file) if is_csv else None
+            reader = _csv_batches(file, self.batch_size) if is_csv else _excel_batches(file, self.batch_size)
+            
+            # Encabezados (el primer elemento del lector)
+            columns, sheet_rows = next(reader)
+            if total_rows is None:
+                total_rows = sheet_rows
             
             # Validar columnas requeridas
-            missing_cols = [col for col in self.REQUIRED_COLUMNS if col not in df.columns]
+            missing_cols = [col for col in self.REQUIRED_COLUMNS if col not in columns]
             if missing_cols:
                 self.errors.append(f"Columnas faltantes en el archivo: {', '.join(missing_cols)}")
                 return False, None
@@ -69,124 +204,116 @@ class ExcelImporter(OrganizationalImporter):
                 description=f"Importado desde {file.name}",
                 created_by=self.user,
                 status='draft',
-                import_source='excel' if file.name.endswith('.xlsx') else 'csv',
+                import_source='csv' if is_csv else 'excel',
                 import_metadata={
                     'file_name': file.name,
-                    'total_rows': len(df),
-                    'columns': list(df.columns)
+                    'total_rows': total_rows,
+                    'columns': columns
                 }
             )
+            log = self.start_import_log(chart, 'excel', file.name, total_rows)
             
-            # Procesar datos
+            # Procesar datos por lotes (el avance queda en el ImportLog)
             positions_data = []
-            self.processed_records = len(df)
+            for batch in reader:
+                positions_data.extend(self._process_batch(batch, self.processed_records))
+                self.processed_records += len(batch)
+                self.update_import_log(log)
             
-            for index, row in df.iterrows():
-                try:
-                    position_data = self._process_row(row, index)
-                    if position_data:
-                        positions_data.append(position_data)
-                        self.success_records += 1
-                except Exception as e:
-                    self.errors.append(f"Error en fila {index + 2}: {str(e)}")
-            
-            # Construir estructura jerárquica
-            org_structure = self._build_hierarchy(positions_data)
+            # Construir estructura jerárquica (los niveles se calculan desde id_jefe)
+            org_structure = self.build_hierarchy(positions_data)
             
             # Guardar en el organigrama
+            chart.import_metadata['total_rows'] = self.processed_records
             chart.chart_data = {
                 'positions': positions_data,
                 'hierarchy': org_structure,
                 'import_stats': {
                     'total_processed': self.processed_records,
                     'successful': self.success_records,
-                    'errors': len(self.errors)
+                    'errors': self.error_count
                 }
             }
             chart.save()
             
-            # Crear log de importación
-            self.create_import_log(chart, 'excel', file.name)
+            self.update_import_log(log, status='completed')
             
             return True, chart
             
         except Exception as e:
-            self.errors.append(f"Error general de importación: {str(e)}")
+            self.add_error(f"Error general de importación: {str(e)}")
+            if log is not None:
+                self.update_import_log(log, status='failed')
             return False, None
     
-    def _process_row(self, row: pd.Series, index: int) -> Dict:
-        """Procesar una fila del archivo"""
-        
-        # Validar datos requeridos
-        required_data = {
-            'id_puesto': str(row['id_puesto']).strip(),
-            'nombre_puesto': str(row['nombre_puesto']).strip(),
-            'departamento': str(row['departamento']).strip()
-        }
-        
-        if not self.validate_required_fields(required_data, ['id_puesto', 'nombre_puesto', 'departamento']):
-            raise ValueError(f"Datos requeridos faltantes en fila {index + 2}")
-        
-        # Construir datos del puesto
-        position_data = {
-            'id': required_data['id_puesto'],
-            'title': required_data['nombre_puesto'],
-            'department': required_data['departamento'],
-            'level': int(row.get('nivel', 1)) if pd.notna(row.get('nivel')) else 1,
-            'reports_to': str(row.get('id_jefe', '')).strip() if pd.notna(row.get('id_jefe')) else None,
-            'responsibilities': str(row.get('responsabilidades', '')).strip() if pd.notna(row.get('responsabilidades')) else '',
-            'current_employee': str(row.get('empleado_actual', '')).strip() if pd.notna(row.get('empleado_actual')) else None,
-            'x_position': 0,  # Se calculará automáticamente
-            'y_position': 0   # Se calculará automáticamente
-        }
-        
-        return position_data
-    
-    def _build_hierarchy(self, positions: List[Dict]) -> Dict:
-        """Construir estructura jerárquica a partir de las posiciones"""
+    def _process_batch(self, df: pd.DataFrame, offset: int) -> List[Dict]:
+        """Validar y convertir un lote de filas por columnas (sin iterrows)"""
         
-        # Crear mapa de posiciones
-        position_map = {pos['id']: pos for pos in positions}
+        def text(column: str) -> pd.Series:
+            if column not in df.columns:
+                return pd.Series('', index=df.index, dtype=object)
+            values = df[column]
+            return values.where(values.notna(), '').astype(str).str.strip()
         
-        # Encontrar raíces (sin jefe)
-        roots = [pos for pos in positions if not pos['reports_to']]
+        required = {column: text(column) for column in self.REQUIRED_COLUMNS}
         
-        # Construir árbol
-        hierarchy = {
-            'roots': [pos['id'] for pos in roots],
-            'children': {},
-            'levels': {}
-        }
+        # Nivel: vacío -> 1; valores no numéricos son error de fila
+        if 'nivel' in df.columns:
+            raw_level = df['nivel'].where(df['nivel'].notna(), '').astype(str).str.strip()
+            levels = pd.to_numeric(raw_level.where(raw_level != '', '1'), errors='coerce')
+        else:
+            levels = pd.Series(1, index=df.index)
         
-        # Mapear hijos
-        for pos in positions:
-            if pos['reports_to'] and pos['reports_to'] in position_map:
-                parent_id = pos['reports_to']
-                if parent_id not in hierarchy['children']:
-                    hierarchy['children'][parent_id] = []
-                hierarchy['children'][parent_id].append(pos['id'])
+        missing = pd.concat([values == '' for values in required.values()], axis=1)
+        missing.columns = self.REQUIRED_COLUMNS
+        invalid = missing.any(axis=1) | levels.isna()
         
-        # Calcular niveles
-        self._calculate_levels(hierarchy, position_map)
+        # Errores por fila (número de fila del archivo: encabezado + base 1)
+        for position in invalid.to_numpy().nonzero()[0]:
+            row_number = offset + position + 2
+            row_missing = missing.iloc[position]
+            missing_fields = [column for column in self.REQUIRED_COLUMNS if row_missing[column]]
+            if missing_fields:
+                self.add_error(f"Error en fila {row_number}: Campos faltantes: {', '.join(missing_fields)}")
+            else:
+                self.add_error(f"Error en fila {row_number}: nivel inválido '{df['nivel'].iat[position]}'")
         
-        return hierarchy
-    
-    def _calculate_levels(self, hierarchy: Dict, position_map: Dict):
-        """Calcular niveles jerárquicos y posiciones"""
+        valid = ~invalid
+        reports_to = text('id_jefe')[valid]
+        employees = text('empleado_actual')[valid]
         
-        def assign_level(pos_id: str, level: int):
-            if pos_id in position_map:
-                position_map[pos_id]['level'] = level
-                hierarchy['levels'][pos_id] = level
-                
-                # Asignar nivel a hijos
-                if pos_id in hierarchy['children']:
-                    for child_id in hierarchy['children'][pos_id]:
-                        assign_level(child_id, level + 1)
+        # Datos del ocupante para sincronizar Employee/PositionAssignment (ver sync.py)
+        if 'fecha_ingreso' in df.columns:
+            parsed = pd.to_datetime(df['fecha_ingreso'], errors='coerce', format='mixed')[valid]
+            hire_dates = [value.strftime('%Y-%m-%d') if pd.notna(value) else None for value in parsed]
+        else:
+            hire_dates = [None] * len(reports_to)
         
-        # Asignar niveles desde las raíces
-        for root_id in hierarchy['roots']:
-            assign_level(root_id, 1)
+        positions = [
+            {
+                'id': position_id,
+                'title': title,
+                'department': department_name,
+                'level': int(level),
+                'reports_to': boss or None,
+                'responsibilities': responsibilities,
+                'current_employee': employee or None,
+                'employee_id': employee_id or None,
+                'employee_email': employee_email or None,
+                'hire_date': hire_date,
+                'x_position': 0,  # Se calculará automáticamente
+                'y_position': 0   # Se calculará automáticamente
+            }
+            for (position_id, title, department_name, level, boss, responsibilities, employee,
+                 employee_id, employee_email, hire_date) in zip(
+                required['id_puesto'][valid].tolist(), required['nombre_puesto'][valid].tolist(),
+                required['departamento'][valid].tolist(), levels[valid].tolist(), reports_to.tolist(),
+                text('responsabilidades')[valid].tolist(), employees.tolist(),
+                text('id_empleado')[valid].tolist(), text('email_empleado')[valid].tolist(), hire_dates
+            )
+        ]
+        self.success_records += len(positions)
+        return positions
     
     def generate_template(self) -> pd.DataFrame:
         """Generar plantilla Excel para importación"""
@@ -204,7 +331,10 @@ class ExcelImporter(OrganizationalImporter):
                 'Supervisión equipo de ventas',
                 'Ejecución de ventas'
             ],
-            'empleado_actual': ['Carlos Mendoza', 'Ana García', 'Roberto Silva', '', '']
+            'empleado_actual': ['Carlos Mendoza', 'Ana García', 'Roberto Silva', '', ''],
+            'id_empleado': ['EMP1001', 'EMP1002', 'EMP1003', '', ''],
+            'email_empleado': ['carlos.mendoza@icasa.com', 'ana.garcia@icasa.com', 'roberto.silva@icasa.com', '', ''],
+            'fecha_ingreso': ['2018-03-01', '2019-06-15', '2020-01-10', '', '']
         }
         
         return pd.DataFrame(template_data)
@@ -253,9 +383,13 @@ class JSONImporter(OrganizationalImporter):
                 except Exception as e:
                     self.errors.append(f"Error en posición {i + 1}: {str(e)}")
             
+            # Validar jerarquía (se conservan los niveles declarados en el JSON)
+            org_structure = self.build_hierarchy(processed_positions, assign_levels=False)
+            
             # Guardar datos
             chart.chart_data = {
                 'positions': processed_positions,
+                'hierarchy': org_structure,
                 'metadata': json_data.get('metadata', {}),
                 'import_stats': {
                     'total_processed': self.processed_records,
@@ -0,0 +1,213 @@
+"""
+Cola de importaciones y exportaciones de organigramas en segundo plano
+El archivo se guarda en un ImportJob y lo procesa un worker: Celery si hay
+broker configurado (CELERY_BROKER_URL) o un pool de procesos local
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Procesos del pool local (sin Celery)
+IMPORT_WORKERS = getattr(settings, 'ORG_IMPORT_WORKERS', 2)
+
+# Errores que se devuelven en el avance (el detalle completo queda en el ImportLog)
+PROGRESS_ERRORS = 20
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _init_worker(settings_module: str):
+    """Preparar Django en un proceso nuevo del pool"""
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: el proceso hijo no hereda las conexiones abiertas (y funciona en Windows)
+            _executor = ProcessPoolExecutor(
+                max_workers=IMPORT_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'icasa_geo.settings'),)
+            )
+        return _executor
+
+
+def uses_celery() -> bool:
+    return bool(getattr(settings, 'CELERY_BROKER_URL', None))
+
+
+def run_import_job(job_id: int) -> Optional[int]:
+    """Procesar un trabajo (en el worker); devuelve el id del organigrama creado"""
+    from django.core.files import File
+    from django.db import connections
+    from .importers import get_importer
+    from .models import ImportJob
+
+    try:
+        # Tomar el trabajo solo si sigue en cola (evita procesarlo dos veces)
+        claimed = ImportJob.objects.filter(pk=job_id, status='pending').update(
+            status='running', started_at=timezone.now()
+        )
+        job = ImportJob.objects.select_related('created_by').get(pk=job_id)
+        if not claimed:
+            return job.chart_id
+
+        importer = get_importer(job.import_type, job.created_by, job=job)
+        try:
+            # Con el nombre original: el importador elige el lector por extensión
+            with File(job.file.storage.open(job.file.name, 'rb'), name=job.file_name) as handle:
+                success, chart = importer.import_from_file(handle, job.chart_name, job.department)
+        except Exception as e:
+            success, chart = False, None
+            importer.add_error(f"Error general de importación: {str(e)}")
+
+        if success:
+            ImportJob.objects.filter(pk=job.pk).update(status='completed', chart=chart, finished_at=timezone.now())
+            return chart.id
+
+        ImportJob.objects.filter(pk=job.pk).update(
+            status='failed',
+            error='; '.join(importer.errors[:PROGRESS_ERRORS]),
+            finished_at=timezone.now()
+        )
+        return None
+    finally:
+        connections.close_all()
+
+
+def _dispatch(job_id: int):
+    from .models import ImportJob
+
+    if uses_celery():
+        import icasa_geo.celery  # noqa: F401 (configura la app de Celery con el broker)
+        from .tasks import run_import_job_task
+        result = run_import_job_task.delay(job_id)
+        ImportJob.objects.filter(pk=job_id).update(task_id=result.id)
+    else:
+        future = _get_executor().submit(run_import_job, job_id)
+        future.add_done_callback(lambda done: _worker_finished(job_id, done))
+
+
+def _worker_finished(job_id: int, future):
+    """Si el proceso del pool murió, marcar el trabajo como fallido y recrear el pool"""
+    global _executor
+    from django.db import connections
+    from .models import ImportJob
+
+    error = future.exception()
+    if error is None:
+        return
+    if isinstance(error, BrokenProcessPool):
+        with _executor_lock:
+            _executor = None
+    try:
+        ImportJob.objects.filter(pk=job_id, status__in=['pending', 'running']).update(
+            status='failed', error=f"Error del worker: {error}", finished_at=timezone.now()
+        )
+    finally:
+        connections.close_all()
+
+
+def enqueue_import(upload, chart_name: str, department: str, import_type: str, user):
+    """Guardar el archivo, crear el trabajo y encolarlo al confirmar la transacción"""
+    from .models import ImportJob
+
+    job = ImportJob.objects.create(
+        file=upload,
+        file_name=upload.name,
+        import_type=import_type,
+        chart_name=chart_name,
+        department=department,
+        created_by=user
+    )
+    transaction.on_commit(lambda: _dispatch(job.pk))
+    return job
+
+
+def job_progress(job) -> Dict:
+    """Avance de un trabajo: filas procesadas, errores y tiempo restante estimado"""
+    log = job.import_log
+    processed = log.records_processed if log else 0
+    total = log.total_records if log else 0
+
+    eta_seconds = None
+    if job.status == 'running' and job.started_at and processed and total > processed:
+        elapsed = (timezone.now() - job.started_at).total_seconds()
+        eta_seconds = round(elapsed / processed * (total - processed))
+
+    if job.status == 'completed':
+        percent = 100
+    elif total:
+        percent = min(99, round(processed * 100 / total))
+    else:
+        percent = 0
+
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'file_name': job.file_name,
+        'rows_processed': processed,
+        'rows_total': total,
+        'rows_success': log.records_success if log else 0,
+        'rows_errors': log.records_errors if log else 0,
+        'percent': percent,
+        'eta_seconds': eta_seconds,
+        'errors': (log.error_log[:PROGRESS_ERRORS] if log and log.error_log else []),
+        'error': job.error,
+        'chart_id': job.chart_id if job.status == 'completed' else None,
+        'created_at': job.created_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def run_book_render(chart_id: int, path: str) -> str:
+    """Generar el Libro de Organización en PDF (en el worker)"""
+    from django.db import connections
+    from .artifacts import render_book
+
+    try:
+        return render_book(chart_id, path)
+    finally:
+        connections.close_all()
+
+
+def _dispatch_book_render(chart_id: int, path: str):
+    if uses_celery():
+        import icasa_geo.celery  # noqa: F401
+        from .tasks import render_book_task
+        render_book_task.delay(chart_id, path)
+    else:
+        future = _get_executor().submit(run_book_render, chart_id, path)
+        future.add_done_callback(lambda done: _render_finished(path, done))
+
+
+def _render_finished(path: str, future):
+    """Liberar la marca de render en curso si falló; recrear el pool si el proceso murió"""
+    global _executor
+    from .artifacts import clear_pending
+
+    error = future.exception()
+    if error is None:
+        return
+    clear_pending(path)
+    if isinstance(error, BrokenProcessPool):
+        with _executor_lock:
+            _executor = None
+
+
+def enqueue_book_render(chart_id: int, path: str):
+    transaction.on_commit(lambda: _dispatch_book_render(chart_id, path))
@@ -0,0 +1,483 @@
+"""
+Diagramación automática de organigramas (árbol ordenado)
+Calcula coordenadas con el algoritmo de Walker en tiempo lineal (variante de
+Buchheim) sobre la jerarquía compacta, sin recursión; al mover un puesto solo se
+recalculan las ramas afectadas. Divide los árboles grandes en páginas y guarda
+el resultado en cache por versión del organigrama
+"""
+from array import array
+from bisect import insort
+from typing import Dict, List, Optional, Sequence
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .hierarchy import Hierarchy, build_hierarchy
+from .occupancy import occupancy_on
+
+# Tamaño de caja y separaciones en puntos (1/72")
+NODE_WIDTH = getattr(settings, 'ORG_LAYOUT_NODE_WIDTH', 150)
+NODE_HEIGHT = getattr(settings, 'ORG_LAYOUT_NODE_HEIGHT', 56)
+SIBLING_GAP = getattr(settings, 'ORG_LAYOUT_SIBLING_GAP', 20)
+SUBTREE_GAP = getattr(settings, 'ORG_LAYOUT_SUBTREE_GAP', 30)
+LEVEL_GAP = getattr(settings, 'ORG_LAYOUT_LEVEL_GAP', 40)
+
+# Escala mínima antes de cortar la página en menos niveles
+MIN_PAGE_SCALE = 0.45
+
+LAYOUT_CACHE_KEY = 'organizational:layout:{}:{}:{}'
+LAYOUT_CACHE_TTL = 60 * 60 * 24
+
+
+class TreeLayout:
+    """
+    Coordenadas de un bosque de puestos; x es el centro de la caja, y su borde superior
+    Solo se diagraman los puestos alcanzables desde tops hasta max_depth niveles
+    widths/heights permiten cajas de distinto tamaño por puesto (índice de la jerarquía)
+    """
+
+    def __init__(self, hierarchy: Hierarchy, tops: Optional[Sequence[int]] = None, max_depth: Optional[int] = None,
+                 node_width: float = NODE_WIDTH, node_height: float = NODE_HEIGHT,
+                 sibling_gap: float = SIBLING_GAP, subtree_gap: float = SUBTREE_GAP, level_gap: float = LEVEL_GAP,
+                 widths: Optional[Sequence[float]] = None, heights: Optional[Sequence[float]] = None):
+        n = len(hierarchy)
+        self.hierarchy = hierarchy
+        self.node_width = node_width
+        self.node_height = node_height
+        self.sibling_gap = sibling_gap
+        self.subtree_gap = subtree_gap
+        self.level_gap = level_gap
+        self.widths = array('d', widths) if widths is not None else array('d', [node_width]) * n
+        self.heights = array('d', heights) if heights is not None else array('d', [node_height]) * n
+
+        # El primer puesto de cada ciclo es raíz: su arista de regreso no se dibuja
+        self._pseudo_roots = {cycle[0] for cycle in hierarchy.cycles}
+        if tops is None:
+            tops = list(hierarchy.roots) + [cycle[0] for cycle in hierarchy.cycles]
+        self.tops = list(tops)
+        self.max_depth = max_depth
+
+        self._prepare()
+        self._first_walk()
+        self._second_walk()
+
+    # Árbol restringido (raíz virtual = len(hierarchy))
+
+    @property
+    def virtual(self) -> int:
+        return len(self.hierarchy)
+
+    def _prepare(self):
+        n = len(self.hierarchy)
+        self.tree_children: Dict[int, List[int]] = {self.virtual: self.tops}
+        self.tree_parent = array('i', [-1]) * (n + 1)
+        self.number = array('i', [0]) * (n + 1)
+        self.depth = array('i', [0]) * (n + 1)
+
+        self._set_children(self.virtual, self.tops)
+        self.order: List[int] = list(self.tops)  # recorrido en anchura, sin la raíz virtual
+        for top in self.tops:
+            self.depth[top] = 1
+        head = 0
+        while head < len(self.order):
+            v = self.order[head]
+            head += 1
+            if self.max_depth is not None and self.depth[v] >= self.max_depth:
+                continue
+            kids = [c for c in self.hierarchy.get_children(v) if c not in self._pseudo_roots]
+            if kids:
+                self._set_children(v, kids)
+                for c in kids:
+                    self.depth[c] = self.depth[v] + 1
+                self.order.extend(kids)
+
+    def _set_children(self, v: int, kids: List[int]):
+        if kids:
+            self.tree_children[v] = kids
+        else:
+            self.tree_children.pop(v, None)
+        for position, c in enumerate(kids):
+            self.tree_parent[c] = v
+            self.number[c] = position
+
+    def _reorder(self):
+        """Recalcular el recorrido en anchura y la profundidad tras mover un subárbol"""
+        self.order = list(self.tops)
+        for top in self.tops:
+            self.depth[top] = 1
+        head = 0
+        while head < len(self.order):
+            v = self.order[head]
+            head += 1
+            kids = self.tree_children.get(v)
+            if kids:
+                for c in kids:
+                    self.depth[c] = self.depth[v] + 1
+                self.order.extend(kids)
+
+    def _separation(self, left: int, right: int) -> float:
+        """Distancia entre centros: hermanos con sibling_gap, primos (subárboles vecinos) con subtree_gap"""
+        gap = self.sibling_gap if self.tree_parent[left] == self.tree_parent[right] else self.subtree_gap
+        return (self.widths[left] + self.widths[right]) / 2 + gap
+
+    # Algoritmo de Walker (Buchheim, Jünger y Leipert 2002)
+
+    def _first_walk(self):
+        size = len(self.hierarchy) + 1
+        self.prelim = array('d', [0.0]) * size
+        self.mod = array('d', [0.0]) * size
+        self.shift = array('d', [0.0]) * size
+        self.change = array('d', [0.0]) * size
+        self.thread = array('i', [-1]) * size
+        self.ancestor = array('i', range(size))
+        self.midpoint = array('d', [0.0]) * size
+
+        # Cambios de cada combinación sobre nodos internos (para deshacerla al mover un subárbol)
+        self._journal: Dict[int, List[tuple]] = {}
+
+        # Hijos antes que padres; cada padre coloca a sus hijos de izquierda a derecha
+        for v in reversed([self.virtual] + self.order):
+            self._combine(v)
+
+    def _combine(self, v: int):
+        kids = self.tree_children.get(v)
+        if not kids:
+            return
+        journal = self._journal[v] = []
+        for w in kids:
+            self.shift[w] = self.change[w] = 0.0
+            self.ancestor[w] = w
+            if w not in self.tree_children:
+                self.mod[w] = 0.0
+                self.thread[w] = -1
+
+        default_ancestor = kids[0]
+        for position, w in enumerate(kids):
+            if position:
+                left = kids[position - 1]
+                self.prelim[w] = self.prelim[left] + self._separation(left, w)
+                if w in self.tree_children:
+                    self.mod[w] = self.prelim[w] - self.midpoint[w]
+                default_ancestor = self._apportion(w, left, kids[0], default_ancestor, journal)
+            else:
+                self.prelim[w] = self.midpoint[w]
+                if w in self.tree_children:
+                    self.mod[w] = 0.0
+        self._execute_shifts(kids)
+        self.midpoint[v] = (self.prelim[kids[0]] + self.prelim[kids[-1]]) / 2
+
+    def _undo(self, v: int):
+        for values, node, old in reversed(self._journal.pop(v, ())):
+            values[node] = old
+
+    def _write(self, journal: List[tuple], values: array, node: int, value):
+        journal.append((values, node, values[node]))
+        values[node] = value
+
+    def _next_left(self, v: int) -> int:
+        kids = self.tree_children.get(v)
+        return kids[0] if kids else self.thread[v]
+
+    def _next_right(self, v: int) -> int:
+        kids = self.tree_children.get(v)
+        return kids[-1] if kids else self.thread[v]
+
+    def _apportion(self, v: int, left_sibling: int, leftmost: int, default_ancestor: int, journal: List[tuple]) -> int:
+        """Separar el subárbol v de sus hermanos izquierdos comparando contornos"""
+        vip = vop = v
+        vim, vom = left_sibling, leftmost
+        sip, sop = self.mod[vip], self.mod[vop]
+        sim, som = self.mod[vim], self.mod[vom]
+
+        next_vim, next_vip = self._next_right(vim), self._next_left(vip)
+        while next_vim >= 0 and next_vip >= 0:
+            vim, vip = next_vim, next_vip
+            vom, vop = self._next_left(vom), self._next_right(vop)
+            self._write(journal, self.ancestor, vop, v)
+            shift = (self.prelim[vim] + sim) - (self.prelim[vip] + sip) + self._separation(vim, vip)
+            if shift > 0:
+                ancestor = self.ancestor[vim]
+                if self.tree_parent[ancestor] != self.tree_parent[v]:
+                    ancestor = default_ancestor
+                self._move_subtree(ancestor, v, shift)
+                sip += shift
+                sop += shift
+            sim += self.mod[vim]
+            sip += self.mod[vip]
+            som += self.mod[vom]
+            sop += self.mod[vop]
+            next_vim, next_vip = self._next_right(vim), self._next_left(vip)
+
+        if next_vim >= 0 and self._next_right(vop) < 0:
+            self._write(journal, self.thread, vop, next_vim)
+            self._write(journal, self.mod, vop, self.mod[vop] + sim - sop)
+        if next_vip >= 0 and self._next_left(vom) < 0:
+            self._write(journal, self.thread, vom, next_vip)
+            self._write(journal, self.mod, vom, self.mod[vom] + sip - som)
+            default_ancestor = v
+        return default_ancestor
+
+    def _move_subtree(self, wm: int, wp: int, shift: float):
+        subtrees = self.number[wp] - self.number[wm]
+        self.change[wp] -= shift / subtrees
+        self.shift[wp] += shift
+        self.change[wm] += shift / subtrees
+        self.prelim[wp] += shift
+        self.mod[wp] += shift
+
+    def _execute_shifts(self, kids: List[int]):
+        shift = change = 0.0
+        for w in reversed(kids):
+            self.prelim[w] += shift
+            self.mod[w] += shift
+            change += self.change[w]
+            shift += self.shift[w] + change
+
+    def _second_walk(self):
+        # Alto de cada nivel = la caja más alta del nivel
+        level_height: Dict[int, float] = {}
+        for v in self.order:
+            level_height[self.depth[v]] = max(level_height.get(self.depth[v], 0.0), self.heights[v])
+        level_top = {1: 0.0}
+        for depth in range(2, len(level_height) + 1):
+            level_top[depth] = level_top[depth - 1] + level_height[depth - 1] + self.level_gap
+
+        self.x: Dict[int, float] = {}
+        self.y: Dict[int, float] = {}
+        offset = array('d', [0.0]) * (len(self.hierarchy) + 1)
+        for v in self.order:
+            offset_v = offset[self.tree_parent[v]]
+            self.x[v] = self.prelim[v] + offset_v
+            self.y[v] = level_top[self.depth[v]]
+            offset[v] = offset_v + self.mod[v]
+
+        # Origen en la esquina superior izquierda del dibujo
+        if self.x:
+            shift = -min(x - self.widths[v] / 2 for v, x in self.x.items())
+            for v in self.x:
+                self.x[v] += shift
+
+    # Cambios incrementales
+
+    def _ancestors(self, v: int) -> List[int]:
+        """v y sus ancestros hasta la raíz virtual"""
+        path = []
+        while v >= 0:
+            path.append(v)
+            v = self.tree_parent[v] if v != self.virtual else -1
+        return path
+
+    def _undo_combinations(self, nodes: set) -> tuple:
+        """
+        Deshacer las combinaciones de nodes (un camino cerrado hacia la raíz) de arriba hacia
+        abajo; el resto del árbol conserva su estado. Devuelve las coordenadas anteriores
+        """
+        before = (dict(self.x), dict(self.y))
+        for v in sorted(nodes, key=lambda node: self.depth[node]):
+            self._undo(v)
+        return before
+
+    def _redo_combinations(self, nodes: set, before: tuple) -> List[int]:
+        """Recalcular las combinaciones de abajo hacia arriba; devuelve los puestos que se movieron"""
+        for v in sorted(nodes, key=lambda node: self.depth[node], reverse=True):
+            self._combine(v)
+        self._second_walk()
+        old_x, old_y = before
+        return [v for v in self.order if old_x.get(v) != self.x[v] or old_y.get(v) != self.y[v]]
+
+    def move(self, v: int, new_parent: Optional[int]) -> List[int]:
+        """Cambiar el jefe de v (None = raíz) y recalcular solo las ramas afectadas"""
+        if self.max_depth is not None:
+            raise ValueError("Un diagrama paginado no admite cambios incrementales")
+        target = self.virtual if new_parent is None else new_parent
+        old_parent = self.tree_parent[v]
+        if old_parent == target:
+            return []
+        if v in self._ancestors(target):
+            raise ValueError("El movimiento crea un ciclo en la jerarquía")
+
+        nodes = set(self._ancestors(old_parent)) | set(self._ancestors(target))
+        before = self._undo_combinations(nodes)
+
+        # Quitar de los hijos del jefe anterior e insertar en orden de índice (como la jerarquía)
+        old_kids = [c for c in self.tree_children.get(old_parent, []) if c != v]
+        new_kids = list(self.tree_children.get(target, []))
+        insort(new_kids, v)
+        if old_parent == self.virtual:
+            self.tops = old_kids
+        if target == self.virtual:
+            self.tops = new_kids
+        self._set_children(old_parent, old_kids)
+        self._set_children(target, new_kids)
+        self.tree_children[self.virtual] = self.tops
+        self._reorder()
+        return self._redo_combinations(nodes, before)
+
+    def resize(self, v: int, width: Optional[float] = None, height: Optional[float] = None) -> List[int]:
+        """Cambiar el tamaño de la caja de v y recalcular sus ancestros"""
+        nodes = set(self._ancestors(self.tree_parent[v]))
+        before = self._undo_combinations(nodes)
+        if width is not None:
+            self.widths[v] = width
+        if height is not None:
+            self.heights[v] = height
+        return self._redo_combinations(nodes, before)
+
+    @property
+    def width(self) -> float:
+        return max((x + self.widths[v] / 2 for v, x in self.x.items()), default=0)
+
+    @property
+    def height(self) -> float:
+        return max((y + self.heights[v] for v, y in self.y.items()), default=0)
+
+    def edges(self) -> List[tuple]:
+        return [
+            (v, c) for v, kids in self.tree_children.items() if v != self.virtual
+            for c in kids
+        ]
+
+    def is_truncated(self, v: int) -> bool:
+        """El puesto tiene subordinados que no se dibujan en esta página"""
+        return v not in self.tree_children and any(
+            c not in self._pseudo_roots for c in self.hierarchy.get_children(v)
+        )
+
+
+# Datos del organigrama
+
+def chart_nodes(chart) -> List[Dict]:
+    """Puestos de un DepartmentalChart en un formato común"""
+    return structure_nodes(chart.structure_data())
+
+
+def structure_nodes(data: Dict) -> List[Dict]:
+    """
+    Puestos de un payload de chart_data o de una instantánea en un formato común
+    Acepta los puestos importados (id, title, reports_to) y los del editor
+    (position_id, x, y), que se completan con Position
+    """
+    from .models import Position
+
+    raw = (data or {}).get('positions') or []
+    if raw and 'position_id' in raw[0]:
+        ids = [p.get('position_id') for p in raw]
+        positions = Position.objects.in_bulk(ids)
+        occupants = occupancy_on(position_ids=positions)
+        nodes = []
+        for position_id in ids:
+            position = positions.get(position_id)
+            if position is None:
+                continue
+            employee = occupants.get(position.id)
+            nodes.append({
+                'key': str(position.id),
+                'reports_to': str(position.reports_to_id) if position.reports_to_id in positions else None,
+                'title': position.title,
+                'department': position.department,
+                'employee': f"{employee.first_name} {employee.last_name}" if employee else '',
+            })
+        return nodes
+
+    return [
+        {
+            'key': str(p.get('id', '')).strip(),
+            'reports_to': str(p['reports_to']).strip() if p.get('reports_to') not in (None, '') else None,
+            'title': p.get('title') or '',
+            'department': p.get('department') or '',
+            'employee': p.get('current_employee') or '',
+        }
+        for p in raw
+    ]
+
+
+def paginate(hierarchy: Hierarchy, page_width: float, page_height: float, **sizes) -> List[Dict]:
+    """
+    Dividir el árbol en páginas que quepan a escala >= MIN_PAGE_SCALE
+    Cada página dibuja algunos niveles; los subárboles cortados continúan en otra página
+    """
+    node_height = sizes.get('node_height', NODE_HEIGHT)
+    level_gap = sizes.get('level_gap', LEVEL_GAP)
+    levels_per_page = max(2, int((page_height / MIN_PAGE_SCALE + level_gap) // (node_height + level_gap)))
+
+    layouts: List[TreeLayout] = []
+    first_page: Dict[int, int] = {}  # puesto raíz de página -> número de página
+    pending = [None]  # None: la primera página con todas las raíces
+    head = 0
+    while head < len(pending):
+        tops = pending[head]
+        head += 1
+        depth = levels_per_page
+        while True:
+            layout = TreeLayout(hierarchy, tops=tops, max_depth=depth, **sizes)
+            if layout.width * MIN_PAGE_SCALE <= page_width or depth <= 2:
+                break
+            depth -= 1
+
+        if layout.width * MIN_PAGE_SCALE > page_width and len(layout.tops) > 1:
+            # Varias raíces que no caben juntas: una página por raíz
+            pending.extend([top] for top in layout.tops)
+            continue
+
+        for top in layout.tops:
+            first_page.setdefault(top, len(layouts))
+        layouts.append(layout)
+        for v in layout.order:
+            if layout.is_truncated(v):
+                pending.append([v])
+
+    # Primera página en la que aparece cada puesto (donde se cortó su subárbol)
+    seen: Dict[int, int] = {}
+    for number, layout in enumerate(layouts):
+        for v in layout.order:
+            seen.setdefault(v, number)
+    return [_page_payload(layout, first_page, number, seen) for number, layout in enumerate(layouts)]
+
+
+def _page_payload(layout: TreeLayout, first_page: Dict[int, int], number: int,
+                  seen: Optional[Dict[int, int]] = None) -> Dict:
+    """Página serializable: continued = página donde sigue el subárbol, from = página de donde viene"""
+    seen = seen or {}
+    nodes = []
+    for v in layout.order:
+        continued = first_page.get(v) if layout.is_truncated(v) else None
+        comes_from = seen.get(v)
+        nodes.append({
+            'i': v, 'x': layout.x[v], 'y': layout.y[v],
+            'continued': continued, 'from': comes_from if comes_from != number else None,
+        })
+    return {
+        'nodes': nodes,
+        'edges': layout.edges(),
+        'width': layout.width,
+        'height': layout.height,
+    }
+
+
+def compute_chart_layout(nodes: List[Dict], page_size: Optional[tuple] = None, **sizes) -> Dict:
+    """Diagrama completo (y paginado si se indica page_size) de una lista de chart_nodes"""
+    hierarchy = build_hierarchy(nodes, key='key', parent_key='reports_to')
+    full = TreeLayout(hierarchy, **sizes)
+    result = {
+        'nodes': nodes,
+        'node_width': full.node_width,
+        'node_height': full.node_height,
+        'full': _page_payload(full, {}, 0),
+        'errors': hierarchy.error_messages([node['reports_to'] for node in nodes]),
+    }
+    if page_size is not None:
+        result['pages'] = paginate(hierarchy, page_size[0], page_size[1], **sizes)
+    return result
+
+
+def get_chart_layout(chart, page_size: Optional[tuple] = None) -> Dict:
+    """Diagrama de un organigrama, en cache por versión y contenido"""
+    from .artifacts import chart_content_hash
+
+    page_tag = 'x'.join(str(round(value)) for value in page_size) if page_size else 'full'
+    key = LAYOUT_CACHE_KEY.format(chart.id, chart_content_hash(chart), page_tag)
+    layout = cache.get(key)
+    if layout is None:
+        layout = compute_chart_layout(chart_nodes(chart), page_size)
+        cache.set(key, layout, LAYOUT_CACHE_TTL)
+    return layout
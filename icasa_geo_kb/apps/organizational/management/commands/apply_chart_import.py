@@ -0,0 +1,40 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from apps.organizational.models import DepartmentalChart
+from apps.organizational.sync import apply_chart
+
+class Command(BaseCommand):
+    help = 'Sincroniza Position/Employee/PositionAssignment con los puestos importados en un organigrama'
+
+    def add_arguments(self, parser):
+        parser.add_argument('chart_id', type=int, help='ID del organigrama importado')
+        parser.add_argument('--date', help='Fecha efectiva de las asignaciones (AAAA-MM-DD, por defecto hoy)')
+        parser.add_argument('--close-missing', action='store_true',
+                            help='Cerrar asignaciones de puestos del departamento que no vienen en el archivo')
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar los cambios, sin guardar')
+
+    def handle(self, *args, **options):
+        try:
+            chart = DepartmentalChart.objects.get(pk=options['chart_id'])
+        except DepartmentalChart.DoesNotExist:
+            raise CommandError(f"No existe el organigrama {options['chart_id']}")
+
+        effective_date = date.fromisoformat(options['date']) if options['date'] else None
+
+        start = time.perf_counter()
+        result = apply_chart(chart, effective_date, options['close_missing'], options['dry_run'])
+        elapsed = time.perf_counter() - start
+
+        for message in result['errors']:
+            self.stdout.write(self.style.ERROR(message))
+        for message in result['warnings'][:20]:
+            self.stdout.write(self.style.WARNING(message))
+
+        self.stdout.write(
+            f"Puestos: {result['positions_created']} nuevos, {result['positions_updated']} actualizados | "
+            f"Empleados: {result['employees_created']} nuevos, {result['employees_updated']} actualizados | "
+            f"Asignaciones: {result['assignments_created']} nuevas, {result['assignments_closed']} cerradas"
+        )
+        label = 'Simulación' if options['dry_run'] else 'Sincronización'
+        self.stdout.write(self.style.SUCCESS(f'{label} completada en {elapsed:.2f}s'))
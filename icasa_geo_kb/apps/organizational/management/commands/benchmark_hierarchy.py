@@ -0,0 +1,52 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from apps.organizational.hierarchy import build_hierarchy
+
+class Command(BaseCommand):
+    help = 'Mide la construcción de la jerarquía de importación con puestos sintéticos (no usa la base de datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--positions', type=int, default=100000, help='Puestos por escenario')
+        parser.add_argument('--fanout', type=int, default=8, help='Reportes directos en el escenario balanceado')
+
+    def handle(self, *args, **options):
+        total = options['positions']
+        fanout = options['fanout']
+
+        scenarios = {
+            # Cadena de un solo jefe por nivel: la recursión anterior excedía el límite
+            'Cadena profunda': [
+                {'id': f'P{i}', 'reports_to': f'P{i - 1}' if i else None} for i in range(total)
+            ],
+            'Árbol balanceado': [
+                {'id': f'P{i}', 'reports_to': f'P{(i - 1) // fanout}' if i else None} for i in range(total)
+            ],
+            'Aleatorio con ciclos y huérfanos': self._random_positions(total),
+        }
+
+        for label, positions in scenarios.items():
+            start = time.perf_counter()
+            hierarchy = build_hierarchy(positions)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{label}: {elapsed * 1000:.0f} ms para {len(hierarchy)} puestos '
+                f'({elapsed / total * 1e6:.2f} µs por puesto), profundidad {hierarchy.depth}, '
+                f'ciclos {len(hierarchy.cycles)}, huérfanos {len(hierarchy.orphans)}'
+            )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark terminado'))
+
+    def _random_positions(self, total):
+        rng = random.Random(42)
+        positions = [
+            {'id': f'P{i}', 'reports_to': f'P{rng.randrange(i)}' if i else None} for i in range(total)
+        ]
+        # Algunos jefes inexistentes y ciclos (dos puestos que se reportan entre sí)
+        sample = rng.sample(range(1, total), min(20, total - 1))
+        for i in sample[:10]:
+            positions[i]['reports_to'] = f'X{i}'
+        for a, b in zip(sample[10::2], sample[11::2]):
+            positions[a]['reports_to'] = f'P{b}'
+            positions[b]['reports_to'] = f'P{a}'
+        return positions
@@ -0,0 +1,43 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.organizational.models import DepartmentalChart
+from apps.organizational.snapshots import COMPACT_KEYFRAME_INTERVAL, compact_history
+
+class Command(BaseCommand):
+    help = 'Reescribe el historial de instantáneas como diferencias y elimina copias automáticas repetidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chart', type=int, help='ID del organigrama (por defecto todos)')
+        parser.add_argument('--older-than', type=int, default=30,
+                            help='Días de antigüedad del historial a compactar (por defecto 30)')
+        parser.add_argument('--keyframe-interval', type=int, default=COMPACT_KEYFRAME_INTERVAL,
+                            help='Instantáneas entre copias completas en el historial antiguo')
+        parser.add_argument('--dry-run', action='store_true', help='Solo mostrar el ahorro, sin guardar')
+
+    def handle(self, *args, **options):
+        charts = DepartmentalChart.objects.filter(snapshots__isnull=False).distinct()
+        if options['chart']:
+            charts = charts.filter(pk=options['chart'])
+            if not charts.exists():
+                raise CommandError(f"El organigrama {options['chart']} no existe o no tiene instantáneas")
+        if options['keyframe_interval'] < 1:
+            raise CommandError('--keyframe-interval debe ser mayor que 0')
+
+        before = timezone.now() - timedelta(days=options['older_than'])
+        totals = {'snapshots': 0, 'removed': 0, 'bytes_before': 0, 'bytes_after': 0}
+        for chart in charts.iterator():
+            stats = compact_history(chart, before, options['keyframe_interval'], options['dry_run'])
+            for key in totals:
+                totals[key] += stats[key]
+            self.stdout.write(
+                f"{chart.name}: {stats['snapshots']} instantáneas -> {stats['full']} completas, "
+                f"{stats['delta']} diferencias, {stats['removed']} eliminadas "
+                f"({stats['bytes_before'] / 1024:.1f} KB -> {stats['bytes_after'] / 1024:.1f} KB)"
+            )
+
+        label = 'Simulación' if options['dry_run'] else 'Compactación'
+        self.stdout.write(self.style.SUCCESS(
+            f"{label} completada: {totals['snapshots']} instantáneas, {totals['removed']} eliminadas, "
+            f"{totals['bytes_before'] / 1024:.1f} KB -> {totals['bytes_after'] / 1024:.1f} KB"
+        ))
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-17 18:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0006_alter_processcategory_category_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='status',
+            field=models.CharField(choices=[('running', 'En proceso'), ('completed', 'Completada'), ('failed', 'Fallida')], default='completed', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='total_records',
+            field=models.IntegerField(default=0, help_text='Filas estimadas del archivo'),
+        ),
+    ]
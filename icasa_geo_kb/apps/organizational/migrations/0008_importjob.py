@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2026-10-17 18:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('organizational', '0007_importlog_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('file', models.FileField(upload_to='imports/%Y/%m/')),
+                ('file_name', models.CharField(max_length=255)),
+                ('import_type', models.CharField(default='excel', max_length=20)),
+                ('chart_name', models.CharField(max_length=200)),
+                ('department', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'En cola'), ('running', 'En proceso'), ('completed', 'Completada'), ('failed', 'Fallida')], default='pending', max_length=20)),
+                ('task_id', models.CharField(blank=True, help_text='Id de la tarea Celery (si aplica)', max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('chart', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='organizational.departmentalchart')),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('import_log', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='organizational.importlog')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Importación',
+                'verbose_name_plural': 'Trabajos de Importación',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
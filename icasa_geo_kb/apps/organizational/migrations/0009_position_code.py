@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0008_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='code',
+            field=models.CharField(blank=True, help_text='Clave del sistema de RRHH (id_puesto); se usa para sincronizar importaciones', max_length=50, null=True, unique=True, verbose_name='Clave del Puesto'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('organizational', '0009_position_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrganigramLayout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de creación')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Fecha de actualización')),
+                ('name', models.CharField(default='interactivo', max_length=50, unique=True)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Acomodo del Organigrama',
+                'verbose_name_plural': 'Acomodos del Organigrama',
+            },
+        ),
+    ]
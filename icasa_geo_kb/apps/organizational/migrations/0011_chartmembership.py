@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0010_organigramlayout'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChartMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('x', models.IntegerField(default=100)),
+                ('y', models.IntegerField(default=100)),
+                ('added_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('chart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='organizational.departmentalchart')),
+                ('position', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chart_memberships', to='organizational.position')),
+            ],
+            options={
+                'verbose_name': 'Puesto en Organigrama',
+                'verbose_name_plural': 'Puestos en Organigramas',
+                'ordering': ['added_at', 'id'],
+                'unique_together': {('chart', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Mover los puestos del editor de chart_data['positions'] a ChartMembership
+
+from django.db import migrations
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def positions_to_memberships(apps, schema_editor):
+    DepartmentalChart = apps.get_model('organizational', 'DepartmentalChart')
+    ChartMembership = apps.get_model('organizational', 'ChartMembership')
+    Position = apps.get_model('organizational', 'Position')
+    existing = set(Position.objects.values_list('id', flat=True))
+
+    for chart in DepartmentalChart.objects.all().iterator():
+        data = chart.chart_data or {}
+        entries = data.get('positions') or []
+        # Solo el formato del editor; los organigramas importados conservan su lista
+        if not entries or not all(isinstance(entry, dict) and 'position_id' in entry for entry in entries):
+            continue
+
+        memberships, seen = [], set()
+        for entry in entries:
+            position_id = int(entry['position_id'])
+            if position_id not in existing or position_id in seen:
+                continue
+            seen.add(position_id)
+            added_at = parse_datetime(entry.get('added_at') or '') or timezone.now()
+            if timezone.is_naive(added_at):
+                added_at = timezone.make_aware(added_at)
+            memberships.append(ChartMembership(
+                chart_id=chart.id, position_id=position_id,
+                x=int(entry.get('x', 100)), y=int(entry.get('y', 100)), added_at=added_at
+            ))
+        ChartMembership.objects.bulk_create(memberships, batch_size=500)
+
+        data = dict(data)
+        del data['positions']
+        DepartmentalChart.objects.filter(pk=chart.pk).update(chart_data=data)
+
+
+def memberships_to_positions(apps, schema_editor):
+    DepartmentalChart = apps.get_model('organizational', 'DepartmentalChart')
+    ChartMembership = apps.get_model('organizational', 'ChartMembership')
+
+    by_chart = {}
+    for membership in ChartMembership.objects.order_by('added_at', 'id').iterator():
+        by_chart.setdefault(membership.chart_id, []).append({
+            'position_id': membership.position_id,
+            'x': membership.x,
+            'y': membership.y,
+            'added_at': membership.added_at.isoformat(),
+        })
+    for chart in DepartmentalChart.objects.filter(pk__in=list(by_chart)):
+        data = dict(chart.chart_data or {})
+        data['positions'] = by_chart[chart.pk]
+        DepartmentalChart.objects.filter(pk=chart.pk).update(chart_data=data)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0011_chartmembership'),
+    ]
+
+    operations = [
+        migrations.RunPython(positions_to_memberships, memberships_to_positions),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:27
+
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_content_hash(apps, schema_editor):
+    # Las instantáneas existentes son completas; se calcula su hash para la deduplicación
+    OrganizationalSnapshot = apps.get_model('organizational', 'OrganizationalSnapshot')
+    for snapshot in OrganizationalSnapshot.objects.only('id', 'snapshot_data').iterator():
+        encoded = json.dumps(snapshot.snapshot_data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+        OrganizationalSnapshot.objects.filter(pk=snapshot.pk).update(
+            content_hash=hashlib.sha256(encoded.encode()).hexdigest()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0012_chartmembership_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='base',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='organizational.organizationalsnapshot'),
+        ),
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='chain_length',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='delta',
+            field=models.JSONField(blank=True, null=True, verbose_name='Parche JSON respecto a la base'),
+        ),
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='keyframe',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.RESTRICT, related_name='+', to='organizational.organizationalsnapshot'),
+        ),
+        migrations.AddField(
+            model_name='organizationalsnapshot',
+            name='storage',
+            field=models.CharField(choices=[('full', 'Completa'), ('delta', 'Diferencia')], default='full', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='organizationalsnapshot',
+            name='snapshot_data',
+            field=models.JSONField(blank=True, null=True, verbose_name='Datos de la Instantánea'),
+        ),
+        migrations.RunPython(fill_content_hash, migrations.RunPython.noop),
+    ]
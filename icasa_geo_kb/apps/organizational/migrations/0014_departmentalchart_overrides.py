@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0013_snapshot_deltas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='departmentalchart',
+            name='overrides',
+            field=models.JSONField(blank=True, help_text='Puestos y datos que la simulación cambia respecto al organigrama base', null=True, verbose_name='Cambios de la Simulación'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.16 on 2026-10-17 19:35
+
+from django.db import migrations, models
+
+
+def seed_sequences(apps, schema_editor):
+    # Los contadores empiezan después del mayor número ya usado ("N" o "N.M");
+    # las versiones existentes conservan su texto y quedan sin version_number
+    DepartmentalChart = apps.get_model('organizational', 'DepartmentalChart')
+    DepartmentVersionSequence = apps.get_model('organizational', 'DepartmentVersionSequence')
+    highest = {}
+    for department, version in DepartmentalChart.objects.values_list('department', 'version').iterator():
+        major = (version or '').split('.')[0].strip()
+        highest[department] = max(highest.get(department, 0), int(major) if major.isdigit() else 0)
+    DepartmentVersionSequence.objects.bulk_create([
+        DepartmentVersionSequence(department=department, last_number=number)
+        for department, number in highest.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizational', '0014_departmentalchart_overrides'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentVersionSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(max_length=100, unique=True, verbose_name='Departamento')),
+                ('last_number', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Versiones',
+                'verbose_name_plural': 'Secuencias de Versiones',
+            },
+        ),
+        migrations.AddField(
+            model_name='departmentalchart',
+            name='version_number',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Número de Versión'),
+        ),
+        migrations.AddIndex(
+            model_name='departmentalchart',
+            index=models.Index(fields=['department', 'status', 'created_at'], name='organizatio_departm_35ae15_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='departmentalchart',
+            constraint=models.UniqueConstraint(fields=('department', 'version_number'), name='unique_department_version_number'),
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
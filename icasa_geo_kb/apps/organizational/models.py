@@ -1,7 +1,10 @@
-from django.db import models
+import copy
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from apps.core.models import TimeStampedModel, ApprovalWorkflowModel
+from .sandbox import MergeConflictError, apply_overrides, compute_overrides, empty_overrides, three_way_merge
 
 
 
@@ -9,6 +12,10 @@ from apps.core.models import TimeStampedModel, ApprovalWorkflowModel
 
 class Position(TimeStampedModel):
     """LA CAJA - El Puesto existe siempre, aunque nadie trabaje ahí"""
+    code = models.CharField(
+        max_length=50, unique=True, null=True, blank=True, verbose_name="Clave del Puesto",
+        help_text="Clave del sistema de RRHH (id_puesto); se usa para sincronizar importaciones"
+    )
     title = models.CharField(max_length=200, verbose_name="Título del Puesto")
     department = models.CharField(max_length=100, verbose_name="Departamento")
     level = models.IntegerField(default=1, verbose_name="Nivel Jerárquico")
@@ -30,16 +37,19 @@ class Position(TimeStampedModel):
     def __str__(self):
         return f"{self.title} - {self.department}"
     
-    def get_current_employee(self, date=None):
-        """Obtiene el empleado actual en este puesto"""
+    def get_current_assignment(self, date=None):
+        """Obtiene la asignación vigente de este puesto en una fecha (por defecto hoy)"""
+        from .occupancy import OccupancyIndex
+        
         if date is None:
             date = timezone.now().date()
         
-        assignment = self.assignments.filter(
-            start_date__lte=date,
-            end_date__isnull=True
-        ).first()
-        
+        # Mismo criterio de vigencia que el índice de ocupación en bloque (occupancy_on)
+        return OccupancyIndex.load([self.id]).assignment_on(self.id, date)
+    
+    def get_current_employee(self, date=None):
+        """Obtiene el empleado que ocupa este puesto en una fecha (por defecto hoy)"""
+        assignment = self.get_current_assignment(date)
         return assignment.employee if assignment else None
     
     def is_vacant(self, date=None):
@@ -69,13 +79,12 @@ class Employee(TimeStampedModel):
     
     def get_current_position(self, date=None):
         """Obtiene el puesto actual del empleado"""
+        from .occupancy import current_assignment_filter
+        
         if date is None:
             date = timezone.now().date()
         
-        assignment = self.assignments.filter(
-            start_date__lte=date,
-            end_date__isnull=True
-        ).first()
+        assignment = self.assignments.filter(current_assignment_filter(date)).order_by('-start_date', '-id').first()
         
         return assignment.position if assignment else None
 
@@ -361,6 +370,13 @@ class DepartmentalChart(TimeStampedModel):
         help_text="Organigrama del cual se clonó esta simulación"
     )
     
+    overrides = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name="Cambios de la Simulación",
+        help_text="Puestos y datos que la simulación cambia respecto al organigrama base"
+    )
+    
     # Control de Versiones
     version = models.CharField(
         max_length=20,
@@ -368,6 +384,13 @@ class DepartmentalChart(TimeStampedModel):
         verbose_name="Versión"
     )
     
+    # Número consecutivo del departamento (ver versioning.py); vacío en simulaciones
+    version_number = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name="Número de Versión"
+    )
+    
     change_justification = models.TextField(
         blank=True,
         verbose_name="Justificación del Cambio",
@@ -414,6 +437,12 @@ class DepartmentalChart(TimeStampedModel):
         verbose_name = "Organigrama Departamental"
         verbose_name_plural = "Organigramas Departamentales"
         ordering = ['-updated_at']
+        indexes = [
+            models.Index(fields=['department', 'status', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['department', 'version_number'], name='unique_department_version_number'),
+        ]
         
     def __str__(self):
         return f"{self.name} - {self.department}"
@@ -433,15 +462,180 @@ class DepartmentalChart(TimeStampedModel):
         """Verifica si el archivo es un PDF"""
         return self.get_file_extension() == 'pdf'
     
+    # Puestos del editor (tabla ChartMembership)
+    
+    def structure_data(self) -> dict:
+        """chart_data con los puestos del editor en 'positions' (formato de snapshots y comparaciones)"""
+        if self.is_layered:
+            return apply_overrides(self.parent_chart.structure_data(), copy.deepcopy(self.overrides))
+        # Copia profunda: modificar el resultado no debe alterar chart_data (ni el de un organigrama base)
+        data = copy.deepcopy(self.chart_data or {})
+        memberships = [membership.as_entry() for membership in self.memberships.all()]
+        if memberships:
+            data['positions'] = memberships
+        return data
+    
+    @transaction.atomic
+    def set_structure_data(self, data: dict) -> dict:
+        """Guardar un payload completo: los puestos del editor van a ChartMembership y el resto a chart_data"""
+        data = dict(data or {})
+        positions = data.get('positions') or []
+        editor_format = bool(positions) and 'position_id' in positions[0]
+        
+        if self.is_layered:
+            # Simulación: solo se guardan las diferencias con el organigrama base
+            base = self.parent_chart.structure_data()
+            if editor_format:
+                current = apply_overrides(base, self.overrides).get('positions') or []
+                data['positions'] = self._editor_entries(positions, current)
+            self.overrides = compute_overrides(base, data)
+            self.save()
+            return {}
+        
+        changes = {}
+        if editor_format:
+            changes = self.sync_memberships(data.pop('positions'))
+        elif self.pk:
+            self.memberships.all().delete()
+        self.chart_data = data
+        self.save()
+        return changes
+    
+    @staticmethod
+    def _editor_entries(entries, current) -> list:
+        """Entradas del editor en el formato de as_entry, conservando la fecha en que se agregó cada puesto"""
+        added_at = {int(entry['position_id']): entry.get('added_at') for entry in current if 'position_id' in entry}
+        normalized, seen = [], set()
+        for entry in entries:
+            position_id = int(entry['position_id'])
+            if position_id in seen:
+                continue
+            seen.add(position_id)
+            normalized.append({
+                'position_id': position_id,
+                'x': int(entry.get('x', 100)),
+                'y': int(entry.get('y', 100)),
+                'added_at': added_at.get(position_id) or entry.get('added_at') or timezone.now().isoformat(),
+            })
+        return normalized
+    
+    def sync_memberships(self, entries) -> dict:
+        """Dejar ChartMembership igual a entries ({'position_id', 'x', 'y'}) con operaciones en bloque"""
+        wanted = {}
+        for entry in entries:
+            wanted[int(entry['position_id'])] = entry
+        existing = {membership.position_id: membership for membership in self.memberships.all()}
+        valid = set(Position.objects.filter(id__in=set(wanted) - set(existing)).values_list('id', flat=True))
+        
+        creates = [
+            ChartMembership(
+                chart=self, position_id=position_id,
+                x=int(entry.get('x', 100)), y=int(entry.get('y', 100)),
+                added_at=parse_datetime(entry.get('added_at') or '') or timezone.now()
+            )
+            for position_id, entry in wanted.items() if position_id not in existing and position_id in valid
+        ]
+        updates = []
+        for position_id, membership in existing.items():
+            if position_id not in wanted:
+                continue
+            coordinates = (int(wanted[position_id].get('x', 100)), int(wanted[position_id].get('y', 100)))
+            if (membership.x, membership.y) != coordinates:
+                membership.x, membership.y = coordinates
+                updates.append(membership)
+        removed = [membership.id for position_id, membership in existing.items() if position_id not in wanted]
+        
+        ChartMembership.objects.bulk_create(creates, batch_size=500)
+        ChartMembership.objects.bulk_update(updates, ['x', 'y'], batch_size=500)
+        ChartMembership.objects.filter(id__in=removed).delete()
+        return {'added': len(creates), 'updated': len(updates), 'removed': len(removed)}
+    
+    def editor_memberships(self, data: dict = None) -> list:
+        """
+        Puestos del editor con su Position (en simulaciones se arman desde la capa de cambios)
+        data permite reutilizar un structure_data() ya calculado
+        """
+        if not self.is_layered:
+            return list(self.memberships.select_related('position'))
+        if data is None:
+            data = self.structure_data()
+        entries = [entry for entry in data.get('positions') or [] if 'position_id' in entry]
+        positions = Position.objects.in_bulk([int(entry['position_id']) for entry in entries])
+        return [
+            ChartMembership(
+                chart=self, position=positions[int(entry['position_id'])],
+                x=int(entry.get('x', 100)), y=int(entry.get('y', 100)),
+                added_at=parse_datetime(entry.get('added_at') or '') or timezone.now()
+            )
+            for entry in entries if int(entry['position_id']) in positions
+        ]
+    
+    def add_membership(self, position, x=100, y=100):
+        """Agregar un puesto al editor; devuelve (membership, creado)"""
+        if not self.is_layered:
+            return ChartMembership.objects.get_or_create(chart=self, position=position, defaults={'x': x, 'y': y})
+        data = self.structure_data()
+        entries = data.get('positions') or []
+        for entry in entries:
+            if str(entry.get('position_id')) == str(position.id):
+                return ChartMembership(chart=self, position=position, x=entry.get('x', 100), y=entry.get('y', 100)), False
+        membership = ChartMembership(chart=self, position=position, x=x, y=y)
+        data['positions'] = entries + [membership.as_entry()]
+        self.set_structure_data(data)
+        return membership, True
+    
+    def remove_membership(self, position_id) -> bool:
+        """Quitar un puesto del editor junto con sus conexiones"""
+        if not self.is_layered:
+            deleted, _ = self.memberships.filter(position_id=position_id).delete()
+            if not deleted:
+                return False
+            connections = (self.chart_data or {}).get('connections')
+            if connections:
+                self.chart_data['connections'] = [
+                    c for c in connections
+                    if str(c.get('from')) != str(position_id) and str(c.get('to')) != str(position_id)
+                ]
+                self.save(update_fields=['chart_data', 'updated_at'])
+            return True
+        data = self.structure_data()
+        entries = data.get('positions') or []
+        remaining = [entry for entry in entries if str(entry.get('position_id')) != str(position_id)]
+        if len(remaining) == len(entries):
+            return False
+        data['positions'] = remaining
+        if data.get('connections'):
+            data['connections'] = [
+                c for c in data['connections']
+                if str(c.get('from')) != str(position_id) and str(c.get('to')) != str(position_id)
+            ]
+        self.set_structure_data(data)
+        return True
+    
+    # Simulaciones en capas (ver sandbox.py)
+    
+    @property
+    def is_layered(self) -> bool:
+        """Simulación que guarda solo sus cambios sobre parent_chart"""
+        return self.overrides is not None and self.parent_chart_id is not None
+    
+    def materialize(self):
+        """Guardar el contenido combinado como propio y dejar de depender del organigrama base"""
+        if self.is_layered:
+            data = self.structure_data()
+            self.overrides = None
+            self.set_structure_data(data)
+    
     # NUEVOS MÉTODOS CORPORATIVOS
     
     def create_sandbox_copy(self, user, name_suffix="Simulación"):
-        """Crear una copia en modo sandbox para simulaciones"""
-        sandbox_copy = DepartmentalChart.objects.create(
+        """Crear una simulación sobre este organigrama (solo guarda sus propios cambios)"""
+        return DepartmentalChart.objects.create(
             name=f"{self.name} - {name_suffix}",
             department=self.department,
             description=f"Simulación basada en: {self.name}",
-            chart_data=self.chart_data.copy(),
+            chart_data={},
+            overrides=empty_overrides(),
             created_by=user,
             status='sandbox',
             is_sandbox=True,
@@ -449,7 +643,6 @@ class DepartmentalChart(TimeStampedModel):
             version=f"{self.version}-sandbox",
             import_source=self.import_source
         )
-        return sandbox_copy
     
     def get_version_history(self):
         """Obtener historial de versiones"""
@@ -467,81 +660,133 @@ class DepartmentalChart(TimeStampedModel):
         
         return versions
     
-    def approve_and_publish(self, approver, justification=""):
-        """Aprobar y publicar cambios"""
+    def published_head(self):
+        """Última versión publicada que desciende de este organigrama (él mismo si no hay)"""
+        head = self
+        while True:
+            child = DepartmentalChart.objects.filter(
+                parent_chart=head, is_sandbox=False, approved_at__isnull=False
+            ).order_by('-approved_at').first()
+            if child is None:
+                return head
+            head = child
+    
+    def _lock_published_head(self):
+        """
+        Bloquear el organigrama base y luego la última versión publicada de su linaje
+        Las aprobaciones simultáneas de simulaciones hermanas se publican una después de otra
+        """
+        head = self.parent_chart
+        while True:
+            DepartmentalChart.objects.select_for_update().filter(pk=head.pk).exists()
+            current = head.published_head()
+            if current.pk == head.pk:
+                return head
+            head = current
+    
+    def merge_base(self) -> dict:
+        """Contenido del que partió la simulación (base de la fusión de tres vías)"""
+        if not self.is_layered:
+            initial = self.snapshots.filter(version_tag='sandbox-initial').order_by('pk').first()
+            if initial is not None:
+                return initial.get_data()
+        return self.parent_chart.structure_data()
+    
+    def approve_and_publish(self, approver, justification="", conflict_strategy=None):
+        """
+        Aprobar y publicar cambios
+        Si otra simulación del mismo organigrama ya se publicó, los cambios se fusionan con esa
+        versión; los conflictos se informan con MergeConflictError (o se resuelven con conflict_strategy)
+        """
         from django.utils import timezone
+        from .versioning import next_version_number
         
         if self.is_sandbox:
-            # Si es sandbox, crear nueva versión oficial
-            if self.parent_chart:
-                # Archivar versión anterior
-                self.parent_chart.status = 'archived'
-                self.parent_chart.save()
+            with transaction.atomic():
+                base_chart = self.parent_chart
+                head = self._lock_published_head() if base_chart else None
+                if head is not None and head.pk != base_chart.pk:
+                    # Fusión de tres vías: base = organigrama original, ours = simulación, theirs = versión publicada
+                    merged, conflicts = three_way_merge(
+                        self.merge_base(), self.structure_data(), head.structure_data(), conflict_strategy
+                    )
+                    if conflicts:
+                        raise MergeConflictError(conflicts)
+                    self.overrides = None
+                    self.parent_chart = head
+                    self.set_structure_data(merged)
+                else:
+                    # Los cambios de la simulación se combinan con el organigrama base antes de archivarlo
+                    self.materialize()
                 
-                # Incrementar versión
-                old_version = self.parent_chart.version
-                version_parts = old_version.split('.')
-                new_minor = int(version_parts[1]) + 1
-                new_version = f"{version_parts[0]}.{new_minor}"
-            else:
-                new_version = "2.0"
-            
-            # Actualizar este organigrama
-            self.is_sandbox = False
-            self.status = 'active'
-            self.version = new_version
-            self.approved_by = approver
-            self.approved_at = timezone.now()
-            self.change_justification = justification
-            self.save()
+                # Si es sandbox, crear nueva versión oficial
+                if self.parent_chart:
+                    # Archivar versión anterior
+                    self.parent_chart.status = 'archived'
+                    self.parent_chart.save()
+                
+                # Siguiente número del departamento (asignado con bloqueo de fila)
+                self.version_number = next_version_number(self.department)
+                
+                # Actualizar este organigrama
+                self.is_sandbox = False
+                self.status = 'active'
+                self.version = str(self.version_number)
+                self.approved_by = approver
+                self.approved_at = timezone.now()
+                self.change_justification = justification
+                self.save()
             
             return True
         
         return False
     
     def get_changes_summary(self):
-        """Obtener resumen de cambios respecto a la versión anterior"""
-        if not self.parent_chart:
-            return "Versión inicial"
-        
-        # Comparar datos del organigrama
-        old_data = self.parent_chart.chart_data
-        new_data = self.chart_data
+        """Obtener resumen de cambios respecto a la versión anterior (mismo formato que diff_charts)"""
+        from .diff import diff_charts, empty_diff
         
-        changes = {
-            'positions_added': [],
-            'positions_removed': [],
-            'positions_moved': [],
-            'summary': ''
-        }
-        
-        # Aquí iría la lógica de comparación
-        # Por simplicidad, retornamos un resumen básico
-        changes['summary'] = f"Cambios realizados el {self.updated_at.strftime('%d/%m/%Y')}"
-        
-        return changes
-    
-    def get_changes_summary(self):
-        """Obtener resumen de cambios respecto a la versión anterior"""
         if not self.parent_chart:
-            return "Versión inicial"
-        
-        # Comparar datos del organigrama
-        old_data = self.parent_chart.chart_data
-        new_data = self.chart_data
+            return empty_diff("Versión inicial")
         
-        changes = {
-            'positions_added': [],
-            'positions_removed': [],
-            'positions_moved': [],
-            'summary': ''
+        return diff_charts(self.parent_chart, self)
+
+class DepartmentVersionSequence(models.Model):
+    """Último número de versión asignado en cada departamento"""
+    department = models.CharField(max_length=100, unique=True, verbose_name="Departamento")
+    last_number = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        verbose_name = "Secuencia de Versiones"
+        verbose_name_plural = "Secuencias de Versiones"
+    
+    def __str__(self):
+        return f"{self.department}: {self.last_number}"
+
+class ChartMembership(models.Model):
+    """Puesto incluido en un organigrama del editor, con su ubicación en el lienzo"""
+    chart = models.ForeignKey(DepartmentalChart, on_delete=models.CASCADE, related_name='memberships')
+    position = models.ForeignKey(Position, on_delete=models.CASCADE, related_name='chart_memberships')
+    x = models.IntegerField(default=100)
+    y = models.IntegerField(default=100)
+    added_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        verbose_name = "Puesto en Organigrama"
+        verbose_name_plural = "Puestos en Organigramas"
+        unique_together = ['chart', 'position']
+        ordering = ['added_at', 'id']
+    
+    def __str__(self):
+        return f"{self.chart} - {self.position}"
+    
+    def as_entry(self) -> dict:
+        """Formato de chart_data['positions'] del editor"""
+        return {
+            'position_id': self.position_id,
+            'x': self.x,
+            'y': self.y,
+            'added_at': self.added_at.isoformat(),
         }
-        
-        # Aquí iría la lógica de comparación
-        # Por simplicidad, retornamos un resumen básico
-        changes['summary'] = f"Cambios realizados el {self.updated_at.strftime('%d/%m/%Y')}"
-        
-        return changes
 
 # Modelo para el organigrama principal
 class OrganizationalChart(ApprovalWorkflowModel, TimeStampedModel):
@@ -561,8 +806,20 @@ class OrganizationalChart(ApprovalWorkflowModel, TimeStampedModel):
 
 class OrganizationalSnapshot(TimeStampedModel):
     """Instantáneas del organigrama para control de versiones"""
+    STORAGE_CHOICES = [
+        ('full', 'Completa'),
+        ('delta', 'Diferencia'),
+    ]
+    
     chart = models.ForeignKey(DepartmentalChart, on_delete=models.CASCADE, related_name='snapshots')
-    snapshot_data = models.JSONField(verbose_name="Datos de la Instantánea")
+    # Solo en instantáneas completas; las diferencias se reconstruyen con get_data()
+    snapshot_data = models.JSONField(null=True, blank=True, verbose_name="Datos de la Instantánea")
+    storage = models.CharField(max_length=10, choices=STORAGE_CHOICES, default='full')
+    base = models.ForeignKey('self', on_delete=models.RESTRICT, null=True, blank=True, related_name='+')
+    keyframe = models.ForeignKey('self', on_delete=models.RESTRICT, null=True, blank=True, related_name='+')
+    delta = models.JSONField(null=True, blank=True, verbose_name="Parche JSON respecto a la base")
+    chain_length = models.PositiveIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
     version_tag = models.CharField(max_length=50, verbose_name="Etiqueta de Versión")
     created_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True)
     notes = models.TextField(blank=True, verbose_name="Notas")
@@ -574,6 +831,11 @@ class OrganizationalSnapshot(TimeStampedModel):
     
     def __str__(self):
         return f"{self.chart.name} - {self.version_tag}"
+    
+    def get_data(self) -> dict:
+        """Contenido completo de la instantánea"""
+        from .snapshots import snapshot_data
+        return snapshot_data(self)
 
 class ImportLog(TimeStampedModel):
     """Registro de importaciones de datos"""
@@ -594,6 +856,19 @@ class ImportLog(TimeStampedModel):
     error_log = models.JSONField(default=list, blank=True)
     imported_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True)
     
+    # Progreso (se actualiza por lotes durante la importación)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ('running', 'En proceso'),
+            ('completed', 'Completada'),
+            ('failed', 'Fallida')
+        ],
+        default='completed'
+    )
+    total_records = models.IntegerField(default=0, help_text="Filas estimadas del archivo")
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         verbose_name = "Registro de Importación"
         verbose_name_plural = "Registros de Importación"
@@ -602,6 +877,50 @@ class ImportLog(TimeStampedModel):
     def __str__(self):
         return f"Importación {self.import_type} - {self.created_at.strftime('%d/%m/%Y')}"
 
+class ImportJob(TimeStampedModel):
+    """Importación en segundo plano: el archivo se guarda y un worker lo procesa"""
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('running', 'En proceso'),
+        ('completed', 'Completada'),
+        ('failed', 'Fallida')
+    ]
+    
+    file = models.FileField(upload_to='imports/%Y/%m/')
+    file_name = models.CharField(max_length=255)
+    import_type = models.CharField(max_length=20, default='excel')
+    chart_name = models.CharField(max_length=200)
+    department = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    task_id = models.CharField(max_length=255, blank=True, help_text="Id de la tarea Celery (si aplica)")
+    chart = models.ForeignKey(DepartmentalChart, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    import_log = models.OneToOneField(ImportLog, on_delete=models.SET_NULL, null=True, blank=True, related_name='job')
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True)
+    
+    class Meta:
+        verbose_name = "Trabajo de Importación"
+        verbose_name_plural = "Trabajos de Importación"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.file_name} ({self.get_status_display()})"
+
+class OrganigramLayout(TimeStampedModel):
+    """Versión del acomodo del organigrama interactivo (control de concurrencia optimista)"""
+    name = models.CharField(max_length=50, unique=True, default='interactivo')
+    version = models.PositiveIntegerField(default=0)
+    updated_by = models.ForeignKey('auth.User', on_delete=models.SET_NULL, null=True, blank=True)
+    
+    class Meta:
+        verbose_name = "Acomodo del Organigrama"
+        verbose_name_plural = "Acomodos del Organigrama"
+    
+    def __str__(self):
+        return f"{self.name} (v{self.version})"
+
 class ApprovalWorkflow(TimeStampedModel):
     """Flujo de aprobación para cambios organizacionales"""
     chart = models.ForeignKey(DepartmentalChart, on_delete=models.CASCADE, related_name='approvals')
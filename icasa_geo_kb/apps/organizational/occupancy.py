@@ -0,0 +1,126 @@
+"""
+Índice de ocupación por fecha sobre PositionAssignment
+Responde "quién ocupa el puesto P en la fecha D" y "qué puestos están vacantes
+en la fecha D" para toda la organización con una sola consulta
+"""
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date as date_type
+from typing import Dict, Iterable, List, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from .models import Position, PositionAssignment
+
+
+def current_assignment_filter(date: date_type, prefix: str = '') -> Q:
+    """
+    Condición de asignación vigente en una fecha: start_date <= date <= end_date (sin fin = abierta)
+    prefix permite usarla desde otro modelo (p. ej. 'assignments__' sobre Position)
+    """
+    return Q(**{f'{prefix}start_date__lte': date}) & (
+        Q(**{f'{prefix}end_date__isnull': True}) | Q(**{f'{prefix}end_date__gte': date})
+    )
+
+
+class OccupancyIndex:
+    """Índice de intervalos [start_date, end_date] por puesto"""
+
+    def __init__(self, assignments: Iterable[PositionAssignment]):
+        intervals = defaultdict(list)
+        for assignment in assignments:
+            intervals[assignment.position_id].append(assignment)
+
+        # Por puesto: fechas de inicio ordenadas (para bisect) y las asignaciones en el mismo orden
+        self._starts = {}
+        self._assignments = {}
+        for position_id, items in intervals.items():
+            items.sort(key=lambda a: (a.start_date, a.id))
+            self._starts[position_id] = [a.start_date for a in items]
+            self._assignments[position_id] = items
+
+    @classmethod
+    def load(cls, positions=None) -> 'OccupancyIndex':
+        """
+        Cargar el índice con una sola consulta
+        positions puede ser un QuerySet de Position (se usa como subconsulta) o una lista de IDs
+        """
+        assignments = PositionAssignment.objects.select_related('employee')
+        if isinstance(positions, QuerySet):
+            assignments = assignments.filter(position__in=positions.values('id'))
+        elif positions is not None:
+            assignments = assignments.filter(position_id__in=list(positions))
+        return cls(assignments)
+
+    @property
+    def position_ids(self) -> List[int]:
+        """Puestos con al menos una asignación en el índice"""
+        return list(self._assignments)
+
+    def assignment_on(self, position_id: int, date: date_type) -> Optional[PositionAssignment]:
+        """Asignación vigente de un puesto en una fecha (la de inicio más reciente)"""
+        starts = self._starts.get(position_id)
+        if not starts:
+            return None
+
+        # Candidatas: asignaciones iniciadas en o antes de la fecha, de la más reciente a la más antigua
+        items = self._assignments[position_id]
+        for i in range(bisect_right(starts, date) - 1, -1, -1):
+            assignment = items[i]
+            if assignment.end_date is None or assignment.end_date >= date:
+                return assignment
+        return None
+
+    def employee_on(self, position_id: int, date: date_type):
+        """Empleado que ocupa un puesto en una fecha (None si está vacante)"""
+        assignment = self.assignment_on(position_id, date)
+        return assignment.employee if assignment else None
+
+    def occupancy_on(self, date: date_type, position_ids: Iterable[int]) -> Dict[int, object]:
+        """Mapa puesto -> empleado (o None) para una fecha"""
+        return {position_id: self.employee_on(position_id, date) for position_id in position_ids}
+
+    def vacancies_on(self, date: date_type, position_ids: Iterable[int]) -> List[int]:
+        """IDs de los puestos vacantes en una fecha"""
+        return [position_id for position_id in position_ids if self.assignment_on(position_id, date) is None]
+
+    def annotate(self, positions: Iterable[Position], date: date_type) -> List[Position]:
+        """Agregar current_employee y vacant a cada puesto para que las plantillas no consulten por fila"""
+        positions = list(positions)
+        for position in positions:
+            position.current_employee = self.employee_on(position.id, date)
+            position.vacant = position.current_employee is None
+        return positions
+
+
+def occupancy_on(date: Optional[date_type] = None, position_ids: Optional[Iterable[int]] = None) -> Dict[int, object]:
+    """
+    Ocupación de los puestos en una fecha (por defecto hoy)
+    Si no se indican puestos se devuelven todos los puestos con historial de asignaciones
+    """
+    if date is None:
+        date = timezone.now().date()
+    if position_ids is not None:
+        position_ids = list(position_ids)
+
+    index = OccupancyIndex.load(position_ids)
+    if position_ids is None:
+        position_ids = index.position_ids
+    return index.occupancy_on(date, position_ids)
+
+
+def vacancies_on(date: Optional[date_type] = None, position_ids: Optional[Iterable[int]] = None) -> List[int]:
+    """
+    Puestos vacantes en una fecha (por defecto hoy)
+    Si no se indican puestos se revisan todos los puestos de la organización
+    """
+    if date is None:
+        date = timezone.now().date()
+    if position_ids is None:
+        position_ids = list(Position.objects.order_by('id').values_list('id', flat=True))
+        index = OccupancyIndex.load()
+    else:
+        position_ids = list(position_ids)
+        index = OccupancyIndex.load(position_ids)
+    return index.vacancies_on(date, position_ids)
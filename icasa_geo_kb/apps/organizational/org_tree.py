@@ -0,0 +1,254 @@
+"""
+Motor de árbol organizacional materializado en memoria
+Carga Position, PositionAssignment y Employee en tres consultas y construye
+un árbol compacto basado en arreglos para servir el organigrama interactivo
+"""
+import threading
+from array import array
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .hierarchy import Hierarchy
+from .layout import TreeLayout
+from .models import Position, PositionAssignment, Employee
+from .occupancy import current_assignment_filter
+
+# Contador de invalidaciones: con varios procesos la cache debe ser compartida (REDIS_URL en settings);
+# con LocMemCache los demás procesos no ven el cambio y siguen sirviendo su árbol anterior
+GENERATION_CACHE_KEY = 'organizational:org_tree:generation'
+
+# Cajas del organigrama interactivo en px (ver .org-node en interactive_organigram.html)
+CANVAS_NODE_WIDTH = getattr(settings, 'ORG_CANVAS_NODE_WIDTH', 200)
+CANVAS_NODE_HEIGHT = getattr(settings, 'ORG_CANVAS_NODE_HEIGHT', 80)
+CANVAS_SIBLING_GAP = getattr(settings, 'ORG_CANVAS_SIBLING_GAP', 40)
+CANVAS_SUBTREE_GAP = getattr(settings, 'ORG_CANVAS_SUBTREE_GAP', 60)
+CANVAS_LEVEL_GAP = getattr(settings, 'ORG_CANVAS_LEVEL_GAP', 100)
+CANVAS_MARGIN = 100
+
+# Cambios de jefe que se aplican sobre el diagrama anterior en lugar de recalcularlo
+MAX_INCREMENTAL_MOVES = 50
+
+_lock = threading.Lock()
+_tree = None
+_tree_generation = None
+
+
+class OrgTree:
+    """Árbol organizacional compacto: cada puesto es un índice entero"""
+
+    def __init__(self, positions: List[tuple], occupancy: Dict[int, int], employees: Dict[int, tuple]):
+        # positions: (id, title, department, level, x, y, reports_to_id) ordenados por id
+        self.rows = positions
+        self.ids = array('q', (row[0] for row in positions))
+
+        n = len(positions)
+
+        # Padre, hijos (CSR), niveles y subárboles con el constructor iterativo compartido
+        self.hierarchy = Hierarchy(self.ids, [row[6] for row in positions])
+        self.index = self.hierarchy.index
+        self.parent = self.hierarchy.parent
+        self.child_offsets = self.hierarchy.child_offsets
+        self.children = self.hierarchy.children
+
+        # Ocupante actual: índice en self.employees o -1 si está vacante
+        self.employees = list(employees.values())
+        employee_index = {employee_id: i for i, employee_id in enumerate(employees)}
+        self.occupant = array('i', [-1]) * n
+        for position_id, employee_id in occupancy.items():
+            i = self.index.get(position_id)
+            if i is not None and employee_id in employee_index:
+                self.occupant[i] = employee_index[employee_id]
+
+        self._payload = None
+        self._layout = None
+        self._previous = None
+
+    @classmethod
+    def build(cls, date=None) -> 'OrgTree':
+        """Construir el árbol con tres consultas en bloque (ocupantes vigentes en date, por defecto hoy)"""
+        if date is None:
+            date = timezone.now().date()
+        positions = list(
+            Position.objects.order_by('id').values_list(
+                'id', 'title', 'department', 'level', 'x_position', 'y_position', 'reports_to_id'
+            )
+        )
+
+        # Asignación vigente de inicio más reciente de cada puesto (mismo criterio que OccupancyIndex)
+        occupancy = {}
+        for position_id, employee_id in PositionAssignment.objects.filter(
+            current_assignment_filter(date)
+        ).order_by('position_id', '-start_date', '-id').values_list('position_id', 'employee_id'):
+            occupancy.setdefault(position_id, employee_id)
+
+        employees = {
+            row[0]: row for row in Employee.objects.filter(
+                current_assignment_filter(date, 'assignments__')
+            ).distinct().values_list(
+                'id', 'first_name', 'last_name', 'employee_id', 'email', 'phone', 'photo', 'hire_date'
+            )
+        }
+
+        return cls(positions, occupancy, employees)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_children(self, position_id: int) -> List[int]:
+        """IDs de los puestos que reportan directamente a un puesto"""
+        i = self.index[position_id]
+        return [self.ids[c] for c in self.children[self.child_offsets[i]:self.child_offsets[i + 1]]]
+
+    def get_occupant(self, position_id: int) -> Optional[tuple]:
+        """Datos del empleado que ocupa un puesto (None si está vacante)"""
+        employee_index = self.occupant[self.index[position_id]]
+        return self.employees[employee_index] if employee_index >= 0 else None
+
+    # Diagrama automático
+
+    def inherit_layout(self, previous: 'OrgTree'):
+        """Reutilizar el diagrama del árbol anterior si solo cambiaron algunos jefes"""
+        self._previous = previous
+
+    def auto_layout(self) -> TreeLayout:
+        if self._layout is None:
+            self._layout = self._reuse_layout() or TreeLayout(
+                self.hierarchy,
+                node_width=CANVAS_NODE_WIDTH,
+                node_height=CANVAS_NODE_HEIGHT,
+                sibling_gap=CANVAS_SIBLING_GAP,
+                subtree_gap=CANVAS_SUBTREE_GAP,
+                level_gap=CANVAS_LEVEL_GAP
+            )
+        return self._layout
+
+    def _reuse_layout(self) -> Optional[TreeLayout]:
+        """Aplicar los cambios de jefe como movimientos incrementales sobre el diagrama anterior"""
+        previous, self._previous = self._previous, None
+        if previous is None or previous._layout is None or previous.ids != self.ids:
+            return None
+        if previous.hierarchy.cycles or self.hierarchy.cycles:
+            return None
+        moves = [i for i in range(len(self.ids)) if previous.parent[i] != self.parent[i]]
+        if len(moves) > MAX_INCREMENTAL_MOVES:
+            return None
+
+        layout, previous._layout = previous._layout, None
+        try:
+            for i in moves:
+                layout.move(i, self.parent[i] if self.parent[i] >= 0 else None)
+        except ValueError:
+            return None  # un estado intermedio formaba un ciclo: se recalcula completo
+        layout.hierarchy = self.hierarchy
+        return layout
+
+    def auto_positions(self) -> Dict[int, Dict]:
+        """Esquina superior izquierda (px) de cada puesto según el diagrama automático"""
+        layout = self.auto_layout()
+        return {
+            self.ids[i]: {
+                'x': round(CANVAS_MARGIN + layout.x[i] - layout.widths[i] / 2),
+                'y': round(CANVAS_MARGIN + layout.y[i]),
+            }
+            for i in layout.order
+        }
+
+    def as_payload(self) -> Dict:
+        """Payload JSON del organigrama interactivo (se calcula una sola vez)"""
+        if self._payload is None:
+            self._payload = self._build_payload()
+        return self._payload
+
+    def _build_payload(self) -> Dict:
+        photo_storage = Employee._meta.get_field('photo').storage
+
+        # Los puestos sin coordenadas guardadas (0 o vacías) usan el diagrama automático
+        auto_positions = None
+        if not all(row[4] and row[5] for row in self.rows):
+            auto_positions = self.auto_positions()
+
+        org_data = []
+        vacant_positions = 0
+        for i, (position_id, title, department, level, x, y, _) in enumerate(self.rows):
+            if not (x and y):
+                x, y = auto_positions[position_id]['x'], auto_positions[position_id]['y']
+            parent_index = self.parent[i]
+            employee_index = self.occupant[i]
+
+            employee_data = None
+            if employee_index >= 0:
+                emp_id, first_name, last_name, code, email, phone, photo, hire_date = self.employees[employee_index]
+                employee_data = {
+                    'id': emp_id,
+                    'name': f"{first_name} {last_name}",
+                    'employee_id': code,
+                    'email': email,
+                    'phone': phone,
+                    'photo': photo_storage.url(photo) if photo else None,
+                    'hire_date': hire_date.strftime('%Y-%m-%d')
+                }
+            else:
+                vacant_positions += 1
+
+            org_data.append({
+                'id': position_id,
+                'title': title,
+                'department': department,
+                'level': level,
+                'x_position': x,
+                'y_position': y,
+                'reports_to': self.ids[parent_index] if parent_index >= 0 else None,
+                'direct_reports': self.hierarchy.span_of_control(i),
+                'total_reports': self.hierarchy.subtree_size[i] - 1,
+                'is_vacant': employee_data is None,
+                'employee': employee_data
+            })
+
+        total_positions = len(org_data)
+        filled_positions = total_positions - vacant_positions
+        fill_rate = (filled_positions / total_positions * 100) if total_positions > 0 else 0
+
+        return {
+            'positions': org_data,
+            'stats': {
+                'total_positions': total_positions,
+                'filled_positions': filled_positions,
+                'vacant_positions': vacant_positions,
+                'fill_rate': round(fill_rate, 1)
+            },
+            'departments': list(dict.fromkeys(row[2] for row in self.rows))
+        }
+
+
+def get_org_tree() -> OrgTree:
+    """Obtener el árbol materializado, reconstruyéndolo si fue invalidado"""
+    global _tree, _tree_generation
+
+    # La ocupación depende de la fecha: el árbol también se reconstruye al cambiar el día
+    generation = (cache.get(GENERATION_CACHE_KEY, 0), timezone.now().date())
+    tree = _tree
+    if tree is not None and _tree_generation == generation:
+        return tree
+
+    with _lock:
+        if _tree is None or _tree_generation != generation:
+            previous = _tree
+            _tree = OrgTree.build()
+            if previous is not None:
+                _tree.inherit_layout(previous)
+            _tree_generation = generation
+        return _tree
+
+
+def invalidate_org_tree():
+    """Invalidar el árbol materializado (llamar tras cambios en puestos o asignaciones)"""
+    global _tree_generation
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+    # Se conserva el árbol anterior para reutilizar su diagrama al reconstruir
+    _tree_generation = None
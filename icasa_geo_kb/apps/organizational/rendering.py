@@ -0,0 +1,258 @@
+"""
+Dibujo de organigramas a partir del diagrama calculado en layout.py
+La misma geometría se emite como SVG, como dibujo vectorial de ReportLab
+(Libro de Organización en PDF) y como diapositivas de PowerPoint
+"""
+from io import BytesIO
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from reportlab.graphics.shapes import Drawing, Group, Line, Rect, String
+from reportlab.lib import colors
+
+try:
+    from pptx import Presentation
+    from pptx.dml.color import RGBColor
+    from pptx.enum.shapes import MSO_CONNECTOR, MSO_SHAPE
+    from pptx.util import Emu, Pt
+except ImportError:  # python-pptx es opcional (requirements_corporate.txt)
+    Presentation = None
+
+# Colores corporativos (mismos que las tablas del PDF)
+BOX_FILL = '#F1F8E9'
+BOX_STROKE = '#8BC34A'
+VACANT_STROKE = '#E53935'
+TEXT_COLOR = '#1B5E20'
+LINE_COLOR = '#9E9E9E'
+
+TITLE_FONT_SIZE = 8
+NAME_FONT_SIZE = 7
+
+# Ancho promedio de un carácter de Helvetica respecto al tamaño de fuente
+CHAR_WIDTH = 0.52
+
+
+def pptx_available() -> bool:
+    return Presentation is not None
+
+
+def _fit(text: str, width: float, font_size: float) -> str:
+    limit = max(4, int(width / (font_size * CHAR_WIDTH)))
+    return text if len(text) <= limit else text[:limit - 1] + '…'
+
+
+def _wrap(text: str, width: float, font_size: float, max_lines: int = 2) -> List[str]:
+    """Partir el título en líneas por palabras; la última se recorta"""
+    limit = max(4, int(width / (font_size * CHAR_WIDTH)))
+    lines, current = [], ''
+    for word in (text or '').split():
+        candidate = f"{current} {word}".strip()
+        if len(candidate) <= limit or not current:
+            current = candidate
+        else:
+            lines.append(current)
+            current = word
+    if current:
+        lines.append(current)
+    if len(lines) > max_lines:
+        lines = lines[:max_lines - 1] + [' '.join(lines[max_lines - 1:])]
+    return [_fit(line, width, font_size) for line in lines]
+
+
+def box_text(node: Dict, page_node: Dict, width: float) -> Dict:
+    """Líneas de texto de una caja y si el puesto está vacante"""
+    width -= 8
+    vacant = not node.get('employee')
+    name = 'VACANTE' if vacant else node['employee']
+    note = None
+    if page_node.get('continued') is not None:
+        note = f"continúa en pág. {page_node['continued'] + 1}"
+    elif page_node.get('from') is not None:
+        note = f"viene de pág. {page_node['from'] + 1}"
+    return {
+        'title': _wrap(node.get('title') or '', width, TITLE_FONT_SIZE),
+        'name': _fit(name, width, NAME_FONT_SIZE),
+        'note': note,
+        'vacant': vacant,
+    }
+
+
+def _connectors(page: Dict, node_height: float) -> List[tuple]:
+    """Segmentos de las líneas jefe-subordinado: bajada, horizontal y subida por cada jefe"""
+    position = {item['i']: item for item in page['nodes']}
+    children: Dict[int, List[int]] = {}
+    for parent, child in page['edges']:
+        children.setdefault(parent, []).append(child)
+
+    segments = []
+    for parent, kids in children.items():
+        top = position[parent]
+        bus_y = top['y'] + node_height + (position[kids[0]]['y'] - top['y'] - node_height) / 2
+        segments.append((top['x'], top['y'] + node_height, top['x'], bus_y))
+        xs = [position[kid]['x'] for kid in kids]
+        if len(xs) > 1 or xs[0] != top['x']:
+            segments.append((min(xs + [top['x']]), bus_y, max(xs + [top['x']]), bus_y))
+        for kid in kids:
+            segments.append((position[kid]['x'], bus_y, position[kid]['x'], position[kid]['y']))
+    return segments
+
+
+# SVG
+
+def render_svg(layout: Dict, page: Optional[Dict] = None, margin: float = 20) -> str:
+    """Documento SVG del diagrama completo (o de una página)"""
+    page = page or layout['full']
+    nodes = layout['nodes']
+    width, height = layout['node_width'], layout['node_height']
+    total_width = page['width'] + 2 * margin
+    total_height = page['height'] + 2 * margin
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width:.0f}" height="{total_height:.0f}" '
+        f'viewBox="0 0 {total_width:.0f} {total_height:.0f}" font-family="Helvetica, Arial, sans-serif">',
+        f'<g transform="translate({margin},{margin})">',
+        f'<g stroke="{LINE_COLOR}" stroke-width="1" fill="none">',
+    ]
+    for x1, y1, x2, y2 in _connectors(page, height):
+        parts.append(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"/>')
+    parts.append('</g>')
+
+    for item in page['nodes']:
+        text = box_text(nodes[item['i']], item, width)
+        left, top = item['x'] - width / 2, item['y']
+        stroke = VACANT_STROKE if text['vacant'] else BOX_STROKE
+        parts.append(
+            f'<g><rect x="{left:.1f}" y="{top:.1f}" width="{width:.0f}" height="{height:.0f}" rx="4" '
+            f'fill="{BOX_FILL}" stroke="{stroke}" stroke-width="1.5"/>'
+        )
+        line_y = top + 14
+        for line in text['title']:
+            parts.append(
+                f'<text x="{item["x"]:.1f}" y="{line_y:.1f}" font-size="{TITLE_FONT_SIZE}" font-weight="bold" '
+                f'text-anchor="middle" fill="{TEXT_COLOR}">{escape(line)}</text>'
+            )
+            line_y += TITLE_FONT_SIZE + 2
+        parts.append(
+            f'<text x="{item["x"]:.1f}" y="{line_y + 2:.1f}" font-size="{NAME_FONT_SIZE}" text-anchor="middle" '
+            f'fill="{VACANT_STROKE if text["vacant"] else "#424242"}">{escape(text["name"])}</text>'
+        )
+        if text['note']:
+            parts.append(
+                f'<text x="{item["x"]:.1f}" y="{top + height - 4:.1f}" font-size="6" text-anchor="middle" '
+                f'fill="#757575">{escape(text["note"])}</text>'
+            )
+        parts.append('</g>')
+
+    parts.append('</g></svg>')
+    return '\n'.join(parts)
+
+
+# ReportLab (PDF vectorial)
+
+def page_drawing(layout: Dict, page: Dict, max_width: float, max_height: float) -> Drawing:
+    """Dibujo de una página escalado para caber en el marco del documento"""
+    if not page['nodes']:
+        # Organigrama sin puestos que dibujar (p. ej. todos sus puestos fueron eliminados)
+        return Drawing(0, 0)
+    nodes = layout['nodes']
+    width, height = layout['node_width'], layout['node_height']
+    scale = min(1.0, max_width / page['width'], max_height / page['height'])
+
+    # ReportLab dibuja con el origen abajo: se invierte el eje y
+    group = Group()
+    flip = page['height']
+    for x1, y1, x2, y2 in _connectors(page, height):
+        group.add(Line(x1, flip - y1, x2, flip - y2, strokeColor=colors.HexColor(LINE_COLOR), strokeWidth=0.8))
+
+    for item in page['nodes']:
+        text = box_text(nodes[item['i']], item, width)
+        top = flip - item['y']
+        group.add(Rect(
+            item['x'] - width / 2, top - height, width, height, rx=3, ry=3,
+            fillColor=colors.HexColor(BOX_FILL),
+            strokeColor=colors.HexColor(VACANT_STROKE if text['vacant'] else BOX_STROKE),
+            strokeWidth=1.2
+        ))
+        line_y = top - 12
+        for line in text['title']:
+            group.add(String(item['x'], line_y, line, fontName='Helvetica-Bold', fontSize=TITLE_FONT_SIZE,
+                             fillColor=colors.HexColor(TEXT_COLOR), textAnchor='middle'))
+            line_y -= TITLE_FONT_SIZE + 2
+        group.add(String(item['x'], line_y - 2, text['name'], fontName='Helvetica', fontSize=NAME_FONT_SIZE,
+                         fillColor=colors.HexColor(VACANT_STROKE if text['vacant'] else '#424242'),
+                         textAnchor='middle'))
+        if text['note']:
+            group.add(String(item['x'], top - height + 4, text['note'], fontName='Helvetica-Oblique', fontSize=6,
+                             fillColor=colors.HexColor('#757575'), textAnchor='middle'))
+
+    group.scale(scale, scale)
+    drawing = Drawing(page['width'] * scale, page['height'] * scale)
+    drawing.add(group)
+    return drawing
+
+
+# PowerPoint
+
+def render_pptx(layout: Dict, title: str, subtitle: str = '') -> bytes:
+    """Presentación con portada y una diapositiva por página del diagrama"""
+    if Presentation is None:
+        raise ImportError("python-pptx no está instalado")
+
+    presentation = Presentation()
+    presentation.slide_width = Emu(12192000)  # 16:9
+    presentation.slide_height = Emu(6858000)
+
+    cover = presentation.slides.add_slide(presentation.slide_layouts[0])
+    cover.shapes.title.text = title
+    cover.placeholders[1].text = subtitle
+
+    nodes = layout['nodes']
+    width, height = layout['node_width'], layout['node_height']
+    slide_width = presentation.slide_width / 12700  # EMU -> puntos
+    slide_height = presentation.slide_height / 12700
+    margin, header = 24, 40
+
+    pages = layout.get('pages') or [layout['full']]
+    for number, page in enumerate(pages):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+        caption = slide.shapes.add_textbox(Pt(margin), Pt(8), Pt(slide_width - 2 * margin), Pt(24))
+        caption.text_frame.text = f"{title} ({number + 1}/{len(pages)})" if len(pages) > 1 else title
+        caption.text_frame.paragraphs[0].runs[0].font.size = Pt(16)
+        if not page['nodes']:
+            continue
+
+        scale = min(1.0, (slide_width - 2 * margin) / page['width'],
+                    (slide_height - header - margin) / page['height'])
+        offset_x = (slide_width - page['width'] * scale) / 2
+
+        def point(x, y):
+            return Pt(offset_x + x * scale), Pt(header + y * scale)
+
+        for x1, y1, x2, y2 in _connectors(page, height):
+            line = slide.shapes.add_connector(MSO_CONNECTOR.STRAIGHT, *point(x1, y1), *point(x2, y2))
+            line.line.color.rgb = RGBColor.from_string(LINE_COLOR[1:])
+
+        for item in page['nodes']:
+            text = box_text(nodes[item['i']], item, width)
+            left, top = point(item['x'] - width / 2, item['y'])
+            box = slide.shapes.add_shape(MSO_SHAPE.ROUNDED_RECTANGLE, left, top, Pt(width * scale), Pt(height * scale))
+            box.fill.solid()
+            box.fill.fore_color.rgb = RGBColor.from_string(BOX_FILL[1:])
+            box.line.color.rgb = RGBColor.from_string((VACANT_STROKE if text['vacant'] else BOX_STROKE)[1:])
+
+            frame = box.text_frame
+            frame.word_wrap = True
+            lines = [(' '.join(text['title']), TITLE_FONT_SIZE, True), (text['name'], NAME_FONT_SIZE, False)]
+            if text['note']:
+                lines.append((text['note'], 6, False))
+            for index, (value, size, bold) in enumerate(lines):
+                paragraph = frame.paragraphs[0] if index == 0 else frame.add_paragraph()
+                run = paragraph.add_run()
+                run.text = value
+                run.font.size = Pt(max(5, size * scale))
+                run.font.bold = bold
+                run.font.color.rgb = RGBColor.from_string(TEXT_COLOR[1:])
+
+    buffer = BytesIO()
+    presentation.save(buffer)
+    return buffer.getvalue()
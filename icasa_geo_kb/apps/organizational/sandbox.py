@@ -0,0 +1,229 @@
+"""
+Simulaciones como capas sobre el organigrama base (copy-on-write)
+Una simulación guarda solo los puestos que cambió, agregó o quitó y las claves de
+chart_data que reemplazó; al leerla se combinan con el contenido actual del organigrama base.
+Si otra simulación del mismo organigrama se publicó antes, la aprobación combina ambas
+versiones con una fusión de tres vías (base, nuestra y la publicada)
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from .hierarchy import build_hierarchy
+
+# Claves de chart_data que describen el guardado y no se fusionan (gana la simulación)
+UNMERGED_KEYS = ('metadata',)
+
+# Claves calculadas a partir de los puestos; se recalculan después de fusionar
+DERIVED_KEYS = ('hierarchy',)
+
+MERGE_STRATEGIES = ('ours', 'theirs')
+
+# Campo o clave ausente (distinto de un valor None)
+_MISSING = object()
+
+
+class MergeConflictError(Exception):
+    """La simulación y la versión publicada cambiaron lo mismo de forma distinta"""
+
+    def __init__(self, conflicts: List[Dict]):
+        super().__init__(f"{len(conflicts)} conflicto(s) con la versión publicada")
+        self.conflicts = conflicts
+
+
+def position_key(entry: Dict) -> str:
+    """Clave de un puesto en chart_data (id importado o position_id del editor)"""
+    key = entry.get('position_id')
+    if key is None:
+        key = entry.get('id')
+    return str(key).strip() if key is not None else ''
+
+
+def empty_overrides() -> Dict:
+    return {'positions': {}, 'added': [], 'data': {}, 'removed_keys': []}
+
+
+def apply_overrides(base: Dict, overrides: Dict) -> Dict:
+    """Contenido de la simulación: el organigrama base con los cambios aplicados"""
+    data = {key: value for key, value in base.items() if key != 'positions'}
+    data.update(overrides.get('data') or {})
+    for key in overrides.get('removed_keys') or []:
+        data.pop(key, None)
+
+    changes = overrides.get('positions') or {}
+    base_positions = base.get('positions') or []
+    positions = []
+    for entry in base_positions:
+        key = position_key(entry)
+        if key not in changes:
+            positions.append(entry)
+        elif changes[key] is not None:
+            positions.append(changes[key])
+    present = {position_key(entry) for entry in base_positions}
+    for key in overrides.get('added') or []:
+        if key not in present and changes.get(key) is not None:
+            positions.append(changes[key])
+
+    if positions or 'positions' in base:
+        data['positions'] = positions
+    return data
+
+
+def compute_overrides(base: Dict, data: Dict) -> Dict:
+    """Cambios mínimos que convierten base en data (solo los puestos distintos)"""
+    overrides = empty_overrides()
+    base_positions = {position_key(entry): entry for entry in base.get('positions') or []}
+    seen = set()
+    for entry in data.get('positions') or []:
+        key = position_key(entry)
+        if key in seen:
+            continue
+        seen.add(key)
+        if base_positions.get(key) != entry:
+            overrides['positions'][key] = entry
+            if key not in base_positions:
+                overrides['added'].append(key)
+    for key in base_positions:
+        if key not in seen:
+            overrides['positions'][key] = None
+
+    overrides['data'] = {
+        key: value for key, value in data.items() if key != 'positions' and base.get(key) != value
+    }
+    overrides['removed_keys'] = [key for key in base if key != 'positions' and key not in data]
+    return overrides
+
+
+# Fusión de tres vías
+
+def _merge_value(base, ours, theirs):
+    """Valor fusionado y si hay conflicto"""
+    if ours == theirs or theirs == base:
+        return ours, False
+    if ours == base:
+        return theirs, False
+    return theirs, True
+
+
+def _merge_entry(key: str, base: Optional[Dict], ours: Optional[Dict], theirs: Optional[Dict],
+                 strategy: Optional[str], conflicts: List[Dict]) -> Optional[Dict]:
+    """Fusionar un puesto campo por campo (None = eliminado)"""
+    merged, conflict = _merge_value(base, ours, theirs)
+    if not conflict:
+        return merged
+    if ours is None or theirs is None:
+        # Uno lo eliminó y el otro lo modificó
+        conflicts.append({
+            'id': key, 'field': None, 'type': 'delete/modify',
+            'base': base, 'ours': ours, 'theirs': theirs,
+        })
+        return ours if strategy == 'ours' else theirs
+
+    base = base or {}
+    result = {}
+    for field in list(theirs) + [field for field in ours if field not in theirs]:
+        base_value, ours_value, theirs_value = (
+            base.get(field, _MISSING), ours.get(field, _MISSING), theirs.get(field, _MISSING)
+        )
+        value, conflict = _merge_value(base_value, ours_value, theirs_value)
+        if conflict:
+            conflicts.append({
+                'id': key, 'field': field, 'type': 'edit/edit',
+                'base': base.get(field), 'ours': ours.get(field), 'theirs': theirs.get(field),
+            })
+            value = ours_value if strategy == 'ours' else theirs_value
+        if value is not _MISSING:
+            result[field] = value
+    return result
+
+
+def _merge_list(base: List, ours: List, theirs: List) -> List:
+    """Listas como conjuntos (p. ej. conexiones): se conservan las altas y bajas de ambos lados"""
+    def encode(item):
+        return json.dumps(item, sort_keys=True)
+
+    base_keys = {encode(item) for item in base}
+    ours_keys = {encode(item) for item in ours}
+    theirs_keys = {encode(item) for item in theirs}
+    removed = (base_keys - ours_keys) | (base_keys - theirs_keys)
+    result, seen = [], set()
+    for item in theirs + ours:
+        encoded = encode(item)
+        if encoded not in removed and encoded not in seen:
+            seen.add(encoded)
+            result.append(item)
+    return result
+
+
+def _structure_conflicts(positions: List[Dict]) -> List[Dict]:
+    """Ciclos y jefes inexistentes que resultan de combinar cambios de ambos lados"""
+    if not positions or 'position_id' in positions[0]:
+        # Los puestos del editor toman la jerarquía de Position
+        return []
+    hierarchy = build_hierarchy(positions)
+    conflicts = [
+        {'id': hierarchy.keys[i], 'field': 'reports_to', 'type': 'orphan',
+         'base': None, 'ours': None, 'theirs': positions[i].get('reports_to')}
+        for i in hierarchy.orphans
+    ]
+    for cycle in hierarchy.cycles:
+        conflicts.append({
+            'id': hierarchy.keys[cycle[0]], 'field': 'reports_to', 'type': 'cycle',
+            'base': None, 'ours': None, 'theirs': [hierarchy.keys[i] for i in cycle],
+        })
+    return conflicts
+
+
+def three_way_merge(base: Dict, ours: Dict, theirs: Dict, strategy: Optional[str] = None) -> Tuple[Dict, List[Dict]]:
+    """
+    Fusionar dos versiones derivadas de base (payloads de chart_data)
+    Devuelve el contenido fusionado y los conflictos; con strategy 'ours' o 'theirs' los
+    conflictos de edición se resuelven hacia ese lado (los de estructura siempre se informan)
+    """
+    conflicts: List[Dict] = []
+    base_positions = {position_key(entry): entry for entry in base.get('positions') or []}
+    ours_positions = {position_key(entry): entry for entry in ours.get('positions') or []}
+    theirs_positions = {position_key(entry): entry for entry in theirs.get('positions') or []}
+
+    positions = []
+    for key in list(theirs_positions) + [key for key in ours_positions if key not in theirs_positions]:
+        entry = _merge_entry(
+            key, base_positions.get(key), ours_positions.get(key), theirs_positions.get(key), strategy, conflicts
+        )
+        if entry is not None:
+            positions.append(entry)
+    # Lo que ambos eliminaron no aparece en ninguna de las dos listas
+
+    merged = {}
+    keys = list(theirs) + [key for key in ours if key not in theirs]
+    for key in keys + [key for key in base if key not in ours and key not in theirs]:
+        if key == 'positions' or key in DERIVED_KEYS:
+            continue
+        if key in UNMERGED_KEYS:
+            if key in ours:
+                merged[key] = ours[key]
+            continue
+        base_value, ours_value, theirs_value = (
+            base.get(key, _MISSING), ours.get(key, _MISSING), theirs.get(key, _MISSING)
+        )
+        if isinstance(ours_value, list) and isinstance(theirs_value, list):
+            value = _merge_list(base_value if isinstance(base_value, list) else [], ours_value, theirs_value)
+        else:
+            value, conflict = _merge_value(base_value, ours_value, theirs_value)
+            if conflict:
+                conflicts.append({
+                    'id': None, 'field': key, 'type': 'edit/edit',
+                    'base': base.get(key), 'ours': ours.get(key), 'theirs': theirs.get(key),
+                })
+                value = ours_value if strategy == 'ours' else theirs_value
+        if value is not _MISSING:
+            merged[key] = value
+
+    if positions or any('positions' in data for data in (base, ours, theirs)):
+        merged['positions'] = positions
+        if any('hierarchy' in data for data in (ours, theirs)) and positions and 'position_id' not in positions[0]:
+            merged['hierarchy'] = build_hierarchy(positions).as_dict()
+
+    if strategy in MERGE_STRATEGIES:
+        # Los conflictos de edición quedaron resueltos hacia el lado indicado
+        conflicts = []
+    return merged, conflicts + _structure_conflicts(positions)
@@ -0,0 +1,22 @@
+"""
+Signals para el módulo organizacional
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Position, PositionAssignment, Employee
+from .org_tree import invalidate_org_tree
+
+
+@receiver(post_save, sender=Position)
+@receiver(post_delete, sender=Position)
+@receiver(post_save, sender=PositionAssignment)
+@receiver(post_delete, sender=PositionAssignment)
+@receiver(post_save, sender=Employee)
+@receiver(post_delete, sender=Employee)
+def org_structure_changed(sender, **kwargs):
+    """
+    Invalidar el árbol organizacional materializado cuando cambia la estructura
+    Al confirmar la transacción: antes, otro proceso podría reconstruirlo con los datos anteriores
+    """
+    transaction.on_commit(invalidate_org_tree)
@@ -0,0 +1,247 @@
+"""
+Almacenamiento de instantáneas por diferencias
+Cada cierto número de instantáneas se guarda una copia completa (keyframe); entre ellas solo
+se guarda un parche JSON (RFC 6902: add, remove, replace) respecto a la instantánea anterior.
+Guardar un contenido igual al de la última instantánea no crea una fila nueva
+"""
+import copy
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import Q
+
+# Instantáneas por cadena antes de guardar una copia completa
+KEYFRAME_INTERVAL = getattr(settings, 'ORG_SNAPSHOT_KEYFRAME_INTERVAL', 20)
+
+# Cadenas más largas para el historial antiguo (compact_snapshots)
+COMPACT_KEYFRAME_INTERVAL = getattr(settings, 'ORG_SNAPSHOT_COMPACT_INTERVAL', 100)
+
+# Si el parche ocupa más que esta fracción del contenido completo se guarda la copia completa
+MAX_DELTA_RATIO = 0.5
+
+SNAPSHOT_CACHE_KEY = 'organizational:snapshot:{}'
+SNAPSHOT_CACHE_TTL = 60 * 60
+
+
+def _canonical(data) -> str:
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+
+
+def content_hash(data) -> str:
+    return hashlib.sha256(_canonical(data).encode()).hexdigest()
+
+
+# Parches JSON
+
+def _pointer(path: List) -> str:
+    return ''.join('/' + str(part).replace('~', '~0').replace('/', '~1') for part in path)
+
+
+def _diff(old, new, path: List, ops: List[Dict]):
+    if type(old) is not type(new):
+        ops.append({'op': 'replace', 'path': _pointer(path), 'value': new})
+    elif isinstance(old, dict):
+        for key in old:
+            if key not in new:
+                ops.append({'op': 'remove', 'path': _pointer(path + [key])})
+        for key, value in new.items():
+            if key not in old:
+                ops.append({'op': 'add', 'path': _pointer(path + [key]), 'value': value})
+            elif old[key] != value:
+                _diff(old[key], value, path + [key], ops)
+    elif isinstance(old, list):
+        # Se descartan el prefijo y el sufijo comunes: altas y bajas en medio de la lista
+        # producen una sola operación en lugar de recorrer todos los elementos siguientes
+        limit = min(len(old), len(new))
+        prefix = 0
+        while prefix < limit and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while suffix < limit - prefix and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]:
+            suffix += 1
+        old_middle = len(old) - suffix - prefix
+        new_middle = len(new) - suffix - prefix
+        common = min(old_middle, new_middle)
+        for k in range(prefix, prefix + common):
+            _diff(old[k], new[k], path + [k], ops)
+        for k in reversed(range(prefix + common, prefix + old_middle)):
+            ops.append({'op': 'remove', 'path': _pointer(path + [k])})
+        for k in range(prefix + common, prefix + new_middle):
+            ops.append({'op': 'add', 'path': _pointer(path + [k]), 'value': new[k]})
+    elif old != new:
+        ops.append({'op': 'replace', 'path': _pointer(path), 'value': new})
+
+
+def make_patch(old, new) -> List[Dict]:
+    """Parche JSON que convierte old en new"""
+    ops: List[Dict] = []
+    _diff(old, new, [], ops)
+    return ops
+
+
+def apply_patch(document, patch: List[Dict]):
+    """Aplicar un parche de make_patch sobre una copia del documento"""
+    document = copy.deepcopy(document)
+    for op in patch:
+        value = copy.deepcopy(op.get('value'))
+        if op['path'] == '':
+            document = value
+            continue
+        parts = [part.replace('~1', '/').replace('~0', '~') for part in op['path'].split('/')[1:]]
+        target = document
+        for part in parts[:-1]:
+            target = target[int(part)] if isinstance(target, list) else target[part]
+        last = parts[-1]
+        if isinstance(target, list):
+            index = len(target) if last == '-' else int(last)
+            if op['op'] == 'add':
+                target.insert(index, value)
+            elif op['op'] == 'remove':
+                del target[index]
+            else:
+                target[index] = value
+        elif op['op'] == 'remove':
+            del target[last]
+        else:
+            target[last] = value
+    return document
+
+
+# Instantáneas
+
+def _reconstruct(snapshot) -> Dict:
+    """Aplicar los parches desde la copia completa de la cadena (una consulta)"""
+    from .models import OrganizationalSnapshot
+
+    if snapshot.storage == 'full':
+        return snapshot.snapshot_data
+    rows = {
+        row.pk: row
+        for row in OrganizationalSnapshot.objects.filter(
+            Q(pk=snapshot.keyframe_id) | Q(keyframe_id=snapshot.keyframe_id), pk__lt=snapshot.pk
+        ).only('id', 'storage', 'snapshot_data', 'base_id', 'delta')
+    }
+    chain = []
+    current = snapshot
+    while current.storage == 'delta':
+        chain.append(current)
+        current = rows[current.base_id]
+    data = current.snapshot_data
+    for row in reversed(chain):
+        data = apply_patch(data, row.delta)
+    return data
+
+
+def snapshot_data(snapshot) -> Dict:
+    """Contenido completo de una instantánea (en cache: las instantáneas no cambian)"""
+    key = SNAPSHOT_CACHE_KEY.format(snapshot.pk)
+    data = cache.get(key)
+    if data is None:
+        data = _reconstruct(snapshot)
+        cache.set(key, data, SNAPSHOT_CACHE_TTL)
+    return data
+
+
+def _encode(snapshot, data: Dict, encoded: str, previous, previous_data: Optional[Dict], interval: int):
+    """Guardar snapshot como parche respecto a previous o como copia completa"""
+    snapshot.storage, snapshot.snapshot_data, snapshot.delta = 'full', data, None
+    snapshot.base, snapshot.keyframe, snapshot.chain_length = None, None, 0
+    if previous is None or previous.chain_length + 1 >= interval:
+        return
+    delta = make_patch(previous_data, data)
+    if len(_canonical(delta)) > len(encoded) * MAX_DELTA_RATIO:
+        return
+    snapshot.storage, snapshot.snapshot_data, snapshot.delta = 'delta', None, delta
+    snapshot.base = previous
+    snapshot.keyframe_id = previous.keyframe_id or previous.pk
+    snapshot.chain_length = previous.chain_length + 1
+
+
+@transaction.atomic
+def record_snapshot(chart, data: Dict, version_tag: str, created_by=None, notes: str = ''):
+    """
+    Registrar una instantánea del organigrama
+    Si el contenido es igual al de la última se devuelve esa y no se escribe nada
+    """
+    from .models import DepartmentalChart, OrganizationalSnapshot
+
+    # Una escritura a la vez por organigrama: cada parche se calcula contra la última instantánea
+    DepartmentalChart.objects.select_for_update().filter(pk=chart.pk).exists()
+    encoded = _canonical(data)
+    digest = hashlib.sha256(encoded.encode()).hexdigest()
+    latest = chart.snapshots.order_by('-pk').first()
+    if latest is not None and latest.content_hash == digest:
+        return latest
+
+    snapshot = OrganizationalSnapshot(
+        chart=chart,
+        content_hash=digest,
+        version_tag=version_tag,
+        created_by=created_by,
+        notes=notes
+    )
+    _encode(snapshot, data, encoded, latest, snapshot_data(latest) if latest else None, KEYFRAME_INTERVAL)
+    snapshot.save()
+    cache.set(SNAPSHOT_CACHE_KEY.format(snapshot.pk), data, SNAPSHOT_CACHE_TTL)
+    return snapshot
+
+
+@transaction.atomic
+def compact_history(chart, before, keyframe_interval: int = COMPACT_KEYFRAME_INTERVAL, dry_run: bool = False) -> Dict:
+    """
+    Reescribir el historial de un organigrama en una sola cadena
+    Las instantáneas anteriores a before usan keyframe_interval y se eliminan las copias
+    automáticas ('auto-...') idénticas a la instantánea anterior
+    """
+    rows = list(chart.snapshots.order_by('pk'))
+    pending_refs: Dict[int, int] = {}
+    for row in rows:
+        if row.base_id:
+            pending_refs[row.base_id] = pending_refs.get(row.base_id, 0) + 1
+
+    stats = {'snapshots': len(rows), 'full': 0, 'delta': 0, 'removed': 0, 'bytes_before': 0, 'bytes_after': 0}
+    original: Dict[int, Dict] = {}
+    updates, removed = [], []
+    previous, previous_data = None, None
+    for row in rows:
+        stats['bytes_before'] += len(_canonical(row.snapshot_data if row.storage == 'full' else row.delta))
+        if row.storage == 'full':
+            data = row.snapshot_data
+        else:
+            data = apply_patch(original[row.base_id], row.delta)
+            pending_refs[row.base_id] -= 1
+            if not pending_refs[row.base_id]:
+                del original[row.base_id]
+        if pending_refs.get(row.pk):
+            original[row.pk] = data
+
+        encoded = _canonical(data)
+        digest = row.content_hash or hashlib.sha256(encoded.encode()).hexdigest()
+        old = row.created_at < before
+        if old and previous is not None and digest == previous.content_hash and row.version_tag.startswith('auto-'):
+            removed.append(row.pk)
+            continue
+
+        row.content_hash = digest
+        _encode(row, data, encoded, previous, previous_data, keyframe_interval if old else KEYFRAME_INTERVAL)
+        stats[row.storage] += 1
+        stats['bytes_after'] += len(_canonical(row.snapshot_data if row.storage == 'full' else row.delta))
+        updates.append(row)
+        previous, previous_data = row, data
+
+    stats['removed'] = len(removed)
+    if not dry_run:
+        from .models import OrganizationalSnapshot
+
+        OrganizationalSnapshot.objects.bulk_update(
+            updates, ['storage', 'snapshot_data', 'delta', 'base', 'keyframe', 'chain_length', 'content_hash'],
+            batch_size=100
+        )
+        OrganizationalSnapshot.objects.filter(pk__in=removed).delete()
+        cache.delete_many([SNAPSHOT_CACHE_KEY.format(pk) for pk in removed])
+    return stats
@@ -0,0 +1,318 @@
+"""
+Etapa "aplicar" de las importaciones de organigramas
+Compara la estructura importada (formato de chart_data) contra Position, Employee y
+PositionAssignment por clave natural (Position.code y Employee.employee_id) y aplica
+altas, cambios y cierres con bulk_create/bulk_update dentro de una sola transacción
+"""
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .hierarchy import build_hierarchy
+from .models import Employee, Position, PositionAssignment
+from .org_tree import invalidate_org_tree
+
+# Filas por sentencia en bulk_create/bulk_update
+BATCH_SIZE = 1000
+
+# Niveles máximos para crear puestos por oleadas (más profundo: un bulk_update de jefes al final)
+MAX_LEVEL_WAVES = 30
+
+POSITION_FIELDS = ['title', 'department', 'level', 'responsibilities']
+EMPLOYEE_FIELDS = ['first_name', 'last_name', 'email']
+
+# Las claves naturales no se recortan: una clave recortada no volvería a coincidir en la siguiente sincronización
+CODE_MAX_LENGTH = Position._meta.get_field('code').max_length
+EMPLOYEE_ID_MAX_LENGTH = Employee._meta.get_field('employee_id').max_length
+
+
+def _split_name(full_name: str):
+    parts = (full_name or '').split()
+    if not parts:
+        return '', ''
+    return parts[0], ' '.join(parts[1:])
+
+
+class StructureSync:
+    """
+    Plan de sincronización de una estructura importada
+    plan() calcula los cambios sin escribir; apply() los guarda
+    """
+
+    def __init__(self, positions: List[Dict], effective_date: Optional[date] = None, close_missing: bool = False):
+        self.effective_date = effective_date or timezone.now().date()
+        self.close_missing = close_missing
+        self.errors: List[str] = []
+        self.warnings: List[str] = []
+
+        # Un solo registro por clave (la primera aparición gana, igual que la jerarquía)
+        self.rows: Dict[str, Dict] = {}
+        # Puestos cuyo id_empleado es inválido: su asignación no se modifica
+        self.invalid_employee_ids = set()
+        for position in positions:
+            code = str(position.get('id') or '').strip()
+            if len(code) > CODE_MAX_LENGTH:
+                self.errors.append(f"Puesto {code[:CODE_MAX_LENGTH]}...: la clave excede {CODE_MAX_LENGTH} caracteres (se omite)")
+                continue
+            if code and code not in self.rows:
+                self.rows[code] = position
+                if len(str(position.get('employee_id') or '').strip()) > EMPLOYEE_ID_MAX_LENGTH:
+                    self.errors.append(
+                        f"Puesto {code}: id_empleado excede {EMPLOYEE_ID_MAX_LENGTH} caracteres (no se asigna)"
+                    )
+                    self.invalid_employee_ids.add(code)
+
+        hierarchy = build_hierarchy(list(self.rows.values()))
+        self.errors.extend(hierarchy.error_messages([row.get('reports_to') for row in self.rows.values()]))
+        self.levels = dict(zip(self.rows, hierarchy.level))
+        self._planned = False
+
+    # Cálculo del plan
+
+    def plan(self) -> Dict:
+        """Comparar contra las tablas (tres consultas) y devolver el resumen de cambios"""
+        existing = {
+            position.code: position
+            for position in Position.objects.filter(code__isnull=False).only(
+                'id', 'code', 'reports_to_id', *POSITION_FIELDS
+            )
+        }
+
+        self.position_creates: List[Position] = []
+        self.position_updates: List[Position] = []
+        for code, row in self.rows.items():
+            values = {
+                'title': str(row.get('title') or '')[:200],
+                'department': str(row.get('department') or '')[:100],
+                'level': self.levels[code],
+                'responsibilities': row.get('responsibilities') or '',
+            }
+            position = existing.get(code)
+            if position is None:
+                self.position_creates.append(Position(code=code, **values))
+            elif any(getattr(position, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(position, field, value)
+                self.position_updates.append(position)
+        self.positions = {**existing, **{position.code: position for position in self.position_creates}}
+
+        self._plan_employees()
+        self._plan_assignments()
+        self._planned = True
+        return self.summary()
+
+    def _plan_employees(self):
+        wanted = {}
+        for code, row in self.rows.items():
+            if code in self.invalid_employee_ids:
+                continue
+            employee_id = str(row.get('employee_id') or '').strip()
+            if employee_id:
+                wanted.setdefault(employee_id, row)
+            elif row.get('current_employee'):
+                self.warnings.append(f"Puesto {code}: empleado '{row['current_employee']}' sin id_empleado (no se asigna)")
+
+        # Consultas IN por lotes (límite de parámetros de SQLite)
+        keys = list(wanted)
+        existing = {}
+        for start in range(0, len(keys), BATCH_SIZE):
+            existing.update(
+                (employee.employee_id, employee)
+                for employee in Employee.objects.filter(employee_id__in=keys[start:start + BATCH_SIZE]).only(
+                    'id', 'employee_id', 'is_active', *EMPLOYEE_FIELDS
+                )
+            )
+
+        self.employee_creates: List[Employee] = []
+        self.employee_updates: List[Employee] = []
+        for employee_id, row in wanted.items():
+            first_name, last_name = _split_name(row.get('current_employee'))
+            employee = existing.get(employee_id)
+            if employee is None:
+                self.employee_creates.append(Employee(
+                    employee_id=employee_id,
+                    first_name=first_name[:100],
+                    last_name=last_name[:100],
+                    email=row.get('employee_email') or '',
+                    hire_date=row.get('hire_date') or self.effective_date,
+                    is_active=True
+                ))
+                continue
+
+            changed = False
+            # Solo se actualiza lo que viene en el archivo
+            for field, value in (('first_name', first_name), ('last_name', last_name), ('email', row.get('employee_email'))):
+                if value and getattr(employee, field) != value:
+                    setattr(employee, field, value)
+                    changed = True
+            if changed:
+                self.employee_updates.append(employee)
+        self.employees = {**existing, **{employee.employee_id: employee for employee in self.employee_creates}}
+
+    def _plan_assignments(self):
+        self.assignment_closes: List[PositionAssignment] = []
+        self.assignment_creates: List[tuple] = []
+        if not any(str(row.get('employee_id') or '').strip() for row in self.rows.values()):
+            self.warnings.append("El archivo no trae id_empleado: no se modifican asignaciones")
+            return
+
+        # Ocupante deseado por puesto (None = vacante); sin id pero con nombre = sin cambios
+        desired = {}
+        for code, row in self.rows.items():
+            if code in self.invalid_employee_ids:
+                continue
+            employee_id = str(row.get('employee_id') or '').strip() or None
+            if employee_id or not row.get('current_employee'):
+                desired[code] = employee_id
+        moved = {employee_id for employee_id in desired.values() if employee_id}
+        departments = {row.get('department') for row in self.rows.values()}
+
+        code_by_position = {position.pk: code for code, position in self.positions.items() if position.pk}
+        department_by_position = {position.pk: position.department for position in self.positions.values() if position.pk}
+        key_by_employee = {employee.pk: employee_id for employee_id, employee in self.employees.items() if employee.pk}
+
+        # Asignaciones que siguen vigentes en la fecha efectiva o después (sin fin o con fin posterior),
+        # con el mismo criterio de fin que el índice de ocupación; una sola consulta
+        kept = set()
+        end_date = self.effective_date - timedelta(days=1)
+        for assignment in PositionAssignment.objects.filter(
+            Q(end_date__isnull=True) | Q(end_date__gte=self.effective_date)
+        ).only(
+            'id', 'position_id', 'employee_id', 'start_date', 'end_date'
+        ):
+            code = code_by_position.get(assignment.position_id)
+            employee_id = key_by_employee.get(assignment.employee_id)
+
+            if code in desired:
+                if employee_id is not None and desired[code] == employee_id:
+                    kept.add((code, employee_id))
+                    continue
+            elif code in self.rows:
+                continue  # ocupante desconocido en el archivo
+            elif employee_id not in moved:
+                # Puesto fuera del archivo: solo se cierra con close_missing y si es del mismo departamento
+                if not (self.close_missing and code is not None
+                        and department_by_position.get(assignment.position_id) in departments):
+                    continue
+
+            assignment.end_date = max(assignment.start_date, end_date)
+            self.assignment_closes.append(assignment)
+
+        self.assignment_creates = [
+            (code, employee_id) for code, employee_id in desired.items()
+            if employee_id and (code, employee_id) not in kept
+        ]
+
+    # Aplicación
+
+    def summary(self) -> Dict:
+        return {
+            'positions_created': len(self.position_creates),
+            'positions_updated': len(self.position_updates),
+            'employees_created': len(self.employee_creates),
+            'employees_updated': len(self.employee_updates),
+            'assignments_created': len(self.assignment_creates),
+            'assignments_closed': len(self.assignment_closes),
+            'errors': self.errors,
+            'warnings': self.warnings,
+        }
+
+    @transaction.atomic
+    def apply(self) -> Dict:
+        """Guardar el plan en una transacción: todo o nada"""
+        if not self._planned:
+            self.plan()
+
+        self._create_positions()
+        Position.objects.bulk_update(self.position_updates, POSITION_FIELDS, batch_size=BATCH_SIZE)
+
+        # Jefes pendientes (puestos existentes, ciclos o jerarquías muy profundas)
+        boss_updates = []
+        for code in self.rows:
+            position = self.positions[code]
+            boss_id = self._boss_id(code)
+            if position.reports_to_id != boss_id:
+                position.reports_to_id = boss_id
+                boss_updates.append(position)
+        Position.objects.bulk_update(boss_updates, ['reports_to'], batch_size=BATCH_SIZE)
+
+        Employee.objects.bulk_create(self.employee_creates, batch_size=BATCH_SIZE)
+        Employee.objects.bulk_update(self.employee_updates, EMPLOYEE_FIELDS, batch_size=BATCH_SIZE)
+
+        self._close_assignments()
+        self._create_assignments()
+
+        # Las operaciones en bloque no disparan signals
+        transaction.on_commit(invalidate_org_tree)
+
+        result = self.summary()
+        result['reports_to_updated'] = len(boss_updates)
+        return result
+
+    def _boss_id(self, code: str) -> Optional[int]:
+        boss = self.positions.get(str(self.rows[code].get('reports_to') or '').strip())
+        return boss.pk if boss is not None and boss.code != code else None
+
+    def _create_positions(self):
+        """
+        Crear los puestos nuevos por nivel, de la raíz hacia abajo: el jefe ya tiene id
+        cuando se inserta el subordinado y reports_to no requiere un bulk_update posterior
+        """
+        by_level = {}
+        for position in self.position_creates:
+            by_level.setdefault(position.level, []).append(position)
+        if len(by_level) > MAX_LEVEL_WAVES:
+            by_level = {0: self.position_creates}
+
+        for level in sorted(by_level):
+            positions = by_level[level]
+            for position in positions:
+                position.reports_to_id = self._boss_id(position.code)
+            Position.objects.bulk_create(positions, batch_size=BATCH_SIZE)
+
+    def _close_assignments(self):
+        """Cerrar con UPDATE ... WHERE id IN (...) agrupando por fecha de fin"""
+        by_end_date = {}
+        for assignment in self.assignment_closes:
+            by_end_date.setdefault(assignment.end_date, []).append(assignment.pk)
+        for end_date, ids in by_end_date.items():
+            for start in range(0, len(ids), BATCH_SIZE):
+                PositionAssignment.objects.filter(pk__in=ids[start:start + BATCH_SIZE]).update(end_date=end_date)
+
+    def _create_assignments(self):
+        if not self.assignment_creates:
+            return
+        pairs = [(self.positions[code].pk, self.employees[employee_id].pk) for code, employee_id in self.assignment_creates]
+
+        # Reabrir asignaciones cerradas con la misma fecha de inicio (unique_together)
+        reopened = []
+        same_day = {
+            (assignment.position_id, assignment.employee_id): assignment
+            for assignment in PositionAssignment.objects.filter(
+                start_date=self.effective_date, position_id__in={pair[0] for pair in pairs}
+            ).only('id', 'position_id', 'employee_id', 'end_date')
+        }
+        creates = []
+        for position_id, employee_id in pairs:
+            assignment = same_day.get((position_id, employee_id))
+            if assignment is not None:
+                assignment.end_date = None
+                reopened.append(assignment)
+            else:
+                creates.append(PositionAssignment(
+                    position_id=position_id,
+                    employee_id=employee_id,
+                    start_date=self.effective_date,
+                    notes='Sincronizado desde importación'
+                ))
+        PositionAssignment.objects.bulk_update(reopened, ['end_date'], batch_size=BATCH_SIZE)
+        PositionAssignment.objects.bulk_create(creates, batch_size=BATCH_SIZE)
+
+
+def apply_chart(chart, effective_date: Optional[date] = None, close_missing: bool = False, dry_run: bool = False) -> Dict:
+    """Sincronizar las tablas con los puestos importados en un organigrama"""
+    sync = StructureSync(chart.structure_data().get('positions', []), effective_date, close_missing)
+    return sync.plan() if dry_run else sync.apply()
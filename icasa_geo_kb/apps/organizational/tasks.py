@@ -0,0 +1,19 @@
+"""
+Tareas Celery del módulo organizacional
+Solo se usan cuando hay broker configurado (ver jobs.py)
+"""
+from celery import shared_task
+
+from .jobs import run_book_render, run_import_job
+
+
+@shared_task
+def run_import_job_task(job_id):
+    """Procesar un trabajo de importación en un worker de Celery"""
+    return run_import_job(job_id)
+
+
+@shared_task
+def render_book_task(chart_id, path):
+    """Generar el Libro de Organización en PDF en un worker de Celery"""
+    return run_book_render(chart_id, path)
@@ -0,0 +1,38 @@
+"""
+Pruebas de las APIs del editor de organigramas sobre simulaciones (capa de cambios)
+"""
+import json
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from apps.organizational.models import DepartmentalChart, Position
+
+
+class SandboxEditorApiTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(self.user)
+        self.positions = [Position.objects.create(title=f'Puesto {i}', department='D', level=1) for i in range(2)]
+        parent = DepartmentalChart.objects.create(
+            name='Organigrama', department='D', created_by=self.user, chart_data={}, version='1.0', status='active',
+        )
+        self.sandbox = parent.create_sandbox_copy(self.user, 'Simulación')
+
+    def test_connections_survive_reload(self):
+        connections = [{'from': self.positions[0].id, 'to': self.positions[1].id}]
+        response = self.client.post(
+            reverse('organizational:save_chart_positions_api', args=[self.sandbox.id]),
+            json.dumps({
+                'positions': [{'position_id': position.id, 'x': 10, 'y': 20} for position in self.positions],
+                'connections': connections,
+            }),
+            content_type='application/json',
+        )
+        self.assertTrue(response.json()['success'])
+
+        payload = self.client.get(reverse('organizational:get_chart_positions_api', args=[self.sandbox.id])).json()
+        self.assertEqual(payload['connections'], connections)
+        self.assertEqual(len(payload['positions']), 2)
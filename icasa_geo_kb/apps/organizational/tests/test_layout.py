@@ -0,0 +1,79 @@
+"""
+Pruebas del diagrama incremental: mover o redimensionar un puesto debe dar las mismas
+coordenadas que recalcular el diagrama completo
+"""
+import random
+
+from django.test import SimpleTestCase
+
+from apps.organizational.hierarchy import Hierarchy
+from apps.organizational.layout import TreeLayout
+
+
+def random_forest(rng: random.Random, n: int, branch: int) -> list:
+    """Jefe de cada puesto (None = raíz); el jefe siempre tiene un índice menor"""
+    return [None] + [rng.randint(max(0, i - branch), i - 1) for i in range(1, n)]
+
+
+def creates_cycle(parents: list, v: int, target) -> bool:
+    while target is not None:
+        if target == v:
+            return True
+        target = parents[target]
+    return False
+
+
+class IncrementalLayoutTests(SimpleTestCase):
+
+    def assertSameLayout(self, incremental: TreeLayout, parents: list, widths: list):
+        full = TreeLayout(Hierarchy(list(range(len(parents))), parents), widths=widths)
+        self.assertEqual(incremental.order, full.order)
+        for v in full.x:
+            self.assertAlmostEqual(incremental.x[v], full.x[v], places=6)
+            self.assertAlmostEqual(incremental.y[v], full.y[v], places=6)
+
+    def test_moves_match_full_layout(self):
+        rng = random.Random(7)
+        for n, branch in ((30, 4), (300, 10), (1500, 40)):
+            parents = random_forest(rng, n, branch)
+            widths = [rng.choice([100, 150, 220]) for _ in range(n)]
+            layout = TreeLayout(Hierarchy(list(range(n)), parents), widths=widths)
+            for _ in range(40):
+                v = rng.randrange(n)
+                target = rng.choice([None] + [rng.randrange(n) for _ in range(5)])
+                if creates_cycle(parents, v, target):
+                    continue
+                parents[v] = target
+                layout.move(v, target)
+                self.assertSameLayout(layout, parents, widths)
+
+    def test_resize_matches_full_layout(self):
+        rng = random.Random(11)
+        n = 200
+        parents = random_forest(rng, n, 8)
+        widths = [150.0] * n
+        layout = TreeLayout(Hierarchy(list(range(n)), parents), widths=widths)
+        for _ in range(30):
+            v = rng.randrange(n)
+            widths[v] = rng.choice([60.0, 150.0, 320.0])
+            layout.resize(v, width=widths[v])
+            self.assertSameLayout(layout, parents, widths)
+
+    def test_move_reports_changed_positions(self):
+        parents = [None, 0, 0, 1, 1, 2]
+        layout = TreeLayout(Hierarchy(list(range(6)), parents))
+        before = dict(layout.x)
+        changed = layout.move(5, 1)
+        self.assertIn(5, changed)
+        self.assertEqual(sorted(changed), sorted(v for v in layout.x if layout.x[v] != before[v] or v == 5))
+        self.assertEqual(layout.move(5, 1), [])
+
+    def test_move_rejects_cycles(self):
+        layout = TreeLayout(Hierarchy(list(range(4)), [None, 0, 1, 2]))
+        with self.assertRaises(ValueError):
+            layout.move(1, 3)
+
+    def test_paginated_layout_is_not_incremental(self):
+        layout = TreeLayout(Hierarchy(list(range(4)), [None, 0, 1, 2]), max_depth=2)
+        with self.assertRaises(ValueError):
+            layout.move(3, 0)
@@ -0,0 +1,159 @@
+"""
+Pruebas de la fusión de tres vías entre borradores y la versión publicada
+"""
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from apps.organizational.models import DepartmentalChart, Position
+from apps.organizational.sandbox import MergeConflictError, three_way_merge
+
+
+def imported_chart(n: int) -> dict:
+    """Organigrama importado con n puestos (tres subordinados por jefe)"""
+    return {
+        'positions': [
+            {'id': str(i), 'title': f'Puesto {i}', 'department': 'D', 'reports_to': str((i - 1) // 3) if i else None}
+            for i in range(n)
+        ],
+        'connections': [1, 2],
+    }
+
+
+def edit(chart: DepartmentalChart, change):
+    data = chart.structure_data()
+    change(data)
+    chart.set_structure_data(data)
+
+
+class ThreeWayMergeTests(SimpleTestCase):
+
+    def setUp(self):
+        self.base = {'positions': [
+            {'id': 'r', 'title': 'Dirección'},
+            {'id': 'x', 'title': 'Compras', 'reports_to': 'r'},
+            {'id': 'y', 'title': 'Ventas', 'reports_to': 'r'},
+        ]}
+
+    def positions(self, *changes):
+        positions = [dict(entry) for entry in self.base['positions']]
+        for index, field, value in changes:
+            positions[index][field] = value
+        return {'positions': positions}
+
+    def test_independent_edits_are_combined(self):
+        ours = self.positions((1, 'title', 'Compras nacionales'))
+        theirs = self.positions((2, 'title', 'Ventas y mercadotecnia'))
+        merged, conflicts = three_way_merge(self.base, ours, theirs)
+        self.assertEqual(conflicts, [])
+        self.assertEqual(
+            [entry['title'] for entry in merged['positions']],
+            ['Dirección', 'Compras nacionales', 'Ventas y mercadotecnia'],
+        )
+
+    def test_edit_edit_conflict(self):
+        ours = self.positions((1, 'title', 'A'))
+        theirs = self.positions((1, 'title', 'B'))
+        merged, conflicts = three_way_merge(self.base, ours, theirs)
+        self.assertEqual(
+            [(c['id'], c['field'], c['type'], c['ours'], c['theirs']) for c in conflicts],
+            [('x', 'title', 'edit/edit', 'A', 'B')],
+        )
+        merged, conflicts = three_way_merge(self.base, ours, theirs, 'ours')
+        self.assertEqual(conflicts, [])
+        self.assertEqual(merged['positions'][1]['title'], 'A')
+        merged, conflicts = three_way_merge(self.base, ours, theirs, 'theirs')
+        self.assertEqual(merged['positions'][1]['title'], 'B')
+
+    def test_delete_modify_conflict(self):
+        ours = {'positions': self.base['positions'][:2]}
+        theirs = self.positions((2, 'title', 'Ventas y mercadotecnia'))
+        merged, conflicts = three_way_merge(self.base, ours, theirs)
+        self.assertEqual([(c['id'], c['type']) for c in conflicts], [('y', 'delete/modify')])
+        merged, conflicts = three_way_merge(self.base, ours, theirs, 'ours')
+        self.assertEqual([entry['id'] for entry in merged['positions']], ['r', 'x'])
+
+    def test_cycle_is_reported_with_strategy(self):
+        ours = self.positions((1, 'reports_to', 'y'))
+        theirs = self.positions((2, 'reports_to', 'x'))
+        merged, conflicts = three_way_merge(self.base, ours, theirs, 'ours')
+        self.assertEqual([c['type'] for c in conflicts], ['cycle'])
+
+    def test_orphan_when_boss_deleted(self):
+        ours = {'positions': [self.base['positions'][0], self.base['positions'][2]]}
+        theirs = {'positions': self.base['positions'] + [{'id': 'z', 'title': 'Almacén', 'reports_to': 'x'}]}
+        merged, conflicts = three_way_merge(self.base, ours, theirs)
+        self.assertEqual([(c['id'], c['type']) for c in conflicts], [('z', 'orphan')])
+
+    def test_lists_merge_as_sets(self):
+        base = {'connections': [1, 2]}
+        merged, conflicts = three_way_merge(base, {'connections': [1, 2, 3]}, {'connections': [2]})
+        self.assertEqual(conflicts, [])
+        self.assertEqual(sorted(merged['connections']), [2, 3])
+
+
+class SandboxPublishMergeTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+
+    def test_sibling_sandboxes_merge_on_publish(self):
+        parent = DepartmentalChart.objects.create(
+            name='Organigrama', department='D', created_by=self.user,
+            chart_data=imported_chart(50), version='1.0', status='active',
+        )
+        first = parent.create_sandbox_copy(self.user, 'A')
+        second = parent.create_sandbox_copy(self.user, 'B')
+
+        def first_changes(data):
+            data['positions'][5]['title'] = 'A5'
+            data['positions'][6]['reports_to'] = '1'
+            data['connections'].append(3)
+
+        def second_changes(data):
+            data['positions'][5]['title'] = 'B5'
+            data['positions'][7]['title'] = 'B7'
+            del data['positions'][49]
+            data['connections'].remove(1)
+
+        edit(first, first_changes)
+        edit(second, second_changes)
+        first.approve_and_publish(self.user)
+
+        second = DepartmentalChart.objects.get(pk=second.pk)
+        with self.assertRaises(MergeConflictError) as raised:
+            second.approve_and_publish(self.user)
+        self.assertEqual([(c['id'], c['field']) for c in raised.exception.conflicts], [('5', 'title')])
+        second = DepartmentalChart.objects.get(pk=second.pk)
+        self.assertTrue(second.is_sandbox)
+
+        second.approve_and_publish(self.user, conflict_strategy='ours')
+        second.refresh_from_db()
+        data = second.structure_data()
+        positions = {entry['id']: entry for entry in data['positions']}
+        self.assertEqual(positions['5']['title'], 'B5')
+        self.assertEqual(positions['6']['reports_to'], '1')
+        self.assertEqual(positions['7']['title'], 'B7')
+        self.assertNotIn('49', positions)
+        self.assertEqual(sorted(data['connections']), [2, 3])
+        self.assertEqual((second.parent_chart_id, second.status), (first.pk, 'active'))
+        first.refresh_from_db()
+        self.assertEqual(first.status, 'archived')
+
+    def test_editor_memberships_merge_on_publish(self):
+        positions = [Position.objects.create(title=f'Puesto {i}', department='D', level=1) for i in range(4)]
+        parent = DepartmentalChart.objects.create(
+            name='Organigrama', department='D', created_by=self.user, chart_data={}, version='1.0',
+        )
+        parent.sync_memberships([{'position_id': position.id, 'x': 1, 'y': 1} for position in positions[:3]])
+        first = parent.create_sandbox_copy(self.user)
+        second = parent.create_sandbox_copy(self.user)
+        first.add_membership(positions[3], 5, 5)
+        second.remove_membership(positions[0].id)
+
+        first.approve_and_publish(self.user)
+        second = DepartmentalChart.objects.get(pk=second.pk)
+        second.approve_and_publish(self.user)
+        self.assertEqual(
+            sorted(second.memberships.values_list('position_id', flat=True)),
+            sorted(position.id for position in positions[1:]),
+        )
@@ -0,0 +1,112 @@
+"""
+Pruebas de las instantáneas en cadena (completas + parches JSON) y de su compactación
+"""
+import copy
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from apps.organizational.models import DepartmentalChart, OrganizationalSnapshot
+from apps.organizational.snapshots import KEYFRAME_INTERVAL, apply_patch, compact_history, make_patch, record_snapshot
+
+
+def chart_payload(n: int) -> dict:
+    """Contenido de organigrama con n puestos y claves que requieren escape en los punteros"""
+    return {
+        'positions': [
+            {'id': str(i), 'title': f'Puesto {i}', 'reports_to': str((i - 1) // 4) if i else None}
+            for i in range(n)
+        ],
+        'meta': {'a/b': 1, 'x~': [1, 2]},
+    }
+
+
+class PatchTests(SimpleTestCase):
+
+    def test_patch_round_trip(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            old = chart_payload(rng.randint(0, 12))
+            new = copy.deepcopy(old)
+            positions = new['positions']
+            for _ in range(rng.randint(0, 4)):
+                operation = rng.random()
+                if operation < 0.3 and positions:
+                    del positions[rng.randrange(len(positions))]
+                elif operation < 0.6:
+                    positions.insert(rng.randint(0, len(positions)), {'id': f'n{rng.random()}', 'title': 'Nuevo'})
+                elif positions:
+                    positions[rng.randrange(len(positions))]['title'] = f'x{rng.random()}'
+                else:
+                    new['meta']['a/b'] = [1]
+            self.assertEqual(apply_patch(old, make_patch(old, new)), new)
+
+    def test_patch_replaces_root(self):
+        self.assertEqual(apply_patch(1, make_patch(1, {'a': 1})), {'a': 1})
+
+    def test_patch_does_not_modify_original(self):
+        old = chart_payload(3)
+        new = copy.deepcopy(old)
+        new['positions'][1]['title'] = 'Cambio'
+        apply_patch(old, make_patch(old, new))
+        self.assertEqual(old, chart_payload(3))
+
+
+class SnapshotHistoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='usuario')
+        self.chart = DepartmentalChart.objects.create(name='Organigrama', department='D', created_by=self.user)
+
+    def record_versions(self, count: int) -> list:
+        data, versions = chart_payload(300), []
+        for k in range(count):
+            data = copy.deepcopy(data)
+            data['positions'][k]['title'] = f'Versión {k}'
+            snapshot = record_snapshot(self.chart, data, f'auto-{k}', self.user)
+            versions.append((snapshot.pk, data))
+        return versions
+
+    def assertHistory(self, versions: list):
+        cache.clear()
+        for pk, data in versions:
+            self.assertEqual(OrganizationalSnapshot.objects.get(pk=pk).get_data(), data)
+
+    def test_record_snapshot_round_trip(self):
+        versions = self.record_versions(2 * KEYFRAME_INTERVAL + 5)
+        snapshots = list(self.chart.snapshots.order_by('pk'))
+        self.assertEqual(len(snapshots), len(versions))
+        self.assertEqual(snapshots[0].storage, 'full')
+        self.assertTrue(any(snapshot.storage == 'delta' for snapshot in snapshots))
+        self.assertTrue(all(snapshot.chain_length <= KEYFRAME_INTERVAL for snapshot in snapshots))
+        self.assertHistory(versions)
+
+    def test_identical_content_is_not_recorded_twice(self):
+        pk, data = self.record_versions(1)[0]
+        again = record_snapshot(self.chart, copy.deepcopy(data), 'auto-repetida', self.user)
+        self.assertEqual(again.pk, pk)
+        self.assertEqual(self.chart.snapshots.count(), 1)
+
+    def test_compact_history(self):
+        versions = self.record_versions(30)
+        last_data = versions[-1][1]
+        # Copia automática idéntica anterior a la deduplicación (sin hash)
+        OrganizationalSnapshot.objects.create(
+            chart=self.chart, snapshot_data=last_data, version_tag='auto-antigua', content_hash=''
+        )
+        self.chart.snapshots.update(created_at=timezone.now() - timedelta(days=60))
+
+        preview = compact_history(self.chart, timezone.now() - timedelta(days=30), dry_run=True)
+        self.assertEqual(preview['removed'], 1)
+        self.assertEqual(self.chart.snapshots.count(), 31)
+
+        stats = compact_history(self.chart, timezone.now() - timedelta(days=30))
+        self.assertEqual((stats['snapshots'], stats['removed'], stats['full']), (31, 1, 1))
+        self.assertLessEqual(stats['bytes_after'], stats['bytes_before'])
+        self.assertEqual(self.chart.snapshots.count(), 30)
+        self.assertHistory(versions)
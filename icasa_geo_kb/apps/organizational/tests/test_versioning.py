@@ -0,0 +1,72 @@
+"""
+Pruebas de la numeración de versiones por departamento
+"""
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from apps.organizational.models import DepartmentalChart, DepartmentVersionSequence
+from apps.organizational.versioning import active_versions, next_version_number
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class VersionNumberTests(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(self.user)
+
+    def upload(self, name: str, **data):
+        return self.client.post(
+            reverse('organizational:upload_departmental_chart'),
+            {'chart_file': SimpleUploadedFile(name, b'%PDF-1.4'), **data},
+        )
+
+    def test_sequence_per_department(self):
+        self.assertEqual(next_version_number('Compras'), 1)
+        self.assertEqual(next_version_number('Compras'), 2)
+        self.assertEqual(next_version_number('Ventas'), 1)
+
+    def test_sequence_continues_after_legacy_versions(self):
+        DepartmentalChart.objects.create(name='Anterior', department='Compras', version='4.1', created_by=self.user)
+        self.assertEqual(next_version_number('Compras'), 5)
+        self.assertEqual(DepartmentVersionSequence.objects.get(department='Compras').last_number, 5)
+
+    def test_deleted_version_number_is_not_reused(self):
+        self.upload('a.pdf', department='RRHH')
+        first = DepartmentalChart.objects.get()
+        self.assertEqual((first.version, first.version_number), ('1', 1))
+
+        self.upload('b.pdf', chart_id=first.id)
+        second = DepartmentalChart.objects.get(status='active')
+        self.assertEqual(second.version_number, 2)
+        second.delete()
+
+        self.upload('c.pdf', chart_id=first.id)
+        third = DepartmentalChart.objects.get(status='active')
+        self.assertEqual((third.version, third.version_number), ('3', 3))
+
+    def test_active_versions_single_query(self):
+        for department in ['A', 'B', 'C']:
+            for i in range(3):
+                DepartmentalChart.objects.create(
+                    name=f'{department}{i}', department=department,
+                    status='active' if i else 'archived', created_by=self.user,
+                )
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(active_versions())
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([(chart.department, chart.name) for chart in rows], [('A', 'A2'), ('B', 'B2'), ('C', 'C2')])
@@ -1,6 +1,5 @@
 from django.urls import path
-from . import views, demo_views
-# from . import corporate_views  # Comentado temporalmente
+from . import views, demo_views, corporate_views
 
 app_name = 'organizational'
 
@@ -19,6 +18,17 @@ urlpatterns = [
     # FUNCIONALIDADES CORPORATIVAS (Comentadas temporalmente)
     # Se habilitarán después de ejecutar migraciones
     
+    # Importación en segundo plano
+    path('api/import/', corporate_views.import_from_file, name='import_from_file'),
+    path('api/import/<int:job_id>/status/', corporate_views.import_job_status, name='import_job_status'),
+    
+    # Exportación (Excel/CSV se envían por bloques)
+    path('api/departmental/<int:chart_id>/export/pdf/status/', corporate_views.export_book_status, name='export_book_status'),
+    path('api/departmental/<int:chart_id>/export/<str:export_type>/', corporate_views.export_chart_file, name='export_chart_file'),
+    
+    # Comparación de versiones ('current' o id de instantánea)
+    path('api/departmental/<int:chart_id>/diff/<str:version1_id>/<str:version2_id>/', corporate_views.get_version_diff, name='get_version_diff'),
+    
     # Organigramas Departamentales - API
     path('api/departmental/create/', views.create_departmental_chart, name='create_departmental_chart'),
     path('api/departmental/upload/', views.upload_departmental_chart, name='upload_departmental_chart'),
@@ -49,6 +59,7 @@ urlpatterns = [
     
     # 3. 🎯 MATRIZ DE COMPETENCIAS
     path('competencias/', views.competency_matrix, name='competency_matrix'),
+    path('api/competencias/', views.competency_matrix_api, name='competency_matrix_api'),
     
     # 4. 🤝 COMITÉS Y GRUPOS
     path('comites/', views.committees_list, name='committees'),
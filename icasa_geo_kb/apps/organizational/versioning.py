@@ -0,0 +1,49 @@
+"""
+Numeración de versiones de los organigramas departamentales
+Cada departamento tiene un contador propio; el número se asigna con un UPDATE atómico sobre
+su fila, que queda bloqueada hasta el final de la transacción: dos cargas simultáneas del mismo
+departamento nunca obtienen el mismo número
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, OuterRef, QuerySet, Subquery
+
+from .models import DepartmentalChart, DepartmentVersionSequence
+
+
+def _highest_used(department: str) -> int:
+    """Mayor número ya usado en el departamento (incluye versiones anteriores a la secuencia)"""
+    charts = DepartmentalChart.objects.filter(department=department)
+    highest = charts.aggregate(highest=Max('version_number'))['highest'] or 0
+    for version in charts.filter(version_number__isnull=True).values_list('version', flat=True).iterator():
+        major = (version or '').split('.')[0].strip()
+        if major.isdigit():
+            highest = max(highest, int(major))
+    return highest
+
+
+@transaction.atomic
+def next_version_number(department: str) -> int:
+    """
+    Siguiente número de versión del departamento
+    Llamar dentro de la transacción que crea la versión para mantener el bloqueo hasta guardarla
+    """
+    sequences = DepartmentVersionSequence.objects.filter(department=department)
+    if not sequences.update(last_number=F('last_number') + 1):
+        try:
+            with transaction.atomic():
+                DepartmentVersionSequence.objects.create(department=department, last_number=_highest_used(department) + 1)
+        except IntegrityError:
+            # Otro proceso creó el contador al mismo tiempo
+            sequences.update(last_number=F('last_number') + 1)
+    return sequences.values_list('last_number', flat=True).get()
+
+
+def active_versions() -> QuerySet:
+    """
+    Versión activa de cada departamento (la más reciente si hay varias) en una sola consulta
+    Usa el índice (department, status, created_at)
+    """
+    latest = DepartmentalChart.objects.filter(
+        department=OuterRef('department'), status='active'
+    ).order_by('-created_at', '-pk').values('pk')[:1]
+    return DepartmentalChart.objects.filter(status='active', pk=Subquery(latest)).order_by('department')
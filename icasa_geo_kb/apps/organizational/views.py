@@ -2,8 +2,10 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.core.paginator import Paginator
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
+from django.db import transaction
 from datetime import datetime
 import json
 # Importar modelos organizacionales
@@ -12,59 +14,27 @@ from .models import (
     JobProfile, Skill, EmployeeSkill, Committee, CommitteeMembership, DepartmentalChart,
     ProcessCategory, FlowchartProcess, FlowchartTemplate
 )
+from .org_tree import get_org_tree, invalidate_org_tree
+from .occupancy import OccupancyIndex, current_assignment_filter, occupancy_on
+from .competency import CompetencyMatrix
+from .coordinates import StaleLayoutError, get_layout_version, reset_coordinates, save_coordinates
+from .versioning import active_versions, next_version_number
+
+# Empleados por página en la matriz de competencias
+COMPETENCY_PAGE_SIZE = 50
 
 
 def calculate_hierarchical_positions():
-    """Organigrama con posiciones fijas y muy espaciadas"""
-    positions = Position.objects.all().order_by('level', 'title')
-    position_map = {}
-    
-    # Posiciones fijas predefinidas por nivel
-    level_positions = {
-        1: [(1000, 200)],  # Director General
-        2: [(400, 800), (800, 800), (1200, 800), (1600, 800)],  # Gerentes
-        3: [(200, 1400), (600, 1400), (1000, 1400), (1400, 1400), (1800, 1400)]  # Jefes
-    }
-    
-    # Agrupar por nivel
-    by_level = {}
-    for pos in positions:
-        if pos.level not in by_level:
-            by_level[pos.level] = []
-        by_level[pos.level].append(pos)
-    
-    # Asignar posiciones fijas
-    for level, positions_list in by_level.items():
-        if level in level_positions:
-            coords = level_positions[level]
-            for i, pos in enumerate(positions_list):
-                if i < len(coords):
-                    x, y = coords[i]
-                    position_map[pos.id] = {'x': x, 'y': y}
-                else:
-                    # Si hay más posiciones que coordenadas, usar espaciado
-                    x = 200 + (i * 400)
-                    y = 200 + (level - 1) * 600
-                    position_map[pos.id] = {'x': x, 'y': y}
-    
-    return position_map
+    """Coordenadas automáticas (árbol ordenado, sin traslapes) de todos los puestos"""
+    return get_org_tree().auto_positions()
 
 @login_required
 def organizational_dashboard(request):
     """Página principal - Galería de organigramas por departamento"""
     
-    # Obtener solo la versión activa de cada departamento
-    active_charts = DepartmentalChart.objects.filter(status='active').order_by('department', '-updated_at')
-    
-    # Obtener solo un organigrama por departamento (el activo)
-    charts_by_department = {}
-    department_charts = []
-    
-    for chart in active_charts:
-        dept = chart.department
-        if dept not in charts_by_department:
-            charts_by_department[dept] = chart
-            department_charts.append(chart)
+    # Solo la versión activa de cada departamento (una consulta)
+    department_charts = list(active_versions())
+    charts_by_department = {chart.department: chart for chart in department_charts}
     
     # Estadísticas
     total_versions = DepartmentalChart.objects.count()
@@ -114,7 +84,9 @@ def interactive_organigram(request):
     
     # Obtener estadísticas básicas
     total_positions = Position.objects.count()
-    filled_positions = Position.objects.filter(assignments__end_date__isnull=True).distinct().count()
+    filled_positions = Position.objects.filter(
+        current_assignment_filter(timezone.now().date(), 'assignments__')
+    ).distinct().count()
     vacant_count = total_positions - filled_positions
     fill_rate = (filled_positions / total_positions * 100) if total_positions > 0 else 0
     departments = Position.objects.values_list('department', flat=True).distinct()
@@ -240,7 +212,7 @@ def position_detail_api(request, position_id):
                 'photo': current_employee.photo.url if current_employee.photo else None,
                 'hire_date': current_employee.hire_date.strftime('%Y-%m-%d')
             } if current_employee else None,
-            'is_vacant': position.is_vacant(view_date),
+            'is_vacant': current_employee is None,
             'assignments_history': []
         }
         
@@ -270,42 +242,63 @@ def job_profile_detail(request, profile_id):
 # 3. 🎯 MATRIZ DE COMPETENCIAS
 @login_required
 def competency_matrix(request):
-    """Matriz de competencias: Empleados vs Habilidades"""
-    employees = Employee.objects.filter(is_active=True)
-    skills = Skill.objects.all().order_by('category', 'name')
-    
-    # Crear matriz
-    matrix_data = []
-    for employee in employees:
-        employee_skills = {}
-        for skill in skills:
-            try:
-                emp_skill = EmployeeSkill.objects.get(employee=employee, skill=skill)
-                employee_skills[skill.id] = {
-                    'level': emp_skill.level,
-                    'status': emp_skill.status,
-                    'color': {
-                        'certified': 'green',
-                        'training': 'yellow', 
-                        'needs_training': 'red',
-                        'expired': 'gray'
-                    }.get(emp_skill.status, 'gray')
-                }
-            except EmployeeSkill.DoesNotExist:
-                employee_skills[skill.id] = {'level': 0, 'status': 'not_assigned', 'color': 'white'}
-        
-        matrix_data.append({
-            'employee': employee,
-            'skills': employee_skills
-        })
+    """Matriz de competencias: Empleados vs Habilidades (paginada por empleados)"""
+    matrix = CompetencyMatrix.build()
+    
+    paginator = Paginator(range(len(matrix.employees)), COMPETENCY_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('page'))
+    
+    # Resúmenes por habilidad (calculados sobre toda la matriz)
+    status_counts = matrix.status_counts()
+    expiring = matrix.expiring_certifications()
+    gaps = matrix.skill_gaps()
+    skill_stats = [
+        {
+            'skill': skill,
+            **status_counts[skill.id],
+            **expiring[skill.id],
+            'gap_employees': gaps['skills'][skill.id],
+        }
+        for skill in matrix.skills
+    ]
     
     context = {
-        'matrix_data': matrix_data,
-        'skills': skills,
+        'matrix_data': matrix.rows(page.start_index() - 1, page.end_index()) if paginator.count else [],
+        'skills': matrix.skills,
+        'skill_stats': skill_stats,
+        'total_employees': paginator.count,
+        'page_obj': page,
         'skill_categories': Skill.objects.values_list('category', flat=True).distinct()
     }
     return render(request, 'organizational/competency_matrix.html', context)
 
+@login_required
+def competency_matrix_api(request):
+    """API JSON paginada de la matriz de competencias"""
+    try:
+        page_size = max(1, min(int(request.GET.get('page_size', COMPETENCY_PAGE_SIZE)), 500))
+    except ValueError:
+        page_size = COMPETENCY_PAGE_SIZE
+    
+    matrix = CompetencyMatrix.build()
+    paginator = Paginator(range(len(matrix.employees)), page_size)
+    page = paginator.get_page(request.GET.get('page'))
+    
+    start = page.start_index() - 1 if paginator.count else 0
+    data = matrix.to_json(start, start + page_size)
+    data.update({
+        'success': True,
+        'page': page.number,
+        'num_pages': paginator.num_pages,
+        'total_employees': paginator.count,
+        'summary': {
+            'status_counts': matrix.status_counts(),
+            'certifications': matrix.expiring_certifications(),
+            'gaps': matrix.skill_gaps(),
+        }
+    })
+    return JsonResponse(data)
+
 # 4. 🤝 COMITÉS Y GRUPOS
 @login_required
 def committees_list(request):
@@ -732,20 +725,24 @@ def position_admin_list(request):
     """Lista administrativa de puestos con todas las funciones CRUD"""
     positions = Position.objects.all().order_by('level', 'department', 'title')
     
+    # Ocupación de todos los puestos en una sola consulta
+    today = timezone.now().date()
+    occupancy = OccupancyIndex.load()
+    
     # Agregar información del empleado actual a cada posición
     positions_data = []
     for position in positions:
-        current_employee = position.get_current_employee()
+        current_employee = occupancy.employee_on(position.id, today)
         positions_data.append({
             'position': position,
             'current_employee': current_employee,
-            'is_vacant': position.is_vacant()
+            'is_vacant': current_employee is None
         })
     
     context = {
         'positions_data': positions_data,
-        'total_positions': positions.count(),
-        'vacant_positions': sum(1 for p in positions if p.is_vacant()),
+        'total_positions': len(positions_data),
+        'vacant_positions': sum(1 for p in positions_data if p['is_vacant']),
         'departments': Position.objects.values_list('department', flat=True).distinct().order_by('department')
     }
     return render(request, 'organizational/admin/position_list.html', context)
@@ -905,7 +902,8 @@ def position_assign_employee(request, pk):
 def position_unassign_employee(request, pk):
     """Desasignar empleado de puesto"""
     position = get_object_or_404(Position, pk=pk)
-    current_employee = position.get_current_employee()
+    current_assignment = position.get_current_assignment()
+    current_employee = current_assignment.employee if current_assignment else None
     
     if not current_employee:
         messages.error(request, 'Este puesto no tiene empleado asignado')
@@ -916,12 +914,6 @@ def position_unassign_employee(request, pk):
         notes = request.POST.get('notes', '')
         
         # Finalizar asignación actual
-        current_assignment = PositionAssignment.objects.filter(
-            position=position,
-            employee=current_employee,
-            end_date__isnull=True
-        ).first()
-        
         if current_assignment:
             current_assignment.end_date = end_date
             current_assignment.notes = notes
@@ -940,39 +932,51 @@ def position_unassign_employee(request, pk):
 @csrf_exempt
 @login_required
 def save_position_coordinates(request):
-    """API para guardar coordenadas de posiciones editadas manualmente"""
+    """
+    API para guardar coordenadas de posiciones editadas manualmente
+    Recibe solo los puestos movidos ('moved', o 'positions' en el formato anterior) y la
+    versión del acomodo; 'reset' (o 'positions' vacío en el formato anterior) vuelve al
+    diagrama automático. Un 'moved' vacío no cambia nada
+    """
     if request.method == 'POST':
-        import json
         try:
             data = json.loads(request.body)
-            positions_data = data.get('positions', [])
+            version = data.get('version')
+            version = int(version) if version is not None else None
+            moved = data.get('moved', data.get('positions', []))
             
-            # Si el array está vacío, resetear todas las posiciones
-            if not positions_data:
-                Position.objects.all().update(x_position=None, y_position=None)
+            if data.get('reset') or ('moved' not in data and data.get('positions') == []):
+                result = reset_coordinates(version, request.user)
                 return JsonResponse({
                     'success': True, 
                     'message': 'Posiciones reseteadas al layout automático',
-                    'reset': True
+                    'reset': True,
+                    **result
                 })
             
-            updated_count = 0
-            for pos_data in positions_data:
-                try:
-                    position = Position.objects.get(id=pos_data['id'])
-                    position.x_position = int(pos_data['x'])
-                    position.y_position = int(pos_data['y'])
-                    position.save()
-                    updated_count += 1
-                except Position.DoesNotExist:
-                    continue
+            if not moved:
+                return JsonResponse({
+                    'success': True,
+                    'message': 'Sin cambios',
+                    'updated_count': 0,
+                    'ignored': [],
+                    'version': get_layout_version()
+                })
             
+            result = save_coordinates(moved, version, request.user)
             return JsonResponse({
                 'success': True, 
-                'message': f'Se actualizaron {updated_count} posiciones correctamente',
-                'updated_count': updated_count
+                'message': f"Se actualizaron {result['updated_count']} posiciones correctamente",
+                **result
             })
             
+        except StaleLayoutError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e),
+                'stale': True,
+                'version': e.current_version
+            }, status=409)
         except Exception as e:
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
@@ -996,36 +1000,30 @@ def create_departmental_chart(request):
             })
         
         try:
-            # Verificar si ya existe un organigrama activo para este departamento
-            existing = DepartmentalChart.objects.filter(
-                department=department, 
-                status='active'
-            ).first()
-            
-            if existing:
-                # Archivar el anterior
-                existing.status = 'archived'
-                existing.save()
-            
-            # Crear nuevo organigrama
-            chart = DepartmentalChart.objects.create(
-                name=name,
-                department=department,
-                description=description,
-                created_by=request.user,
-                status='active',
-                version='1.0',
-                is_external=False,
-                chart_data={
-                    'positions': [],
-                    'connections': [],
-                    'metadata': {
-                        'created_date': timezone.now().isoformat(),
-                        'department': department,
-                        'type': 'system_created'
+            with transaction.atomic():
+                # Archivar el organigrama activo de este departamento, si existe
+                DepartmentalChart.objects.filter(department=department, status='active').update(status='archived')
+                
+                version_number = next_version_number(department)
+                chart = DepartmentalChart.objects.create(
+                    name=name,
+                    department=department,
+                    description=description,
+                    created_by=request.user,
+                    status='active',
+                    version=str(version_number),
+                    version_number=version_number,
+                    is_external=False,
+                    chart_data={
+                        'positions': [],
+                        'connections': [],
+                        'metadata': {
+                            'created_date': timezone.now().isoformat(),
+                            'department': department,
+                            'type': 'system_created'
+                        }
                     }
-                }
-            )
+                )
             
             return JsonResponse({
                 'success': True,
@@ -1073,38 +1071,36 @@ def upload_departmental_chart(request):
                 # Crear nueva versión en lugar de reemplazar
                 base_chart = get_object_or_404(DepartmentalChart, id=chart_id)
                 
-                # Archivar la versión anterior
-                base_chart.status = 'archived'
-                base_chart.save()
-                
-                # Calcular nuevo número de versión secuencial
-                existing_versions = DepartmentalChart.objects.filter(
-                    department=base_chart.department
-                ).count()
-                
-                new_version_number = existing_versions + 1
-                
-                # Crear nueva versión
-                new_chart = DepartmentalChart.objects.create(
-                    name=f"Organigrama {base_chart.department} - Versión {new_version_number}",
-                    department=base_chart.department,
-                    description=description or f"Versión {new_version_number} - {timezone.now().strftime('%d/%m/%Y')}",
-                    chart_file=chart_file,
-                    created_by=request.user,
-                    status='active',
-                    is_external=True,
-                    version=str(new_version_number),
-                    parent_chart=base_chart,
-                    import_source='visio' if file_extension in ['vsd', 'vsdx'] else 'file_upload',
-                    import_metadata={
-                        'original_filename': chart_file.name,
-                        'file_size': chart_file.size,
-                        'file_type': file_extension,
-                        'upload_date': timezone.now().isoformat(),
-                        'version_number': new_version_number,
-                        'previous_version_id': base_chart.id
-                    }
-                )
+                with transaction.atomic():
+                    # Archivar la versión anterior
+                    base_chart.status = 'archived'
+                    base_chart.save()
+                    
+                    # Siguiente número del departamento (no se repite aunque se borren versiones)
+                    new_version_number = next_version_number(base_chart.department)
+                    
+                    # Crear nueva versión
+                    new_chart = DepartmentalChart.objects.create(
+                        name=f"Organigrama {base_chart.department} - Versión {new_version_number}",
+                        department=base_chart.department,
+                        description=description or f"Versión {new_version_number} - {timezone.now().strftime('%d/%m/%Y')}",
+                        chart_file=chart_file,
+                        created_by=request.user,
+                        status='active',
+                        is_external=True,
+                        version=str(new_version_number),
+                        version_number=new_version_number,
+                        parent_chart=base_chart,
+                        import_source='visio' if file_extension in ['vsd', 'vsdx'] else 'file_upload',
+                        import_metadata={
+                            'original_filename': chart_file.name,
+                            'file_size': chart_file.size,
+                            'file_type': file_extension,
+                            'upload_date': timezone.now().isoformat(),
+                            'version_number': new_version_number,
+                            'previous_version_id': base_chart.id
+                        }
+                    )
                 
                 return JsonResponse({
                     'success': True,
@@ -1120,28 +1116,31 @@ def upload_departmental_chart(request):
                         'error': 'Departamento es obligatorio para crear nuevo organigrama'
                     })
                 
-                chart = DepartmentalChart.objects.create(
-                    name=f"Organigrama {department} - Versión 1",
-                    department=department,
-                    description=description or f"Versión inicial - {timezone.now().strftime('%d/%m/%Y')}",
-                    chart_file=chart_file,
-                    created_by=request.user,
-                    status='active',
-                    is_external=True,
-                    version='1',
-                    import_source='visio' if file_extension in ['vsd', 'vsdx'] else 'file_upload',
-                    import_metadata={
-                        'original_filename': chart_file.name,
-                        'file_size': chart_file.size,
-                        'file_type': file_extension,
-                        'upload_date': timezone.now().isoformat(),
-                        'version_number': 1
-                    }
-                )
+                with transaction.atomic():
+                    version_number = next_version_number(department)
+                    chart = DepartmentalChart.objects.create(
+                        name=f"Organigrama {department} - Versión {version_number}",
+                        department=department,
+                        description=description or f"Versión inicial - {timezone.now().strftime('%d/%m/%Y')}",
+                        chart_file=chart_file,
+                        created_by=request.user,
+                        status='active',
+                        is_external=True,
+                        version=str(version_number),
+                        version_number=version_number,
+                        import_source='visio' if file_extension in ['vsd', 'vsdx'] else 'file_upload',
+                        import_metadata={
+                            'original_filename': chart_file.name,
+                            'file_size': chart_file.size,
+                            'file_type': file_extension,
+                            'upload_date': timezone.now().isoformat(),
+                            'version_number': version_number
+                        }
+                    )
                 
                 return JsonResponse({
                     'success': True,
-                    'message': f'Organigrama Versión 1 creado para {department}',
+                    'message': f'Organigrama Versión {version_number} creado para {department}',
                     'chart_id': chart.id,
                     'redirect_url': f'/organizational/departamental/{chart.id}/'
                 })
@@ -1175,15 +1174,20 @@ def departmental_chart_detail(request, chart_id):
     department_positions = Position.objects.filter(department=chart.department)
     department_employees = []
     
-    for position in department_positions:
-        employee = position.get_current_employee()
+    # Ocupación del departamento en una sola consulta
+    today = timezone.now().date()
+    occupancy = OccupancyIndex.load(department_positions)
+    positions = occupancy.annotate(department_positions, today)
+    
+    for position in positions:
+        employee = position.current_employee
         if employee:
             employee.current_position = position  # Agregar posición actual
             department_employees.append(employee)
     
     # Estadísticas
     total_positions = department_positions.count()
-    occupied_positions = sum(1 for pos in department_positions if not pos.is_vacant())
+    occupied_positions = len(department_employees)
     vacant_positions = total_positions - occupied_positions
     hierarchy_levels = department_positions.values_list('level', flat=True).distinct().count()
     
@@ -1231,7 +1235,7 @@ def departmental_chart_detail(request, chart_id):
         'chart': chart,
         'current_version': current_version,
         'all_versions': all_versions,
-        'department_positions': department_positions,
+        'department_positions': positions,
         'department_employees': department_employees,
         'department_stats': {
             'total_positions': total_positions,
@@ -1384,57 +1388,13 @@ def get_departmental_charts_api(request):
 def organigram_data_api(request):
     """API para obtener datos del organigrama interactivo"""
     try:
-        positions = Position.objects.select_related('reports_to').prefetch_related('assignments__employee')
-        
-        org_data = []
-        for position in positions:
-            # Obtener empleado actual
-            current_assignment = position.assignments.filter(end_date__isnull=True).first()
-            employee = current_assignment.employee if current_assignment else None
-            
-            # Datos de la posición
-            position_data = {
-                'id': position.id,
-                'title': position.title,
-                'department': position.department,
-                'level': position.level,
-                'x_position': position.x_position,
-                'y_position': position.y_position,
-                'reports_to': position.reports_to.id if position.reports_to else None,
-                'is_vacant': employee is None,
-                'employee': None
-            }
-            
-            # Datos del empleado si existe
-            if employee:
-                position_data['employee'] = {
-                    'id': employee.id,
-                    'name': f"{employee.first_name} {employee.last_name}",
-                    'employee_id': employee.employee_id,
-                    'email': employee.email,
-                    'phone': employee.phone,
-                    'photo': employee.photo.url if employee.photo else None,
-                    'hire_date': employee.hire_date.strftime('%Y-%m-%d')
-                }
-            
-            org_data.append(position_data)
-        
-        # Estadísticas
-        total_positions = len(org_data)
-        vacant_positions = sum(1 for p in org_data if p['is_vacant'])
-        filled_positions = total_positions - vacant_positions
-        fill_rate = (filled_positions / total_positions * 100) if total_positions > 0 else 0
+        # Árbol materializado en memoria (se invalida al guardar puestos o asignaciones)
+        payload = get_org_tree().as_payload()
         
         return JsonResponse({
             'success': True,
-            'positions': org_data,
-            'stats': {
-                'total_positions': total_positions,
-                'filled_positions': filled_positions,
-                'vacant_positions': vacant_positions,
-                'fill_rate': round(fill_rate, 1)
-            },
-            'departments': list(Position.objects.values_list('department', flat=True).distinct())
+            'layout_version': get_layout_version(),
+            **payload
         })
         
     except Exception as e:
@@ -1457,14 +1417,13 @@ def organigram_editor(request, chart_id):
         messages.error(request, 'No se pueden editar organigramas subidos como archivo. Solo los creados en el sistema.')
         return redirect('organizational:departmental_chart_detail', chart_id=chart_id)
     
-    # Obtener todas las posiciones disponibles ordenadas jerárquicamente
-    all_positions = Position.objects.all().order_by('level', 'department', 'title')
+    # Obtener todas las posiciones disponibles ordenadas jerárquicamente, con su ocupante actual
+    all_positions = OccupancyIndex.load().annotate(
+        Position.objects.order_by('level', 'department', 'title'), timezone.now().date()
+    )
     
     # Obtener posiciones ya asignadas a este organigrama
-    chart_positions = []
-    if chart.chart_data and 'positions' in chart.chart_data:
-        position_ids = [p['position_id'] for p in chart.chart_data['positions']]
-        chart_positions = Position.objects.filter(id__in=position_ids)
+    chart_positions = [membership.position for membership in chart.editor_memberships()]
     
     context = {
         'chart': chart,
@@ -1476,6 +1435,25 @@ def organigram_editor(request, chart_id):
     
     return render(request, 'organizational/organigram_editor.html', context)
 
+def _editor_position_data(membership, employee):
+    """Datos de un puesto del editor con su ubicación y ocupante"""
+    position = membership.position
+    return {
+        'id': position.id,
+        'title': position.title,
+        'department': position.department,
+        'level': position.level,
+        'x': membership.x,
+        'y': membership.y,
+        'reports_to': position.reports_to_id,
+        'is_vacant': employee is None,
+        'employee': {
+            'name': f"{employee.first_name} {employee.last_name}",
+            'employee_id': employee.employee_id,
+            'photo': employee.photo.url if employee.photo else None
+        } if employee else None
+    }
+
 @login_required
 def get_chart_positions_api(request, chart_id):
     """API para obtener posiciones del organigrama"""
@@ -1483,39 +1461,19 @@ def get_chart_positions_api(request, chart_id):
     
     chart = get_object_or_404(DepartmentalChart, id=chart_id)
     
-    positions_data = []
-    
-    if chart.chart_data and 'positions' in chart.chart_data:
-        for pos_data in chart.chart_data['positions']:
-            try:
-                position = Position.objects.get(id=pos_data['position_id'])
-                
-                # Obtener empleado actual
-                current_assignment = position.assignments.filter(end_date__isnull=True).first()
-                employee = current_assignment.employee if current_assignment else None
-                
-                positions_data.append({
-                    'id': position.id,
-                    'title': position.title,
-                    'department': position.department,
-                    'level': position.level,
-                    'x': pos_data.get('x', 100),
-                    'y': pos_data.get('y', 100),
-                    'reports_to': position.reports_to.id if position.reports_to else None,
-                    'is_vacant': employee is None,
-                    'employee': {
-                        'name': f"{employee.first_name} {employee.last_name}",
-                        'employee_id': employee.employee_id,
-                        'photo': employee.photo.url if employee.photo else None
-                    } if employee else None
-                })
-            except Position.DoesNotExist:
-                continue
+    # En simulaciones las conexiones viven en la capa de cambios, no en chart_data
+    data = chart.structure_data() if chart.is_layered else (chart.chart_data or {})
+    memberships = chart.editor_memberships(data)
+    employees = occupancy_on(position_ids=[membership.position_id for membership in memberships])
+    positions_data = [
+        _editor_position_data(membership, employees.get(membership.position_id))
+        for membership in memberships
+    ]
     
     return JsonResponse({
         'success': True,
         'positions': positions_data,
-        'connections': chart.chart_data.get('connections', []) if chart.chart_data else []
+        'connections': data.get('connections', [])
     })
 
 @login_required
@@ -1532,8 +1490,8 @@ def save_chart_positions_api(request, chart_id):
             positions = data.get('positions', [])
             connections = data.get('connections', [])
             
-            # Actualizar datos del organigrama
-            chart.chart_data = {
+            # Los puestos y sus coordenadas se guardan en ChartMembership (o en la capa de la simulación)
+            changes = chart.set_structure_data({
                 'positions': positions,
                 'connections': connections,
                 'metadata': {
@@ -1541,12 +1499,12 @@ def save_chart_positions_api(request, chart_id):
                     'updated_by': request.user.username,
                     'version': chart.version
                 }
-            }
-            chart.save()
+            })
             
             return JsonResponse({
                 'success': True,
-                'message': 'Organigrama guardado exitosamente'
+                'message': 'Organigrama guardado exitosamente',
+                'changes': changes
             })
             
         except Exception as e:
@@ -1574,53 +1532,20 @@ def add_position_to_chart_api(request, chart_id):
             
             position = get_object_or_404(Position, id=position_id)
             
-            # Inicializar chart_data si no existe
-            if not chart.chart_data:
-                chart.chart_data = {'positions': [], 'connections': []}
-            
-            # Verificar si la posición ya está en el organigrama
-            existing_positions = [p['position_id'] for p in chart.chart_data.get('positions', [])]
-            if position_id in existing_positions:
+            membership, created = chart.add_membership(position, x, y)
+            if not created:
                 return JsonResponse({
                     'success': False,
                     'error': 'Esta posición ya está en el organigrama'
                 })
             
-            # Agregar nueva posición
-            new_position = {
-                'position_id': position_id,
-                'x': x,
-                'y': y,
-                'added_at': timezone.now().isoformat()
-            }
-            
-            chart.chart_data['positions'].append(new_position)
-            chart.save()
-            
             # Obtener datos completos de la posición para respuesta
-            current_assignment = position.assignments.filter(end_date__isnull=True).first()
-            employee = current_assignment.employee if current_assignment else None
-            
-            position_data = {
-                'id': position.id,
-                'title': position.title,
-                'department': position.department,
-                'level': position.level,
-                'x': x,
-                'y': y,
-                'reports_to': position.reports_to.id if position.reports_to else None,
-                'is_vacant': employee is None,
-                'employee': {
-                    'name': f"{employee.first_name} {employee.last_name}",
-                    'employee_id': employee.employee_id,
-                    'photo': employee.photo.url if employee.photo else None
-                } if employee else None
-            }
+            employee = occupancy_on(position_ids=[position.id]).get(position.id)
             
             return JsonResponse({
                 'success': True,
                 'message': f'Posición "{position.title}" agregada al organigrama',
-                'position': position_data
+                'position': _editor_position_data(membership, employee)
             })
             
         except Exception as e:
@@ -1644,36 +1569,13 @@ def remove_position_from_chart_api(request, chart_id):
             
             position_id = data.get('position_id')
             
-            if not chart.chart_data or 'positions' not in chart.chart_data:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'No hay posiciones en este organigrama'
-                })
-            
-            # Remover posición
-            original_count = len(chart.chart_data['positions'])
-            chart.chart_data['positions'] = [
-                p for p in chart.chart_data['positions'] 
-                if p['position_id'] != position_id
-            ]
-            
-            # Remover conexiones relacionadas
-            if 'connections' in chart.chart_data:
-                chart.chart_data['connections'] = [
-                    c for c in chart.chart_data['connections']
-                    if c.get('from') != position_id and c.get('to') != position_id
-                ]
-            
-            new_count = len(chart.chart_data['positions'])
-            
-            if original_count == new_count:
+            # Remover la posición y sus conexiones
+            if not chart.remove_membership(position_id):
                 return JsonResponse({
                     'success': False,
                     'error': 'La posición no estaba en el organigrama'
                 })
             
-            chart.save()
-            
             return JsonResponse({
                 'success': True,
                 'message': 'Posición removida del organigrama'
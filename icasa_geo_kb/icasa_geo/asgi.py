@@ -0,0 +1,10 @@
+"""
+ASGI config for ICASA-GEO project.
+Requerido para el stream SSE de notificaciones (p. ej. uvicorn icasa_geo.asgi:application)
+"""
+import os
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'icasa_geo.settings')
+
+application = get_asgi_application()
@@ -0,0 +1,17 @@
+"""
+Configuración de Celery para ICASA-GEO Knowledge Base
+Solo se usa cuando CELERY_BROKER_URL está configurado
+"""
+import os
+from celery import Celery
+
+# Establecer el módulo de configuración de Django para Celery
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'icasa_geo.settings')
+
+app = Celery('icasa_geo')
+
+# Usar configuración de Django para Celery
+app.config_from_object('django.conf:settings', namespace='CELERY')
+
+# Autodescubrir tareas en todas las apps instaladas
+app.autodiscover_tasks()
@@ -53,6 +53,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.core.context_processors.notifications',
             ],
         },
     },
@@ -147,6 +148,34 @@ ICASA_SETTINGS = {
     'SYSTEM_VERSION': '1.0.0',
 }
 
+# Cache: debe ser compartida (Redis) cuando hay más de un proceso (p. ej. varios workers de gunicorn).
+# El contador de generación del árbol organizacional (org_tree.py), los contadores de notificaciones
+# y los renders en curso viven aquí; con LocMemCache cada proceso tiene los suyos y solo el que
+# hizo el cambio reconstruye su árbol. LocMemCache sirve únicamente con un solo proceso
+REDIS_URL = os.getenv('REDIS_URL') or None
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Búsqueda full-text: 'postgres' o 'local' (por defecto según el motor de base de datos)
+KNOWLEDGE_SEARCH_BACKEND = os.getenv('KNOWLEDGE_SEARCH_BACKEND') or None
+SEARCH_INDEX_DIR = BASE_DIR / 'search_index'
+
+# Celery (opcional): con broker configurado las importaciones se procesan en workers de Celery;
+# sin broker se usa un pool de procesos local
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL') or None
+CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND') or CELERY_BROKER_URL
+
 # Authentication Settings
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -45,43 +45,29 @@ def logout_view(request):
 
 @login_required
 def dashboard_view(request):
-    from django.contrib.auth.models import User
-    from datetime import datetime, timedelta
-    from django.db.models import Count, Q
+    from datetime import timedelta
+    from django.utils import timezone
+    from apps.knowledge_base.metrics import get_snapshot, SLA_HOURS
     
-    # Fechas para cálculos
-    now = datetime.now()
-    thirty_days_ago = now - timedelta(days=30)
-    seven_days_ago = now - timedelta(days=7)
+    # KPIs precalculados (cache con TTL, se invalida al cambiar el estado de un documento)
+    kpis = get_snapshot()
+    documents = kpis['documents']
     
     # KPIs Principales
-    total_documents = Document.objects.count()
-    pending_approval = Document.objects.filter(status='review').count()
-    approved_documents = Document.objects.filter(status='approved').count()
-    draft_documents = Document.objects.filter(status='draft').count()
-    
-    # Cálculo de tendencias (últimos 7 días vs 7 días anteriores)
-    docs_last_week = Document.objects.filter(created_at__gte=seven_days_ago).count()
-    docs_prev_week = Document.objects.filter(
-        created_at__gte=seven_days_ago - timedelta(days=7),
-        created_at__lt=seven_days_ago
-    ).count()
+    total_documents = documents['total']
+    pending_approval = documents['review']
+    approved_documents = documents['approved']
+    draft_documents = documents['draft']
     
-    # Calcular porcentaje de cambio
-    if docs_prev_week > 0:
-        docs_trend = round(((docs_last_week - docs_prev_week) / docs_prev_week) * 100, 1)
-    else:
-        docs_trend = 100 if docs_last_week > 0 else 0
-    
-    # Tasa de aprobación
-    total_processed = approved_documents + Document.objects.filter(status='rejected').count()
-    approval_rate = round((approved_documents / total_processed * 100), 1) if total_processed > 0 else 0
+    # Tendencias y tasa de aprobación
+    docs_trend = kpis['docs_trend']
+    approval_rate = kpis['approval_rate']
     
     # Tiempo promedio de aprobación (simulado por ahora)
     avg_approval_time = 3.2  # días
     
     # Usuarios activos
-    active_users = User.objects.filter(last_login__gte=thirty_days_ago).count()
+    active_users = kpis['active_users']
     
     # Documentos recientes
     recent_documents = Document.objects.select_related('category', 'created_by').order_by('-updated_at')[:5]
@@ -91,36 +77,17 @@ def dashboard_view(request):
     
     # MÉTRICAS INTELIGENTES PARA AUDITORÍAS
     
-    # 1. Índice de Salud Documental (Más realista)
-    from django.utils import timezone
-    
-    # Calcular documentos por vigencia real
-    vigentes = Document.objects.filter(
-        status='approved',
-        updated_at__gte=now - timedelta(days=365)  # Vigentes si se actualizaron en el último año
-    ).count()
-    
-    por_vencer = Document.objects.filter(
-        status='approved',
-        updated_at__gte=now - timedelta(days=395),  # Entre 365-395 días
-        updated_at__lt=now - timedelta(days=365)
-    ).count()
-    
-    obsoletos = Document.objects.filter(
-        Q(status='approved', updated_at__lt=now - timedelta(days=395)) |
-        Q(status='rejected')
-    ).count()
-    
+    # 1. Índice de Salud Documental
     salud_documental = {
-        'vigentes': vigentes,
-        'por_vencer': por_vencer, 
-        'obsoletos': obsoletos,
-        'porcentaje_salud': round((vigentes / total_documents * 100), 1) if total_documents > 0 else 0
+        'vigentes': documents['vigentes'],
+        'por_vencer': documents['por_vencer'], 
+        'obsoletos': documents['obsoletos'],
+        'porcentaje_salud': kpis['salud_porcentaje']
     }
     
     # 2. Documentos fuera de SLA (Cuellos de Botella por Tiempo)
-    sla_limit = now - timedelta(hours=48)
-    docs_fuera_sla = Document.objects.filter(status='review', updated_at__lt=sla_limit).count()
+    sla_limit = timezone.now() - timedelta(hours=SLA_HOURS)
+    docs_fuera_sla = documents['fuera_sla']
     
     # 3. Velocidad de Ciclo Desglosada
     velocidad_ciclo = {